@@ -0,0 +1,83 @@
+import io
+import os
+import statistics
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from jp_speech import SpeechService, StubRecognizer, preprocess_wav
+
+# --- 口說題辨識：原始錄音 vs 前處理後 (離線替身後端) ---
+# 用法: python benchmarks/bench_asr.py [次數]
+# 替身後端依上傳大小與音長模擬延遲，量的是前處理省下的傳輸 / 辨識時間，以及 UI 執行緒被卡住的時間
+
+
+def fake_recording(rng, rate=48000, channels=2, lead=1.0, speech=1.5, tail=1.5):
+    # 頭尾是低雜訊 (按下錄音後的空白)，中間是有聲段
+    n_speech = int(rate * speech)
+    t = np.arange(n_speech) / rate
+    voice = 6000 * np.sin(2 * np.pi * rng.uniform(120, 300) * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    x = np.concatenate([rng.normal(0, 30, int(rate * lead)), voice, rng.normal(0, 30, int(rate * tail))])
+    x = np.repeat(x[:, None], channels, axis=1).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(x.tobytes())
+    return buf.getvalue()
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {"mean_ms": round(statistics.fmean(samples), 2), "p50_ms": round(samples[len(samples) // 2], 2),
+            "p95_ms": round(samples[int(len(samples) * 0.95)], 2)}
+
+
+def main(n=20):
+    rng = np.random.default_rng(0)
+    recordings = [fake_recording(rng, lead=rng.uniform(0.3, 2), tail=rng.uniform(0.5, 2.5)) for _ in range(n)]
+    recognize = StubRecognizer("テスト")
+
+    prep, sizes_in, sizes_out = [], [], []
+    for data in recordings:
+        start = time.perf_counter()
+        _, info = preprocess_wav(data)
+        prep.append((time.perf_counter() - start) * 1000)
+        sizes_in.append(info["bytes_in"])
+        sizes_out.append(info["bytes_out"])
+
+    raw, processed = [], []
+    for data in recordings:
+        start = time.perf_counter()
+        recognize(data)
+        raw.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        recognize(preprocess_wav(data)[0])
+        processed.append((time.perf_counter() - start) * 1000)
+
+    # UI 執行緒：舊版在 script 內等辨識結束；新版只送出 job，之後輪詢
+    service = SpeechService(recognize, timeout=30)
+    blocked = []
+    jobs = []
+    for data in recordings:
+        start = time.perf_counter()
+        jobs.append(service.submit(data))
+        blocked.append((time.perf_counter() - start) * 1000)
+    while any(service.poll(job)[0] == "pending" for job in jobs): time.sleep(0.01)
+
+    print(f"錄音 {n} 段，平均 {statistics.fmean(sizes_in) / 1e3:.0f} KB -> {statistics.fmean(sizes_out) / 1e3:.0f} KB")
+    print(f"前處理          {summarize(prep)}")
+    print(f"辨識 (原始)     {summarize(raw)}")
+    print(f"辨識 (前處理後) {summarize(processed)}  (含前處理)")
+    print(f"UI 等待 (舊版)  {summarize(raw)}")
+    print(f"UI 等待 (新版)  {summarize(blocked)}")
+    print(f"worker 統計     {service.stats}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deckgen import make_deck_frame
+from jp_deck_cache import DeckCache
+from jp_deckpack import DeckPack, compile_deck, pack_source
+from jp_quiz import QuizEngine
+from jp_storage import SqliteStorage
+
+# --- 冷啟動：解析題庫 (DataFrame) vs 編譯好的題庫 (jp_deckpack，mmap) ---
+# 每種方式各開一個新的 process (OS page cache 為熱的)，量到第一題出題為止的時間與記憶體 (RSS)。
+# 解析題庫時讀音是在背景標註的，另外列出標註完成的時間；編譯好的題庫已含讀音。
+# 用法: python benchmarks/bench_deckpack.py [--rows 100000]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def child(path, pack_dir):
+    start = time.perf_counter()
+    storage = SqliteStorage(path)
+    pack = DeckPack.open_if_exists(pack_dir, pack_source(storage)) if pack_dir else None
+    cache = DeckCache(storage.load_all, "random", storage.load_delta, storage.load_srs, pack)
+    deck = cache.get()
+    loaded = time.perf_counter() - start
+    session = QuizEngine(cache).session(random.Random(0))
+    session.next_question()
+    first = time.perf_counter() - start
+    for t in threading.enumerate():
+        if t.name == "jp-kana-annotate": t.join()
+    print(json.dumps({"load": loaded, "first_question": first, "annotated": time.perf_counter() - start,
+                      "rss_mb": rss_mb(), "cards": len(deck.catalog[1])}))
+
+
+def run(path, pack_dir=None):
+    args = [sys.executable, os.path.abspath(__file__), "--child", path] + (["--pack", pack_dir] if pack_dir else [])
+    return json.loads(subprocess.run(args, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--child")
+    parser.add_argument("--pack")
+    args = parser.parse_args()
+    if args.child: return child(args.child, args.pack)
+
+    work = tempfile.mkdtemp(prefix="jp_pack_")
+    path, pack_dir = os.path.join(work, "deck.db"), os.path.join(work, "pack")
+    storage = SqliteStorage(path)
+    storage.replace_all(make_deck_frame(args.rows))
+    df = storage.load_all()
+    meta = compile_deck(df, pack_dir, pack_source(storage), df.attrs.get("version"))
+    size = sum(os.path.getsize(os.path.join(pack_dir, f)) for f in os.listdir(pack_dir))
+    print(f"題庫 {args.rows} 列 / {meta['keys']} 張卡片：編譯 {meta['seconds']:.1f}s，{size / 1e6:.1f} MB")
+
+    run(path, pack_dir) # 暖 page cache
+    for name, result in [("解析 DataFrame", run(path)), ("編譯好的題庫", run(path, pack_dir))]:
+        print(f"{name:<14} 載入 {result['load']:.2f}s，第一題 {result['first_question']:.2f}s，"
+              f"讀音完成 {result['annotated']:.2f}s，RSS {result['rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
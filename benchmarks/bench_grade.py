@@ -0,0 +1,73 @@
+import os
+import random
+import statistics
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jp_deck import parse_data
+from jp_grade import grade, opcodes
+from jp_kana import annotate_readings, normalize_answer, target_kana
+from jp_storage import XlsxStorage
+
+# --- 打字 / 口說題判分：舊版 (完全一致 + 答錯時 difflib 差異) vs jp_grade (帶狀編輯距離 + opcodes) ---
+# 作答：一半完全答對，其餘隨機替換 / 刪除 / 插入 1~3 個假名 (模擬打錯字與語音辨識誤差)；
+# 另外把句子重複 4 / 16 次量長句。判分只量判定 (不含快取命中)；差異只量答錯的題，兩邊都比對正規化後的假名。
+# 用法: python benchmarks/bench_grade.py [每種長度的題數]
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+
+
+def noisy(text, rng):
+    t = list(text)
+    for _ in range(rng.randint(1, 3)):
+        op, i = rng.random(), rng.randrange(len(t) + 1)
+        if op < 0.5 and i < len(t): t[i] = rng.choice(KANA)
+        elif op < 0.75 and i < len(t) and len(t) > 1: del t[i]
+        else: t.insert(i, rng.choice(KANA))
+    return "".join(t)
+
+
+def measure(fn, cases):
+    samples = []
+    for case in cases:
+        start = time.perf_counter()
+        fn(*case)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {"mean_us": statistics.fmean(samples), "p50_us": samples[len(samples) // 2],
+            "p99_us": samples[int(len(samples) * 0.99)]}
+
+
+def main(n=500):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    s_data, v_data, *_ = parse_data(XlsxStorage(os.path.join(root, "Phrases.xlsx")).load_all())
+    annotate_readings(s_data, v_data)
+    rng = random.Random(0)
+    for repeat in [1, 4, 16]:
+        cases = []
+        for _ in range(n):
+            item, mode = (rng.choice(s_data), rng.choice([5, 6, 9])) if rng.random() < 0.6 else \
+                         (rng.choice(v_data), rng.choice([7, 10]))
+            kana = target_kana(item, mode) * repeat
+            answer = kana if rng.random() < 0.5 else noisy(kana, rng)
+            cases.append((normalize_answer(answer), kana, 0.15 if mode in [9, 10] else 0.0))
+        wrong = [c for c in cases if c[0] != c[1]]
+
+        grade.cache_clear()
+        old = measure(lambda a, t, tol: a == t and 1.0 or SequenceMatcher(None, a, t).ratio(), cases)
+        new = measure(lambda a, t, tol: grade.__wrapped__(a, t, tol), cases)
+        old_diff = measure(lambda a, t, tol: SequenceMatcher(None, a, t).get_opcodes(), wrong)
+        new_diff = measure(lambda a, t, tol: opcodes(a, t), wrong)
+        length = statistics.fmean(len(c[1]) for c in cases)
+        print(f"平均 {length:.0f} 個假名 ({len(cases)} 題，答錯 {len(wrong)} 題)")
+        for name, stats in [("判分 difflib", old), ("判分 jp_grade", new),
+                            ("差異 difflib", old_diff), ("差異 jp_grade", new_diff)]:
+            print(f"  {name:<14} mean {stats['mean_us']:7.1f} µs  p50 {stats['p50_us']:7.1f} µs  "
+                  f"p99 {stats['p99_us']:7.1f} µs")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deckgen import make_deck_frame
+from jp_storage import EXPECTED_COLUMNS
+
+# --- 匯入大型 xlsx：串流匯入 (jp_import) vs 整份讀進 pandas 再 replace_all ---
+# 每種方式各開一個新的 process 寫入空的 SQLite 題庫，比較耗時與最高記憶體 (VmHWM；ru_maxrss 會沿用父 process 的值)。
+# 用法: python benchmarks/bench_import.py [--rows 100000]
+
+
+def write_xlsx(path, n):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(EXPECTED_COLUMNS)
+    for row in make_deck_frame(n)[EXPECTED_COLUMNS].itertuples(index=False): ws.append(list(row))
+    wb.save(path)
+
+
+def peak_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+
+
+def child(method, xlsx, db):
+    from jp_storage import SqliteStorage, XlsxStorage
+    storage = SqliteStorage(db)
+    start = time.perf_counter()
+    if method == "stream":
+        from jp_import import import_file
+        rows = import_file(storage, xlsx)["rows"]
+    else:
+        df = XlsxStorage(xlsx).load_all()
+        storage.replace_all(df)
+        rows = len(df)
+    print(json.dumps({"rows": rows, "seconds": time.perf_counter() - start, "peak_mb": peak_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--child", nargs=3)
+    args = parser.parse_args()
+    if args.child: return child(*args.child)
+
+    work = tempfile.mkdtemp(prefix="jp_import_")
+    xlsx = os.path.join(work, "deck.xlsx")
+    write_xlsx(xlsx, args.rows)
+    print(f"{args.rows} 列 xlsx：{os.path.getsize(xlsx) / 1e6:.1f} MB")
+    for method, name in [("pandas", "pandas + replace_all"), ("stream", "串流匯入 (jp_import)")]:
+        db = os.path.join(work, f"{method}.db")
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", method, xlsx, db],
+                             check=True, capture_output=True, text=True).stdout.splitlines()[-1]
+        r = json.loads(out)
+        print(f"{name:<22} {r['seconds']:.2f}s，{r['rows'] / r['seconds']:,.0f} 列/秒，最高記憶體 {r['peak_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pykakasi
+
+from jp_deck import parse_data
+from jp_kana import annotate_readings, normalize_answer, target_kana
+from jp_storage import XlsxStorage
+
+# --- 打字 / 口說題判分延遲：舊版 (每次 new kakasi、轉兩次) vs 新版 (預先正規化 + 快取) ---
+# 用法: python benchmarks/bench_kana.py [次數]
+
+
+def legacy_grade(user_input, target):
+    def get_hiragana(text):
+        kks = pykakasi.kakasi()
+        result = kks.convert(text)
+        return "".join([item['hira'] for item in result])
+    def clean_chars(t): return re.sub(r'[。、？！\?!\s　]', '', str(t))
+    return get_hiragana(clean_chars(user_input)) == get_hiragana(clean_chars(target))
+
+
+def legacy_target(item, mode):
+    return item['reading'] if mode == 7 else item['sentence'] if item['type'] == 'sentence' else item['kanji']
+
+
+def timed(fn, cases):
+    samples = []
+    results = []
+    for user_input, item, mode in cases:
+        start = time.perf_counter()
+        results.append(fn(user_input, item, mode))
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return results, {"mean_us": statistics.fmean(samples), "p50_us": samples[len(samples) // 2],
+                     "p95_us": samples[int(len(samples) * 0.95)]}
+
+
+def main(n=300):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    s_data, v_data, *_ = parse_data(XlsxStorage(os.path.join(root, "Phrases.xlsx")).load_all())
+    rnd = random.Random(0)
+    cases = []
+    for _ in range(n):
+        if rnd.random() < 0.5:
+            item, mode = rnd.choice(s_data), rnd.choice([5, 6, 9])
+        else:
+            item, mode = rnd.choice(v_data), rnd.choice([7, 10])
+        target = legacy_target(item, mode)
+        # 一半答對、一半答錯 (同一批輸入重複出現，模擬重考)
+        cases.append((target if rnd.random() < 0.5 else target[:-1] + "あ", item, mode))
+
+    old, old_stats = timed(lambda u, item, mode: legacy_grade(u, legacy_target(item, mode)), cases)
+    start = time.perf_counter()
+    annotate_readings(s_data, v_data)
+    annotate_ms = (time.perf_counter() - start) * 1000
+    new, new_stats = timed(lambda u, item, mode: normalize_answer(str(u)) == target_kana(item, mode), cases)
+
+    assert old == new, "判分結果不一致"
+    print(f"題庫 {len(s_data)} 句 / {len(v_data)} 單字，預先正規化 {annotate_ms:.1f} ms")
+    for name, stats in [("舊版", old_stats), ("新版", new_stats)]:
+        print(f"{name}: mean {stats['mean_us']:.1f} µs  p50 {stats['p50_us']:.1f} µs  p95 {stats['p95_us']:.1f} µs")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
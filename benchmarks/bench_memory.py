@@ -0,0 +1,100 @@
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- 記憶體：共用題庫 + 每位學習者 (Session) 的 RSS ---
+# 每個版本各開一個新的 process：載入合成題庫後量 RSS，再建立 --sessions 個 Session、各作答幾題；
+# 共用題庫以 RSS 增量計算，每個 session 的成本以 tracemalloc 計算 (含 numpy 陣列)。--compare <git rev> 另外以該版本的程式碼量一次 (git archive 到暫存目錄)。
+# 背景讀音標註 (pykakasi) 在兩邊都關閉：它只影響共用題庫、且要跑很久。
+# 用法: python benchmarks/bench_memory.py [--rows 100000] [--sessions 20] [--compare HEAD~1]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def child(root, rows, sessions, answers):
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    from deckgen import make_deck_frame
+    sys.path.insert(0, root) # deckgen 會把目前的程式碼加進 sys.path：之後的模組改由 root 載入
+    for name in [m for m in sys.modules if m.startswith("jp_")]: del sys.modules[name]
+    import jp_deck_cache
+    from jp_quiz import QuizEngine
+    jp_deck_cache.annotate_readings_in_background = lambda *args: None
+
+    df = make_deck_frame(rows)
+    gc.collect()
+    base = rss_mb()
+    start = time.perf_counter()
+    cache = jp_deck_cache.DeckCache(lambda: df)
+    deck = cache.get()
+    load_s = time.perf_counter() - start
+    del df
+    gc.collect()
+    deck_mb = rss_mb() - base
+
+    engine = QuizEngine(cache)
+
+    def open_sessions():
+        rng, keep = random.Random(0), []
+        for i in range(sessions):
+            s = engine.session(random.Random(i))
+            for _ in range(answers):
+                q = s.next_question()
+                s.submit(q.correct if rng.random() < 0.8 else "ちがう")
+            keep.append(s)
+        return keep
+
+    start = time.perf_counter()
+    keep = open_sessions()
+    elapsed = time.perf_counter() - start
+    del keep
+    gc.collect()
+    # session 的記憶體以 tracemalloc 計算 (numpy 陣列也會計入)；RSS 會重用剛釋放的記憶體，量不準
+    tracemalloc.start()
+    keep = open_sessions()
+    gc.collect()
+    session_mb = tracemalloc.get_traced_memory()[0] / 1e6 / sessions
+    print(json.dumps({"cards": len(deck.catalog[1]), "items": len(deck.catalog[0]), "load_s": load_s,
+                      "deck_mb": deck_mb, "session_mb": session_mb, "session_ms": elapsed * 1000 / sessions}))
+
+
+def run(root, args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", root, "--rows", str(args.rows),
+           "--sessions", str(args.sessions), "--answers", str(args.answers)]
+    return json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--answers", type=int, default=5, help="每個 session 作答題數")
+    parser.add_argument("--compare", help="另外量測的 git 版本 (例如 HEAD~1)")
+    parser.add_argument("--child")
+    args = parser.parse_args()
+    if args.child: return child(args.child, args.rows, args.sessions, args.answers)
+
+    targets = [("目前", ROOT)]
+    if args.compare:
+        old = tempfile.mkdtemp(prefix="jp_mem_")
+        archive = subprocess.run(["git", "-C", ROOT, "archive", args.compare], check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", old], input=archive, check=True)
+        targets.insert(0, (args.compare, old))
+    for name, root in targets:
+        r = run(root, args)
+        print(f"{name:<8} {r['cards']} 張卡片 / {r['items']} 題：載入 {r['load_s']:.1f}s，共用題庫 {r['deck_mb']:.0f} MB，"
+              f"每個 session {r['session_mb']:.2f} MB ({r['session_ms']:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from deckgen import make_deck_frame
+from jp_deck_cache import DeckCache
+from jp_quiz import QuizEngine
+
+# --- 出題引擎吞吐量：不經過 Streamlit，單一 process 模擬多位學習者輪流作答 ---
+# 題庫共用一份 (DeckCache)，每位學習者一個 Session；不產生語音、寫回只計數。
+# 每位學習者約八成答對 (用 Question.correct 作答)，口說題直接送辨識文字。
+# --batch N：改用批次練習 (開始時一次準備 N 題，結束時整批寫回)；--save-ms 模擬每次寫回的網路延遲。
+# 用法: python benchmarks/bench_quiz.py [--cards 10000] [--learners 1000] [--answers 20] [--batch 20 --save-ms 300]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def respond(question, rng, accuracy):
+    if rng.random() >= accuracy: return "ちがう"
+    if question.mode == 6: return sorted(b['id'] for b in question.parsing) # 依原順序點字卡
+    return question.correct
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=10_000)
+    parser.add_argument("--learners", type=int, default=1_000)
+    parser.add_argument("--answers", type=int, default=20, help="每位學習者作答題數")
+    parser.add_argument("--accuracy", type=float, default=0.8)
+    parser.add_argument("--batch", type=int, default=0, help="批次練習的題數 (0 = 一般練習)")
+    parser.add_argument("--save-ms", type=float, default=0, help="每次寫回的延遲")
+    args = parser.parse_args()
+
+    df = make_deck_frame(args.cards)
+    cache = DeckCache(lambda: df)
+    start = time.perf_counter()
+    cache.get()
+    for t in threading.enumerate():
+        if t.name == "jp-kana-annotate": t.join()
+    print(f"題庫 {len(df)} 列：載入 {time.perf_counter() - start:.2f}s")
+
+    saved, saves = [0], [0]
+    def save(records, log):
+        saved[0] += len(log)
+        saves[0] += 1
+        if args.save_ms: time.sleep(args.save_ms / 1000)
+        return {r["key"]: r["version"] + 1 for r in records}, {}
+    engine = QuizEngine(cache, save)
+
+    base = rss_mb()
+    start = time.perf_counter()
+    sessions = [engine.session(random.Random(i)) for i in range(args.learners)]
+    elapsed = time.perf_counter() - start
+    print(f"{args.learners} 位學習者：建立 {elapsed * 1000 / args.learners:.2f} ms/人，"
+          f"記憶體 {(rss_mb() - base) * 1000 / args.learners:.1f} KB/人")
+
+    rng = random.Random(0)
+    latency, correct = [], 0
+    start = time.perf_counter()
+    for i in range(args.answers):
+        for s in sessions:
+            if args.batch and i % args.batch == 0: s.start_batch(args.batch)
+            t0 = time.perf_counter()
+            q = s.next_question()
+            correct += s.submit(respond(q, rng, args.accuracy))["correct"]
+            latency.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    for s in sessions: s.flush()
+
+    total = len(latency)
+    ms = np.asarray(latency) * 1000
+    print(f"{total} 題：{total / elapsed:,.0f} 題/秒 (單核)，答對 {correct / total:.0%}，"
+          f"寫回 {saved[0]} 筆 ({saves[0]} 次)")
+    print(f"出題 + 判分延遲 p50 {np.percentile(ms, 50):.3f} ms，p99 {np.percentile(ms, 99):.3f} ms，max {ms.max():.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
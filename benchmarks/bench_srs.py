@@ -0,0 +1,83 @@
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from jp_srs import SrsStore, date_to_ordinal
+
+# --- SRS 狀態：dict of dict (舊版 srs_map) vs numpy 結構陣列 (SrsStore) ---
+# 用法: python benchmarks/bench_srs.py [最大卡片數]
+# 記憶體不含 Key 字串本身 (兩者共用題目物件上的字串)
+
+
+def make_cards(n, rng):
+    today = date.today()
+    dates = [(today + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(-30, 120)]
+    keys = [f"card-{i:07d}" for i in range(n)]
+    return keys, [rng.choice(dates) for _ in range(n)], [rng.randrange(0, 200) for _ in range(n)], \
+        [rng.randrange(0, 30) for _ in range(n)], [rng.random() < 0.1 for _ in range(n)]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def per_op_ns(fn, keys, reps=200_000):
+    sample = random.Random(1).choices(keys, k=reps)
+    start = time.perf_counter()
+    for k in sample: fn(k)
+    return (time.perf_counter() - start) / reps * 1e9
+
+
+def main(max_n=1_000_000):
+    rng = random.Random(0)
+    today = date.today().strftime("%Y-%m-%d")
+    today_ord = date_to_ordinal(today)
+    n = 10_000
+    while n <= max_n:
+        keys, nr, iv, rp, wk = make_cards(n, rng)
+
+        legacy, legacy_bytes = measure(lambda: {k: {"next_review": a, "interval": b, "reps": c, "row_idx": i}
+                                                for i, (k, a, b, c) in enumerate(zip(keys, nr, iv, rp))})
+        store, store_bytes = measure(lambda: _build_store(keys, nr, iv, rp, wk))
+
+        start = time.perf_counter()
+        due_legacy = sum(1 for v in legacy.values() if v["next_review"] <= today)
+        t_due_legacy = (time.perf_counter() - start) * 1e3
+        start = time.perf_counter()
+        s = store.state[:n]
+        due_store = int(np.count_nonzero((s["next_review"] <= today_ord) & (s["origin"] != 0)))
+        t_due_store = (time.perf_counter() - start) * 1e3
+
+        t_legacy = per_op_ns(lambda k: legacy[k]["next_review"], keys)
+        t_store = per_op_ns(store.next_review, keys)
+        t_set = per_op_ns(lambda k: store.set(k, today, 3, 1, False), keys)
+
+        print(f"{n:>9,} 張  記憶體 dict {legacy_bytes / n:6.0f} B/張  陣列 {store.nbytes / n:4.0f} B/張 "
+              f"(含 Key 索引 {store_bytes / n:4.0f} B/張)  "
+              f"查詢 {t_legacy:5.0f} / {t_store:5.0f} ns  寫入 {t_set:5.0f} ns  "
+              f"到期統計 {t_due_legacy:7.1f} / {t_due_store:5.2f} ms ({due_legacy} = {due_store})")
+        del legacy, store
+        n *= 10
+
+
+def _build_store(keys, nr, iv, rp, wk):
+    store = SrsStore()
+    store.set_many(keys, nr, iv, rp, wk)
+    return store
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,86 @@
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jp_srs import SrsStore
+from jp_stats import FORECAST_DAYS, card_layout, workload_stats
+
+# --- 複習量統計：逐張卡片的 Python 迴圈 (舊版 due_count 寫法) vs 向量化 (jp_stats) ---
+# 用法: python benchmarks/bench_stats.py [最大卡片數]
+# 題庫以合成資料直接組出 catalog，不經過 parse_data
+
+
+class FakeDeck:
+    # 只有 jp_stats 會用到的欄位
+    def __init__(self, catalog, group_items, srs):
+        self.catalog, self.group_items, self.srs = catalog, group_items, srs
+
+
+def make_deck(n, rng):
+    today = date.today()
+    dates = [(today + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(-60, 180)]
+    items, key_items, group_items = [], {}, {}
+    for i in range(n):
+        gid = f"G{rng.randrange(n // 20 + 1)}" if rng.random() < 0.3 else ""
+        items.append({"type": "sentence", "sentence": f"s{i}", "group": gid, "start_date": rng.choice(dates), "row_idx": i})
+        key_items[f"s{i}"] = [i]
+        if gid: group_items.setdefault(gid, []).append(i)
+    srs = SrsStore()
+    for k in key_items: srs.index.add(k) # 與 Deck 相同：所有卡片都有 id
+    keys = [k for k in key_items if rng.random() < 0.6]  # 六成已排程
+    srs.set_many(keys, [rng.choice(dates) for _ in keys], [rng.randrange(0, 400) for _ in keys],
+                 [rng.randrange(0, 20) for _ in keys], [rng.random() < 0.1 for _ in keys])
+    catalog = (items, key_items, {k: items[ids[0]] for k, ids in key_items.items()})
+    return FakeDeck(catalog, group_items, srs), srs
+
+
+def loop_stats(deck, srs):
+    # 對照組：每次 rerun 都逐張卡片比對日期字串
+    items, key_items, item_by_key = deck.catalog
+    today = datetime.now().date()
+    horizon = [(today + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(FORECAST_DAYS)]
+    forecast, intervals, weak, cards, backlog = Counter(), Counter(), Counter(), Counter(), Counter()
+    for key, ids in key_items.items():
+        s = srs.get(key)
+        item = item_by_key[key]
+        if item["group"]: cards[item["group"]] += 1
+        if s is None:
+            backlog[min(items[i]["start_date"] for i in ids)] += 1
+            continue
+        day = next((d for d, h in enumerate(horizon) if s["next_review"] <= h), None)
+        if day is not None: forecast[day] += 1
+        intervals[s["interval"]] += 1
+        if s["weak"] and item["group"]: weak[item["group"]] += 1
+    return forecast
+
+
+def timed(fn, reps=3):
+    best = float("inf")
+    for _ in range(reps):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1e3
+
+
+def main(max_n=1_000_000):
+    rng = random.Random(0)
+    n = 10_000
+    while n <= max_n:
+        deck, srs = make_deck(n, rng)
+        legacy, t_loop = timed(lambda: loop_stats(deck, srs), reps=1 if n >= 1_000_000 else 3)
+        _, t_layout = timed(lambda: card_layout(deck), reps=1) # 每個題庫版本一次
+        stats, t_vec = timed(lambda: workload_stats(deck, srs))
+        same = all(legacy.get(d, 0) == stats["forecast"][d] for d in range(FORECAST_DAYS))
+        print(f"{n:>9,} 張  迴圈 {t_loop:8.1f} ms   向量化 {t_vec:6.1f} ms (卡片配置 {t_layout:7.1f} ms，每版一次)  "
+              f"到期預測一致: {same}  Group {len(stats['groups'])}")
+        n *= 10
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+# 替身後端：Sheets 由 fakes 提供，TTS / 語音辨識用 App 內建的 stub
+os.environ["JP_STORAGE"] = "gsheets"
+os.environ["JP_TTS"] = "stub"
+os.environ["JP_ASR"] = "stub"
+
+import streamlit as st
+import streamlit_gsheets
+from streamlit.testing.v1 import AppTest
+
+from deckgen import make_deck_frame
+from fakes import FakeSheetsConnection, FakeSpreadsheet
+from jp_deck import parse_data
+from jp_perf import PERF
+
+streamlit_gsheets.GSheetsConnection = FakeSheetsConnection
+
+# --- 效能量測組 (可重現、離線) ---
+# 以合成題庫 (deckgen) 與 in-process 替身後端 (fakes、stub TTS / 辨識) 實際跑 App (Streamlit AppTest)，
+# 各函式的耗時取自 jp_perf 的 span；結果寫成 JSON，可在不同 commit 間比較。
+# 用法:
+#   python benchmarks/bench_suite.py [--sizes 1000,10000,100000,1000000] [--steps 80] [--out 結果.json]
+#   python benchmarks/bench_suite.py --compare 舊.json 新.json
+
+APP = os.path.join(ROOT, "japanese_app.py")
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+ALL_MODES = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+
+def summarize(samples):
+    a = np.asarray(samples, dtype=float)
+    if not len(a): return None
+    return {"n": int(len(a)), "mean_ms": round(float(a.mean()), 3), "p50_ms": round(float(np.percentile(a, 50)), 3),
+            "p95_ms": round(float(np.percentile(a, 95)), 3), "max_ms": round(float(a.max()), 3)}
+
+
+def timed_runs(fn, reps):
+    samples = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def collect(into):
+    for name, ms in PERF.samples().items(): into[name].extend(ms.tolist())
+    PERF.reset()
+
+
+def answer(at, mode, step):
+    # 依模式作答；偶數步驟答對 (可出現在畫面上的答案)，奇數步驟隨便答 (答錯才會產生 diff)
+    def button(label):
+        return next(b for b in at.button if b.label == label)
+    question = at.session_state.quiz.question
+    if mode in [1, 2, 3, 4, 8]:
+        at.button(key=f"opt_{step % 2}").click().run()
+    elif mode == 6:
+        for b in list(at.button):
+            if b.key and b.key.startswith("avail_"): b.click().run(); break
+        button("🚀 送出").click().run()
+    elif mode in [9, 10]:
+        # 錄音元件無法在 AppTest 中操作：只量出題 (含語音)，辨識另外量 (asr_roundtrip)
+        button("😶 Skip").click().run()
+    else:
+        at.text_input[0].input(question.correct if step % 2 == 0 else "あいう").run()
+        button("送出").click().run()
+
+
+def bench_app(steps, min_per_mode, timeout):
+    # 回傳 (啟動耗時, 等待讀音標註的時間, {mode: {span: 樣本}}, {span: 全部樣本})
+    st.cache_resource.clear() # 換題庫大小時重新讀取 (DeckCache / TTS 等)
+    PERF.reset()
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    start = time.perf_counter()
+    at.run()
+    startup_ms = (time.perf_counter() - start) * 1000
+    if at.exception: raise RuntimeError(at.exception[0].message)
+    # 等背景的讀音標註跑完再量作答 (單核機器上會搶 GIL，讓結果不穩定)
+    start = time.perf_counter()
+    for t in threading.enumerate():
+        if t.name == "jp-kana-annotate": t.join()
+    annotate_ms = (time.perf_counter() - start) * 1000
+    totals = defaultdict(list)
+    per_mode = defaultdict(lambda: defaultdict(list))
+    collect(totals)
+
+    seen = defaultdict(int)
+    for step in range(steps):
+        mode = at.session_state.quiz.question.mode
+        seen[mode] += 1
+        spans = defaultdict(list)
+        answer(at, mode, step)
+        if at.exception: raise RuntimeError(at.exception[0].message)
+        collect(spans)
+        if at.session_state.quiz.result is not None:
+            next_btn = next(b for b in at.button if b.label == "👉 下一題")
+            next_btn.click().run()
+            collect(spans)
+        # 作答相關的 span 屬於這一題；出題相關的 span 屬於下一題
+        for name, ms in spans.items():
+            totals[name].extend(ms)
+            owner = at.session_state.quiz.question.mode if name in ("pick_new_question", "setup_question", "build_question") else mode
+            per_mode[owner][name].extend(ms)
+        if step >= steps // 2 and all(seen[m] >= min_per_mode for m in ALL_MODES): break
+    return startup_ms, annotate_ms, per_mode, totals
+
+
+def bench_asr(n=10):
+    # 口說題辨識 (背景 worker + stub 後端) 從送出到取得結果的時間
+    from bench_asr import fake_recording
+    from jp_speech import SpeechService, StubRecognizer
+    rng = np.random.default_rng(0)
+    service = SpeechService(StubRecognizer("テスト"), timeout=30)
+    samples = []
+    for _ in range(n):
+        data = fake_recording(rng)
+        start = time.perf_counter()
+        job = service.submit(data)
+        while service.poll(job)[0] == "pending": time.sleep(0.001)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_diff(df, reps=200):
+    # generate_diff 本體在 App 內：直接量它用的 jp_grade.opcodes (App 內的實際呼叫見 spans.generate_diff)
+    from jp_grade import opcodes
+    rng = random.Random(0)
+    pairs = []
+    for s in df["Sentence"].sample(min(reps, len(df)), random_state=0):
+        t = list(s)
+        for _ in range(3): t[rng.randrange(len(t))] = "あ"
+        pairs.append(("".join(t), s))
+    samples = []
+    for user, target in pairs:
+        start = time.perf_counter()
+        opcodes(user, target)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_size(n, steps, min_per_mode, latency):
+    t0 = time.perf_counter()
+    df = make_deck_frame(n)
+    gen_s = time.perf_counter() - t0
+    reps = 5 if n <= 10_000 else 3 if n <= 100_000 else 1
+    parse = timed_runs(lambda: parse_data(df), reps)
+    FakeSpreadsheet.load(df, latency)
+    startup_ms, annotate_ms, per_mode, totals = bench_app(steps, min_per_mode, timeout=max(60, n / 1000))
+    return {
+        "rows": n,
+        "generate_s": round(gen_s, 2),
+        "parse_data": summarize(parse),
+        "app_startup_ms": round(startup_ms, 1),
+        "annotate_wait_ms": round(annotate_ms, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "spans": {name: summarize(ms) for name, ms in sorted(totals.items())},
+        "modes": {str(m): {name: summarize(ms) for name, ms in sorted(spans.items())}
+                  for m, spans in sorted(per_mode.items())},
+        "generate_diff_direct": summarize(bench_diff(df)),
+        "sheets_calls": FakeSpreadsheet.current.calls,
+    }
+
+
+def run(sizes, args):
+    # 每個題庫大小在獨立的子 process 量 (互不影響快取 / 記憶體；某個大小記憶體不足被砍掉時仍保留其他結果)
+    results = {}
+    for n in sizes:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        cmd = [sys.executable, os.path.abspath(__file__), "--single", str(n), "--single-out", path,
+               "--steps", str(args.steps), "--min-per-mode", str(args.min_per_mode),
+               "--latency", str(args.latency), "--seed", str(args.seed)]
+        proc = subprocess.run(cmd, stderr=subprocess.DEVNULL)
+        if proc.returncode != 0:
+            results[str(n)] = {"rows": n, "error": f"exit code {proc.returncode}"}
+            print(f"{n:>9,} 列  失敗 (exit code {proc.returncode}，-9 通常是記憶體不足)", flush=True)
+            continue
+        with open(path, encoding="utf-8") as f: r = results[str(n)] = json.load(f)
+        os.remove(path)
+        print(f"{n:>9,} 列  parse_data p50 {r['parse_data']['p50_ms']:9.1f} ms  啟動 {r['app_startup_ms']:9.1f} ms  "
+              + "  ".join(f"{k} p50 {r['spans'][k]['p50_ms']:.2f}" for k in ("pick_new_question", "setup_question", "check_answer")
+                          if k in r['spans']) + f"  RSS {r['peak_rss_mb']:.0f} MB", flush=True)
+    return results
+
+
+def git_commit():
+    # 有未提交的修改時加上 -dirty (結果不完全對應該 commit)
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+    if not sha: return None
+    return sha + "-dirty" if dirty else sha
+
+
+def flatten(results):
+    # {"100000/spans/check_answer": p50_ms, ...}
+    flat = {}
+    for size, r in results.items():
+        if "error" in r: continue
+        if r["parse_data"]: flat[f"{size}/parse_data"] = r["parse_data"]["p50_ms"]
+        flat[f"{size}/app_startup"] = r["app_startup_ms"]
+        for name, s in r["spans"].items(): flat[f"{size}/spans/{name}"] = s["p50_ms"]
+        for mode, spans in r["modes"].items():
+            for name, s in spans.items(): flat[f"{size}/mode{mode}/{name}"] = s["p50_ms"]
+    return flat
+
+
+def compare(old_path, new_path, threshold=1.2):
+    with open(old_path, encoding="utf-8") as f: old = json.load(f)
+    with open(new_path, encoding="utf-8") as f: new = json.load(f)
+    a, b = flatten(old["results"]), flatten(new["results"])
+    print(f"{old.get('commit')} -> {new.get('commit')} (p50，比值 >= {threshold} 標記 !)")
+    for key in sorted(set(a) & set(b)):
+        ratio = b[key] / a[key] if a[key] else float("inf")
+        flag = " !" if ratio >= threshold else ""
+        print(f"{key:<50} {a[key]:10.3f} -> {b[key]:10.3f} ms  x{ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--steps", type=int, default=80, help="每個題庫大小最多作答幾題")
+    parser.add_argument("--min-per-mode", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="替身 Sheets 每次 API 呼叫的延遲 (秒)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)     # 子 process：只量一個大小
+    parser.add_argument("--single-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.compare: return compare(*args.compare)
+
+    if args.single:
+        random.seed(args.seed) # App 選題 / 模式用的是同一個 random
+        os.chdir(tempfile.mkdtemp(prefix="jp_bench_")) # 語音快取等檔案寫在這裡，不影響正式環境
+        result = bench_size(args.single, args.steps, args.min_per_mode, args.latency)
+        with open(args.single_out, "w", encoding="utf-8") as f: json.dump(result, f, ensure_ascii=False)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    started = time.time()
+    results = run(sizes, args)
+    report = {"commit": git_commit(), "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+              "python": platform.python_version(), "platform": platform.platform(), "seed": args.seed,
+              "latency": args.latency, "asr_roundtrip": summarize(bench_asr()), "results": results}
+    out = args.out or os.path.join(ROOT, "benchmarks", "results",
+                                   f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{report['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"-> {out}")
+
+
+if __name__ == "__main__":
+    main()
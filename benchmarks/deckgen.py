@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from jp_storage import EXPECTED_COLUMNS
+
+# --- 合成題庫產生器 (效能量測用) ---
+# 欄位與真實題庫相同；同樣的 (列數, seed) 一定產生同一份題庫。
+# 句子帶有列號 (不重複)，單字由常用漢字兩兩組合 (會在不同列重複出現，與真實題庫相近)。
+# 用法: python benchmarks/deckgen.py 100000 deck.db   (寫入本機 SQLite 題庫，見 jp_storage)
+
+KANJI = [("日", "にち"), ("本", "ほん"), ("学", "がく"), ("生", "せい"), ("先", "せん"), ("電", "でん"),
+         ("車", "しゃ"), ("会", "かい"), ("社", "しゃ"), ("食", "しょく"), ("事", "じ"), ("時", "じ"),
+         ("間", "かん"), ("天", "てん"), ("気", "き"), ("新", "しん"), ("聞", "ぶん"), ("語", "ご"),
+         ("話", "わ"), ("外", "がい"), ("国", "こく"), ("人", "じん"), ("大", "だい"), ("小", "しょう"),
+         ("手", "しゅ"), ("紙", "し"), ("文", "ぶん"), ("化", "か"), ("音", "おん"), ("楽", "がく"),
+         ("料", "りょう"), ("理", "り"), ("旅", "りょ"), ("行", "こう"), ("家", "か"), ("族", "ぞく"),
+         ("友", "ゆう"), ("情", "じょう"), ("報", "ほう"), ("告", "こく")]
+MEANINGS = ["日", "本", "學", "生", "先", "電", "車", "會", "社", "食", "事", "時", "間", "天", "氣", "新",
+            "聞", "語", "話", "外", "國", "人", "大", "小", "手", "紙", "文", "化", "音", "樂", "料", "理",
+            "旅", "行", "家", "族", "友", "情", "報", "告"]
+PARTICLES = ["は", "が", "を", "に", "で", "と", "も"]
+ENDINGS = [("です", "是"), ("します", "做"), ("でした", "曾是"), ("しました", "做了"), ("があります", "有")]
+
+
+def _pick(rng, n, k):
+    return rng.integers(0, k, size=n)
+
+
+def make_deck_frame(n, seed=0, group_ratio=0.4, scheduled_ratio=0.6, weak_ratio=0.08):
+    # 回傳 DataFrame (EXPECTED_COLUMNS，全部為字串，與 Sheets 讀回的格式相同)
+    rng = np.random.default_rng(seed)
+    k = len(KANJI)
+    kanji = np.array([c for c, _ in KANJI], dtype=object)
+    kana = np.array([r for _, r in KANJI], dtype=object)
+    mean = np.array(MEANINGS, dtype=object)
+
+    # 每列 1-3 個單字，每個單字由兩個漢字組成
+    n_vocab = rng.integers(1, 4, size=n)
+    a, b = _pick(rng, (n, 3), k), _pick(rng, (n, 3), k)
+    words = kanji[a] + kanji[b]
+    readings = kana[a] + kana[b]
+    meanings = mean[a] + mean[b]
+    particles = np.array(PARTICLES, dtype=object)[_pick(rng, (n, 3), len(PARTICLES))]
+    endings = _pick(rng, n, len(ENDINGS))
+    row_no = np.arange(n).astype(str).astype(object)
+
+    sentences, parsings, vocab, meaning, translations = [], [], [], [], []
+    for i in range(n):
+        m = n_vocab[i]
+        end_ja, end_ch = ENDINGS[endings[i]]
+        parts = []
+        for j in range(m): parts += [words[i, j], particles[i, j]]
+        parts += [row_no[i] + "回", end_ja]
+        sentences.append("".join(parts) + "。")
+        parsings.append("＋".join(parts))
+        vocab.append("。".join(f"{words[i, j]}｜{readings[i, j]}" for j in range(m)))
+        meaning.append("。".join(meanings[i, :m]))
+        translations.append("".join(meanings[i, :m]) + f"{row_no[i]}次{end_ch}。")
+
+    # Group：連續幾列 (2-5 句) 為一組
+    group = np.full(n, "", dtype=object)
+    grouped = rng.random(n) < group_ratio
+    gid = np.cumsum(rng.random(n) < 0.3)
+    group[grouped] = (gid[grouped] + 1).astype(str)
+
+    today = date.today()
+    day = lambda offsets: np.array([(today + timedelta(days=int(d))).strftime("%Y-%m-%d") for d in range(-730, 121)],
+                                   dtype=object)[offsets + 730]
+    start = day(rng.integers(-730, 30, size=n))
+    scheduled = rng.random(n) < scheduled_ratio
+    next_review = np.where(scheduled, day(rng.integers(-30, 120, size=n)), "")
+    interval = np.where(scheduled, rng.integers(0, 200, size=n).astype(str), "")
+    reps = np.where(scheduled, rng.integers(0, 20, size=n).astype(str), "")
+    weak = np.where(rng.random(n) < weak_ratio, "TRUE", "")
+
+    df = pd.DataFrame({"Sentence": sentences, "Translation": translations, "Group": group, "Parsing": parsings,
+                       "Vocab List": vocab, "Meaning": meaning, "Time": start, "Weak": weak,
+                       "Next_Review": next_review, "Interval": interval, "Reps": reps}, dtype=object)
+    return df[EXPECTED_COLUMNS]
+
+
+if __name__ == "__main__":
+    from jp_storage import SqliteStorage
+    n, path = int(sys.argv[1]), sys.argv[2]
+    start = time.perf_counter()
+    df = make_deck_frame(n)
+    SqliteStorage(path).replace_all(df)
+    print(f"{n} rows -> {path} ({time.perf_counter() - start:.2f}s)")
@@ -0,0 +1,118 @@
+import time
+
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+from streamlit.connections import BaseConnection
+
+# --- 離線替身：in-process 的 Google Sheets ---
+# 實作 GSheetsStorage 用到的 GSheetsConnection / gspread 介面 (read、worksheet、batch_update、append_rows ...)，
+# 資料存在記憶體。每次 API 呼叫可加上固定延遲 (模擬網路往返)。
+# 用法: 在執行 App 前把 streamlit_gsheets.GSheetsConnection 換成 FakeSheetsConnection，並以 FakeSpreadsheet.load 放入題庫
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title, values=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.values = values or [] # list of list of str (第 1 列為表頭)
+
+    def _call(self):
+        self.spreadsheet.calls += 1
+        if self.spreadsheet.latency: time.sleep(self.spreadsheet.latency)
+
+    def get_all_values(self):
+        self._call()
+        return [list(r) for r in self.values]
+
+    def row_values(self, row):
+        self._call()
+        return list(self.values[row - 1]) if row <= len(self.values) else []
+
+    def col_values(self, col):
+        self._call()
+        return [r[col - 1] if col <= len(r) else "" for r in self.values]
+
+    def batch_get(self, ranges):
+        # 只支援單列範圍 (A5:F5)
+        self._call()
+        result = []
+        for r in ranges:
+            row = int(r.split(":")[0].lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+            result.append([list(self.values[row - 1])] if row <= len(self.values) else [])
+        return result
+
+    def append_row(self, values):
+        return self.append_rows([values])
+
+    def append_rows(self, rows):
+        self._call()
+        first = len(self.values) + 1
+        self.values.extend([str(v) for v in r] for r in rows)
+        return {"updates": {"updatedRange": f"{self.title}!A{first}:Z{len(self.values)}", "updatedRows": len(rows)}}
+
+    def batch_update(self, updates):
+        # 只支援 A1 / A1:E1 形式 (GSheetsStorage 寫入的格式)
+        self._call()
+        for u in updates:
+            start = u["range"].split("!")[-1].split(":")[0]
+            col_letters = start.rstrip("0123456789")
+            row = int(start[len(col_letters):])
+            col = 0
+            for ch in col_letters: col = col * 26 + ord(ch) - 64
+            for r_off, values in enumerate(u["values"]):
+                while len(self.values) < row + r_off: self.values.append([])
+                line = self.values[row + r_off - 1]
+                for c_off, v in enumerate(values):
+                    while len(line) < col + c_off: line.append("")
+                    line[col + c_off - 1] = str(v)
+
+
+class FakeSpreadsheet:
+    # 整個 process 共用一份 (同 Streamlit 的 connection 快取)
+    current = None
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.sheets = {}
+
+    @classmethod
+    def load(cls, df, latency=0.0):
+        book = cls(latency)
+        values = [list(df.columns)] + df.astype(str).values.tolist()
+        book.sheets["Sheet1"] = FakeWorksheet(book, "Sheet1", values)
+        cls.current = book
+        return book
+
+    def get_worksheet(self, index):
+        return list(self.sheets.values())[index]
+
+    def worksheet(self, title):
+        ws = self.sheets.get(title)
+        if ws is None: raise WorksheetNotFound(title)
+        return ws
+
+    def add_worksheet(self, title, rows=1, cols=1):
+        ws = self.sheets[title] = FakeWorksheet(self, title)
+        return ws
+
+
+class _FakeClient:
+    def _open_spreadsheet(self):
+        return FakeSpreadsheet.current
+
+    def _select_worksheet(self):
+        return FakeSpreadsheet.current.sheets["Sheet1"]
+
+
+class FakeSheetsConnection(BaseConnection[_FakeClient]):
+    def _connect(self, **kwargs):
+        return _FakeClient()
+
+    @property
+    def client(self):
+        return self._instance
+
+    def read(self, ttl=None, **kwargs):
+        values = FakeSpreadsheet.current.sheets["Sheet1"].get_all_values()
+        return pd.DataFrame(values[1:], columns=values[0])
@@ -0,0 +1,122 @@
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deckgen import make_deck_frame
+from jp_deck_cache import DeckCache
+from jp_quiz import QuizEngine
+from jp_reviewlog import ReviewLog
+from jp_storage import SqliteStorage
+
+# --- 多 process 同時作答的 SRS 寫回壓力測試 (本機 SQLite) ---
+# 每個 process 是一位學習者 (各自的 DeckCache + Session)，在同一份題庫上只答對、每 N 題寫回一次。
+# 題庫沒有初始進度，所以每張卡片最後的 Reps 必須等於所有 process 對它作答的總次數 (review_log)；
+# 少掉的就是被別人覆蓋的更新。--blind 改用舊的無條件覆寫，對照沒有 compare-and-set 時的結果。
+# --journal：作答先寫入各 process 自己的本機紀錄 (jp_reviewlog)，寫回時由紀錄壓縮。
+# 用法: python benchmarks/stress_srs.py [--procs 4] [--answers 300] [--rows 60] [--flush-every 5] [--blind | --journal]
+
+
+def blind_save(storage, records, log):
+    # 舊版寫法：不比對列版本，最後寫入的覆蓋前面的
+    with sqlite3.connect(storage.path, timeout=30) as db:
+        db.executemany("INSERT INTO srs (key, next_review, interval, reps, weak) VALUES (?, ?, ?, ?, ?) "
+                       "ON CONFLICT (key) DO UPDATE SET next_review = excluded.next_review, "
+                       "interval = excluded.interval, reps = excluded.reps, weak = excluded.weak",
+                       [(r["key"], r["next_review"], r["interval"], r["reps"], r["weak"]) for r in records])
+    storage.append_log(log)
+    return {r["key"]: r["version"] for r in records}, {}
+
+
+def learner(path, seed, answers, flush_every, blind, journal, barrier, out):
+    storage = SqliteStorage(path)
+    counts = {"saves": 0, "conflicts": 0}
+    log = ReviewLog(os.path.join(os.path.dirname(path), f"log{seed}")) if journal else None
+
+    def save(records, log):
+        counts["saves"] += 1
+        if blind: return blind_save(storage, records, log)
+        written, conflicts = storage.save_srs(records)
+        storage.append_log(log)
+        counts["conflicts"] += len(conflicts)
+        return written, conflicts
+
+    class Counting:
+        # 壓縮時經由這裡寫回，計算衝突次數
+        def __getattr__(self, name): return getattr(storage, name)
+
+        def save_srs(self, records):
+            counts["saves"] += 1
+            written, conflicts = storage.save_srs(records)
+            counts["conflicts"] += len(conflicts)
+            return written, conflicts
+
+    def compact():
+        log.compact(Counting())
+        return True
+
+    cache = DeckCache(storage.load_all, "random", storage.load_delta, storage.load_srs)
+    session = QuizEngine(cache, save, flush_every=flush_every, flush_interval=1e9, journal=log,
+                         compact=compact if journal else None).session(random.Random(seed))
+    barrier.wait()
+    try:
+        for _ in range(answers):
+            q = session.next_question()
+            session.submit(sorted(b['id'] for b in q.parsing) if q.mode == 6 else q.correct)
+            time.sleep(0) # 讓其他 process 有機會插隊
+        while not session.flush(): pass
+        while log is not None and log.compact(Counting())["carried"]: pass # 衝突超過重試次數時留下的作答
+    except Exception as e:
+        counts["error"] = repr(e)
+    out.put(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--answers", type=int, default=300, help="每個 process 的作答題數")
+    # 每張卡片連續答對十幾次後間隔會超過 date 的範圍，列數不要太少
+    parser.add_argument("--rows", type=int, default=60, help="題庫列數 (越少越容易撞在同一張卡片)")
+    parser.add_argument("--flush-every", type=int, default=5)
+    parser.add_argument("--blind", action="store_true", help="無條件覆寫 (舊版行為)")
+    parser.add_argument("--journal", action="store_true", help="經由本機作答紀錄壓縮寫回")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="jp_stress_"), "deck.db")
+    SqliteStorage(path).replace_all(make_deck_frame(args.rows, scheduled_ratio=0, weak_ratio=0))
+
+    ctx = mp.get_context("spawn")
+    barrier, out = ctx.Barrier(args.procs + 1), ctx.Queue()
+    procs = [ctx.Process(target=learner,
+                         args=(path, i, args.answers, args.flush_every, args.blind, args.journal, barrier, out))
+             for i in range(args.procs)]
+    for p in procs: p.start()
+    barrier.wait()
+    start = time.perf_counter()
+    counts = [out.get() for _ in procs]
+    elapsed = time.perf_counter() - start
+    for p in procs: p.join()
+    errors = [c["error"] for c in counts if "error" in c]
+    if errors: sys.exit(f"learner 失敗: {errors[0]}")
+
+    with sqlite3.connect(path) as db:
+        reviews = dict(db.execute("SELECT key, COUNT(*) FROM review_log WHERE correct = 1 GROUP BY key"))
+        reps = dict(db.execute("SELECT key, reps FROM srs"))
+    lost = sum(n - reps.get(k, 0) for k, n in reviews.items())
+    total = sum(reviews.values())
+    name = "無條件覆寫" if args.blind else "本機紀錄 + 壓縮" if args.journal else "compare-and-set"
+    print(f"{name}：{args.procs} 個 process x {args.answers} 題，"
+          f"{len(reviews)} 張卡片，{total / elapsed:,.0f} 題/秒")
+    print(f"寫回 {sum(c['saves'] for c in counts)} 次，衝突合併 {sum(c['conflicts'] for c in counts)} 次")
+    print(f"遺失的更新 {lost} / {total}" + (" ✅" if lost == 0 else " ❌"))
+    sys.exit(0 if lost == 0 or args.blind else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,251 +1,167 @@
 import streamlit as st
 import pandas as pd
-import random
-import asyncio
-import edge_tts
-from io import BytesIO
-import speech_recognition as sr
 from streamlit_mic_recorder import mic_recorder
-import pykakasi 
-from datetime import datetime, timedelta
+from datetime import datetime
+import os
 import re
-import difflib
+import uuid
 from streamlit_gsheets import GSheetsConnection
+from jp_storage import create_storage
+from jp_deck_cache import DeckCache
+from jp_deckpack import DeckPack, pack_source
+from jp_reviewlog import ReviewLog
+from jp_grade import opcodes
+from jp_stats import FORECAST_DAYS, INTERVAL_LABELS, workload_stats
+from jp_quiz import CHOICE_MODES, SPEECH_MODES, QuizEngine
+from jp_batch import BatchJournal
+from jp_audio import SYNTH_BACKENDS, AudioCache, PackedAudioStore, TTSService
+from jp_speech import RECOGNIZER_BACKENDS, SpeechService
+from jp_perf import PERF, timed
 
 # --- 設定區 ---
-# 不再需要 DATA_FILENAME, MISTAKE_FILENAME 等，全部由 Google Sheets 管理
-TEMP_AUDIO_FILE = "temp_jp_voice.mp3"
-
-# --- 1. Google Sheets 核心連線與讀寫 ---
+# 題庫後端：gsheets (預設) / sqlite (本機) / xlsx (唯讀，讀取 Phrases.xlsx)
+STORAGE_BACKEND = os.environ.get("JP_STORAGE", "gsheets")
+SQLITE_PATH = os.environ.get("JP_SQLITE_PATH", "jp_deck.db")
+XLSX_PATH = os.environ.get("JP_XLSX_PATH", "Phrases.xlsx")
+DECK_PACK_DIR = ".jp_deck_pack" # jp_deckpack.py 編譯好的題庫 (若存在且來源相同，啟動時改用 mmap 載入)
+
+# 語音快取：記憶體 LRU + 磁碟 (整個 process 共用)
+AUDIO_CACHE_DIR = ".jp_audio_cache"
+AUDIO_MEM_BUDGET = 32 * 1024 * 1024
+AUDIO_DISK_BUDGET = 512 * 1024 * 1024
+AUDIO_PACK_DIR = ".jp_audio_pack" # jp_presynth.py 預先合成的語音包 (若存在)
+TTS_BACKEND = os.environ.get("JP_TTS", "edge") # edge / stub (離線替身)
+PREFETCH_DEPTH = 3 # 預先準備的題數
+DISTRACTOR_STRATEGY = os.environ.get("JP_DISTRACTORS", "random") # random / hard (字形相近的干擾項)
+
+# 口說題語音辨識：在背景 worker 執行，畫面每 ASR_POLL_SEC 秒檢查一次結果
+ASR_BACKEND = os.environ.get("JP_ASR", "google") # google / stub (離線替身)
+ASR_TIMEOUT_SEC = 15
+ASR_POLL_SEC = 0.5
+ASR_TOLERANCE = float(os.environ.get("JP_ASR_TOLERANCE", "0.15")) # 口說題可容許的辨識錯誤比例 (編輯距離 / 長度)；打字題須完全一致
+
+# 效能面板 (各 span 的 p50 / p95 / p99)：預設隱藏，設 JP_PERF_PANEL=1 或在網址加上 ?perf=1 顯示
+# JP_PERF_LOG=<路徑> 時每筆量測另外以 JSONL 寫入該檔 (見 jp_perf)
+PERF_PANEL = os.environ.get("JP_PERF_PANEL") == "1"
+
+PRIORITY_MSG = {"due": "🔥 今日到期 (SRS)", "weak": "💀 錯題複習 (Weak)",
+                "new": "✨ 新題目", "random": "🎲 隨機練習"}
+
+# 延遲寫回 (Write-behind)：答題只改記憶體，累積後只把變動的儲存格批次寫回
+FLUSH_EVERY_N_ANSWERS = 10  # 累積 N 題後寫回
+FLUSH_INTERVAL_SEC = 120    # 距上次寫回超過 N 秒後寫回
+# 每次作答先寫入本機的 append-only 紀錄 (jp_reviewlog)，寫回時整批壓縮進 SRS 表；唯讀題庫不使用
+REVIEW_LOG_DIR = os.environ.get("JP_REVIEW_LOG", ".jp_review_log")
+
+# 批次練習：一次準備 N 題 (含語音)，作答之間不做 I/O，結束時整批寫回；進度記在本機日誌，當機重開後接續
+BATCH_SIZE = 20
+BATCH_CHECKPOINT_EVERY = 0 # 批次中每 N 題寫回一次；0 = 批次結束時一次寫回
+BATCH_JOURNAL_PATH = os.environ.get("JP_BATCH_JOURNAL", ".jp_batch.jsonl") # 實際檔名加上學習者 id (.jp_batch.<id>.jsonl)
+
+# --- 1. 題庫儲存後端 (Google Sheets / SQLite / Phrases.xlsx) ---
 
 def get_db_connection():
     return st.connection("gsheets", type=GSheetsConnection)
 
+@st.cache_resource
+def get_storage():
+    return create_storage(STORAGE_BACKEND, get_db_connection, SQLITE_PATH, XLSX_PATH)
+
+@st.cache_resource
+def get_deck_cache():
+    pack = DeckPack.open_if_exists(DECK_PACK_DIR, pack_source(get_storage()))
+    return DeckCache(load_data_from_sheet, DISTRACTOR_STRATEGY, load_delta_from_sheet, load_srs_from_storage, pack,
+                     get_review_log())
+
+@st.cache_resource
+def get_review_log():
+    return None if get_storage().read_only or not REVIEW_LOG_DIR else ReviewLog(REVIEW_LOG_DIR)
+
+def get_learner_id():
+    # 學習者 id 放在網址 (?learner=...)：重新整理 / 當機後開同一個網址可接續自己的批次，新分頁 / 其他人各自一個
+    learner = st.query_params.get("learner", "")
+    if not re.fullmatch(r"[0-9a-f]{12}", learner):
+        learner = st.query_params["learner"] = uuid.uuid4().hex[:12]
+    return learner
+
+def get_batch_journal():
+    # 每個 session 一個 (不在 process 間共用)
+    if 'batch_journal' not in st.session_state:
+        learner = get_learner_id()
+        root, ext = os.path.splitext(BATCH_JOURNAL_PATH)
+        st.session_state.batch_journal = BatchJournal(f"{root}.{learner}{ext}", learner)
+    return st.session_state.batch_journal
+
+@timed("load_data_from_sheet")
 def load_data_from_sheet():
-    conn = get_db_connection()
+    storage = get_storage()
     try:
-        # read(ttl=0) 確保每次都讀取最新資料，不快取
-        df = conn.read(ttl=0)
-        
-        # 補齊必要欄位，防止新 Sheet 缺少欄位報錯
-        expected_cols = ["Sentence", "Translation", "Group", "Parsing", 
-                         "Vocab List", "Meaning", "Time", "Weak", 
-                         "Next_Review", "Interval", "Reps"]
-        
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = None
-        
-        # 資料清理
-        df = df.fillna("")
-        return df
+        return storage.load_all()
     except Exception as e:
-        st.error(f"Google Sheets 連線失敗: {e}")
+        st.error(f"題庫讀取失敗 ({storage.name}): {e}")
         return pd.DataFrame()
 
-def save_data_to_sheet(df):
-    conn = get_db_connection()
+def load_delta_from_sheet(since):
+    # 只取上次讀取後有變動的列 (後端不支援時回傳整份，由 DeckCache 逐列比對)
+    storage = get_storage()
     try:
-        conn.update(data=df)
+        return storage.load_delta(since)
     except Exception as e:
-        st.error(f"寫入 Google Sheets 失敗: {e}")
+        st.error(f"題庫讀取失敗 ({storage.name}): {e}")
+        return pd.DataFrame()
 
-# --- 2. 資料解析 (DataFrame -> App 格式) ---
+def load_srs_from_storage(since):
+    # 每張卡片的 SRS 狀態 (獨立的 SRS 表)；失敗時沿用題庫列上的值
+    storage = get_storage()
+    try:
+        return storage.load_srs(since)
+    except Exception as e:
+        st.error(f"SRS 讀取失敗 ({storage.name}): {e}")
+        return None
+
+@timed("save_srs_to_storage")
+def save_srs_to_storage(records, log_records):
+    # 回傳 DeckStorage.save_srs 的 (written, conflicts)；失敗回傳 None (由 Session 保留佇列)
+    storage = get_storage()
+    if storage.read_only: return {r["key"]: r["version"] for r in records}, {} # 唯讀題庫：進度只留在本次 session
+    try:
+        result = storage.save_srs(records)
+    except Exception as e:
+        st.error(f"寫入題庫失敗 ({storage.name}): {e}")
+        return None
+    try:
+        # SRS 已寫入：作答紀錄失敗也回傳結果，否則 Session 會把自己剛寫入的版本當成衝突再重算一次
+        storage.append_log(log_records)
+    except Exception as e:
+        st.error(f"作答紀錄寫入失敗 ({storage.name}): {e}")
+    return result
 
-def parse_data(df):
-    sentence_data = [] 
-    vocab_data = []    
-    group_map = {}     
-    
-    all_sentence_translations = []
-    all_vocab_meanings = []
-    
-    srs_map = {} # 用來快速查找 SRS 狀態
-    mistakes_list = [] # 用來快速查找錯題
-
-    default_date = datetime.now().strftime("%Y-%m-%d")
-
-    for idx, row in df.iterrows():
-        # --- 通用欄位處理 ---
-        time_str = str(row.get('Time', default_date)).strip()
-        if not time_str: time_str = default_date
-        try:
-             # 嘗試正規化日期
-             time_str = pd.to_datetime(time_str).strftime("%Y-%m-%d")
-        except: pass
-
-        # --- SRS 數據讀取 ---
-        next_review = str(row.get('Next_Review', '')).strip()
-        if not next_review: next_review = default_date # 預設今天
-        try:
-            next_review = pd.to_datetime(next_review).strftime("%Y-%m-%d")
-        except: next_review = default_date
-
-        try:
-            interval = int(float(row.get('Interval', 0) or 0))
-            reps = int(float(row.get('Reps', 0) or 0))
-        except:
-            interval = 0
-            reps = 0
-
-        is_weak = str(row.get('Weak', '')).strip().lower() in ['yes', 'true', '1']
-
-        # --- 句子解析 ---
-        s_ja = str(row.get('Sentence', '')).strip()
-        s_ch = str(row.get('Translation', '')).strip()
-        gid  = str(row.get('Group', '')).strip()
-        
-        # Parsing 處理
-        parsing_raw = str(row.get('Parsing', '')).strip().replace('＋', '+')
-        
-        if s_ja:
-            # 建立句子資料
-            item = {
-                "type": "sentence",
-                "sentence": s_ja,
-                "translation": s_ch,
-                "group": gid,
-                "parsing": [p.strip() for p in parsing_raw.split('+') if p.strip()],
-                "start_date": time_str,
-                "row_idx": idx # 記住 Row Index 以便更新
-            }
-            sentence_data.append(item)
-            all_sentence_translations.append(s_ch)
-            
-            if gid:
-                if gid not in group_map: group_map[gid] = []
-                if s_ja not in group_map[gid]: group_map[gid].append(s_ja)
-            
-            # 存入 SRS Map (Key: Sentence)
-            srs_map[s_ja] = {"next_review": next_review, "interval": interval, "reps": reps, "row_idx": idx}
-            if is_weak: mistakes_list.append(s_ja)
-
-        # --- 單字解析 ---
-        v_list_raw = str(row.get('Vocab List', '')).strip()
-        m_list_raw = str(row.get('Meaning', '')).strip()
-        
-        if v_list_raw and m_list_raw:
-            v_items = [x.strip() for x in v_list_raw.split('。') if x.strip()]
-            m_items = [x.strip() for x in m_list_raw.split('。') if x.strip()]
-            
-            if len(v_items) == len(m_items):
-                for i, v_str in enumerate(v_items):
-                    if '｜' in v_str:
-                        kanji, reading = v_str.split('｜', 1)
-                    else:
-                        kanji, reading = v_str, v_str
-                    
-                    kanji = kanji.strip()
-                    
-                    # ⚠️ 注意：單字目前共用同一行的 SRS 數據
-                    # 若要精確追蹤每個單字，Sheet 結構需改變。目前簡化為：單字題更新整行數據。
-                    v_item = {
-                        "type": "vocab",
-                        "kanji": kanji,
-                        "reading": reading.strip(),
-                        "meaning": m_items[i],
-                        "start_date": time_str,
-                        "row_idx": idx 
-                    }
-                    vocab_data.append(v_item)
-                    all_vocab_meanings.append(m_items[i])
-                    
-                    # 存入 SRS Map (Key: Kanji)
-                    # 注意：如果同一行有多個單字，Key 不同但 Row Index 相同
-                    srs_map[kanji] = {"next_review": next_review, "interval": interval, "reps": reps, "row_idx": idx}
-                    if is_weak: mistakes_list.append(kanji)
-
-    return sentence_data, vocab_data, group_map, (all_sentence_translations, all_vocab_meanings), srs_map, mistakes_list
-
-# --- 3. SRS 更新邏輯 (寫回 DataFrame 並上傳) ---
-
-def update_srs_status_sheet(key, is_correct, row_idx):
-    df = st.session_state.raw_df # 取得目前的 DataFrame
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    
-    # 讀取當前數值
+@timed("compact_review_log")
+def compact_review_log():
+    # 本機作答紀錄整批寫回 SRS 表與作答紀錄表；失敗時紀錄留在本機，下次再試 (SRS 已寫入的部分不會重複套用)
+    storage = get_storage()
     try:
-        current_interval = int(float(df.at[row_idx, "Interval"] or 0))
-        current_reps = int(float(df.at[row_idx, "Reps"] or 0))
-    except:
-        current_interval = 0
-        current_reps = 0
-    
-    if is_correct:
-        # 答對：拉長間隔
-        if current_interval == 0: new_interval = 1
-        elif current_interval == 1: new_interval = 3
-        else: new_interval = int(current_interval * 2.2)
-        new_reps = current_reps + 1
-        is_weak = "No" # 答對移除 Weak 標記
-    else:
-        # 答錯：重置
-        new_interval = 0
-        new_reps = 0
-        is_weak = "Yes" # 標記為 Weak
-        
-    next_date = datetime.now() + timedelta(days=new_interval)
-    new_next_review = next_date.strftime("%Y-%m-%d")
-    
-    # 更新 DataFrame
-    df.at[row_idx, "Interval"] = new_interval
-    df.at[row_idx, "Reps"] = new_reps
-    df.at[row_idx, "Next_Review"] = new_next_review
-    df.at[row_idx, "Weak"] = is_weak
-    
-    # 寫回 Google Sheets
-    # 為了效能，這裡每次答題都寫入。若覺得慢，可改為只更新 session_state df，另設一顆按鈕「儲存進度」
-    save_data_to_sheet(df)
-    
-    # 更新 Session State 中的暫存，以免頁面沒重整讀到舊資料
-    st.session_state.raw_df = df
-    # 同步更新 srs_map
-    if key in st.session_state.srs_map:
-        st.session_state.srs_map[key] = {
-            "next_review": new_next_review,
-            "interval": new_interval,
-            "reps": new_reps,
-            "row_idx": row_idx
-        }
-    
-    # 同步更新 mistakes_list
-    if is_correct:
-        if key in st.session_state.mistakes_list:
-            st.session_state.mistakes_list.remove(key)
-    else:
-        if key not in st.session_state.mistakes_list:
-            st.session_state.mistakes_list.append(key)
-            
-    return new_interval, new_next_review
+        get_review_log().compact(storage)
+    except Exception as e:
+        st.error(f"寫入題庫失敗 ({storage.name}): {e}")
+        return False
+    return True
 
-# --- 4. 輔助工具 (TTS, Diff, Kakasi) ---
+# --- 2. 資料解析：見 jp_deck.parse_data (process 共用快取見 jp_deck_cache) ---
 
-async def _edge_tts_save(text, voice="ja-JP-KeitaNeural"):
-    try:
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save(TEMP_AUDIO_FILE)
-        return True
-    except Exception as e: return False
+# --- 3. 選題 / 判分 / SRS 更新 / 延遲寫回：見 jp_quiz (本檔只負責畫面) ---
 
-def get_audio_bytes(text):
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        success = loop.run_until_complete(_edge_tts_save(text))
-        if success:
-            with open(TEMP_AUDIO_FILE, "rb") as f: return f.read()
-    except: pass
-    return None
-
-def get_hiragana(text):
-    kks = pykakasi.kakasi()
-    result = kks.convert(text)
-    return "".join([item['hira'] for item in result])
+# --- 4. 輔助工具 (TTS, Diff, Kakasi) ---
 
+@st.cache_resource
+def get_tts():
+    pack = PackedAudioStore.open_if_exists(AUDIO_PACK_DIR)
+    return TTSService(AudioCache(AUDIO_MEM_BUDGET, AUDIO_CACHE_DIR, AUDIO_DISK_BUDGET, pack), SYNTH_BACKENDS[TTS_BACKEND])
+
+@timed("generate_diff")
 def generate_diff(user_text, target_text):
-    s = difflib.SequenceMatcher(None, user_text, target_text)
     html = []
-    for opcode, a0, a1, b0, b1 in s.get_opcodes():
+    for opcode, a0, a1, b0, b1 in opcodes(user_text, target_text):
         if opcode == 'equal': html.append(f"<span style='color:green; font-weight:bold'>{target_text[b0:b1]}</span>")
         elif opcode == 'insert': html.append(f"<span style='color:red; text-decoration:underline; background-color:#ffe6e6'>[{target_text[b0:b1]}]</span>")
         elif opcode == 'delete': html.append(f"<span style='color:gray; text-decoration:line-through'>{user_text[a0:a1]}</span>")
@@ -254,212 +170,93 @@ def generate_diff(user_text, target_text):
             html.append(f"<span style='color:red; background-color:#ffe6e6'>[{target_text[b0:b1]}]</span>")
     return "".join(html)
 
-def transcribe_audio_bytes(audio_bytes):
-    r = sr.Recognizer()
-    try:
-        with sr.AudioFile(BytesIO(audio_bytes)) as source:
-            audio_data = r.record(source)
-            return r.recognize_google(audio_data, language='ja-JP')
-    except: return "Not Recognized"
+@st.cache_resource
+def get_speech():
+    return SpeechService(RECOGNIZER_BACKENDS[ASR_BACKEND], timeout=ASR_TIMEOUT_SEC)
+
+@st.cache_resource
+def get_quiz_engine():
+    journal = get_review_log()
+    return QuizEngine(get_deck_cache(), save_srs_to_storage, get_tts(), get_speech(),
+                      FLUSH_EVERY_N_ANSWERS, FLUSH_INTERVAL_SEC, PREFETCH_DEPTH,
+                      journal, compact_review_log if journal is not None else None,
+                      {mode: ASR_TOLERANCE for mode in SPEECH_MODES})
+
+def poll_transcription():
+    # 辨識完成就判分 (見 Session.poll_speech) 並重新整理整頁；失敗時留在本題，可重錄或 Skip
+    quiz = st.session_state.quiz
+    status, _ = quiz.poll_speech()
+    if status is None: return
+    if status == "pending":
+        st.write("👂 辨識中...")
+        if st.button("✖️ 取消辨識"):
+            quiz.cancel_speech()
+            st.rerun()
+        return
+    st.rerun()
 
 # --- 5. 初始化與狀態管理 ---
 
-if 'initialized' not in st.session_state:
+if 'quiz' not in st.session_state:
     with st.spinner("正在連線至 Google Sheets..."):
-        df = load_data_from_sheet()
-        st.session_state.raw_df = df # 保留原始 DF 以便寫回
-        
-        s_data, v_data, g_map, pools, srs_map, m_list = parse_data(df)
-        
-        st.session_state.sentence_data = s_data
-        st.session_state.vocab_data = v_data
-        st.session_state.group_map = g_map
-        st.session_state.trans_pool = pools[0]
-        st.session_state.meaning_pool = pools[1]
-        
-        st.session_state.srs_map = srs_map
-        st.session_state.mistakes_list = m_list
-        
-        st.session_state.current_q = None
-        st.session_state.mode = None
-        st.session_state.feedback = None
-        st.session_state.audio_data = None
-        st.session_state.user_audio_bytes = None
-        st.session_state.options = []
-        st.session_state.shuffled_parsing = []
-        st.session_state.selected_indices = []
-        
-        st.session_state.initialized = True
-
-# --- 6. 核心選題邏輯 ---
-
-def pick_new_question():
-    st.session_state.selected_indices = [] 
-    st.session_state.shuffled_parsing = []
-    st.session_state.feedback = None
-    st.session_state.user_audio_bytes = None
-
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    srs_map = st.session_state.srs_map
-    mistakes = st.session_state.mistakes_list
-
-    # 分類
-    due_items = []
-    new_items = []
-
-    # 檢查句子
-    for item in st.session_state.sentence_data:
-        key = item['sentence']
-        if key in srs_map:
-            if srs_map[key]['next_review'] <= today_str:
-                due_items.append(item)
-        elif item['start_date'] <= today_str:
-            new_items.append(item)
-
-    # 檢查單字
-    for item in st.session_state.vocab_data:
-        key = item['kanji']
-        if key in srs_map:
-            if srs_map[key]['next_review'] <= today_str:
-                due_items.append(item)
-        elif item['start_date'] <= today_str:
-            new_items.append(item)
-
-    # 優先級
-    q_item = None
-    priority_msg = ""
-
-    if due_items:
-        q_item = random.choice(due_items)
-        priority_msg = "🔥 今日到期 (SRS)"
-    elif mistakes and random.random() < 0.7:
-        target_key = random.choice(mistakes)
-        q_item = next((i for i in st.session_state.sentence_data if i['sentence'] == target_key), None)
-        if not q_item:
-            q_item = next((i for i in st.session_state.vocab_data if i['kanji'] == target_key), None)
-        priority_msg = "💀 錯題複習 (Weak)"
-    elif new_items:
-        q_item = random.choice(new_items)
-        priority_msg = "✨ 新題目"
-    else:
-        all_pool = st.session_state.sentence_data + st.session_state.vocab_data
-        if all_pool:
-            q_item = random.choice(all_pool)
-            priority_msg = "🎲 隨機練習"
-        else:
-            st.error("Google Sheets 沒有有效資料！")
-            return
+        # 題庫內容整個 process 共用一份 (唯讀)；Session 只持有自己的 SRS 變動
+        st.session_state.quiz = get_quiz_engine().session()
+        # 上次的批次沒做完 (當機 / 關閉) 就接續
+        if st.session_state.quiz.resume_batch(get_batch_journal()) is not None: st.toast("📦 已接續上次中斷的批次")
+        st.session_state.selected_indices = [] # 模式 6 已選的字卡 (畫面狀態)
+        st.session_state.feedback = None       # (作答結果, 回饋訊息)
 
-    st.session_state.priority_msg = priority_msg
-    
-    # 決定模式
-    if q_item['type'] == 'sentence':
-        available_modes = [1, 2, 3, 5, 6, 9]
-        if q_item['group'] in st.session_state.group_map and len(st.session_state.group_map[q_item['group']]) >= 2:
-            available_modes.append(4)
-        mode = random.choice(available_modes)
-    else:
-        mode = random.choice([7, 8, 10])
-
-    setup_question(q_item, mode)
-
-def setup_question(q_item, mode):
-    st.session_state.current_q = q_item
-    st.session_state.mode = mode
-    
-    is_vocab_mode = mode in [7, 8, 10]
-    
-    # Audio
-    if mode in [3, 5, 8, 9, 10]:
-        text_to_speak = q_item['kanji'] if is_vocab_mode else q_item['sentence']
-        st.session_state.audio_data = get_audio_bytes(text_to_speak)
-        
-    # Options Generation (略為簡化，與原邏輯相同)
-    if mode in [1, 2, 3, 4, 8]:
-        pool = []
-        correct = ""
-        if mode in [1, 3]: 
-            correct = q_item['translation']
-            pool = st.session_state.trans_pool
-        elif mode == 2:
-            correct = q_item['sentence']
-            pool = [i['sentence'] for i in st.session_state.sentence_data]
-        elif mode == 8:
-            correct = q_item['meaning']
-            pool = st.session_state.meaning_pool
-        elif mode == 4:
-            # Group Logic
-            gid = q_item['group']
-            correct = random.choice([s for s in st.session_state.group_map[gid] if s != q_item['sentence']])
-            other_gids = [g for g in st.session_state.group_map if g != gid]
-            pool = []
-            for og in other_gids: pool.extend(st.session_state.group_map[og])
-        
-        # Safe sample
-        distractors = random.sample([x for x in pool if x != correct], min(3, len(pool)))
-        final_opts = distractors + [correct]
-        random.shuffle(final_opts)
-        st.session_state.options = final_opts
+quiz = st.session_state.quiz
+
+# --- 6. 操作 (轉給 Session) ---
 
-    # Parsing setup
-    if mode == 6:
-        raw_parts = q_item['parsing'].copy() if q_item['parsing'] else [q_item['sentence']]
-        indexed_parts = [{'id': i, 'text': t} for i, t in enumerate(raw_parts)]
-        random.shuffle(indexed_parts)
-        st.session_state.shuffled_parsing = indexed_parts
+def next_question():
+    # 「下一題」：Session 會先檢查是否該寫回，再選題
+    st.session_state.selected_indices = []
+    batch = quiz.batch
+    if quiz.next_question() is None: st.error("Google Sheets 沒有有效資料！")
+    if batch is not None and batch.done: st.session_state.batch_done = batch.progress()
 
-# --- 7. 作答檢查與回寫 ---
+def start_batch(n, checkpoint_every):
+    with st.spinner("準備題目與語音..."):
+        quiz.start_batch(n, get_batch_journal(), checkpoint_every)
+    next_question()
 
 def check_answer(user_input):
-    if st.session_state.feedback is not None: return
-    item = st.session_state.current_q
-    mode = st.session_state.mode
-    
-    # 標準化答案
-    user_clean = str(user_input).replace(" ", "").replace("　", "")
-    target = item['translation'] if mode in [1,3] else (item['meaning'] if mode == 8 else (item['reading'] if mode == 7 else item['sentence'] if item['type']=='sentence' else item['kanji']))
-    
-    # 比對
-    is_correct = False
-    if mode == 4: is_correct = (user_input in st.session_state.group_map.get(item['group'], []))
-    elif mode in [1, 2, 3, 8]: is_correct = (user_clean == str(target).replace(" ", ""))
-    else:
-        def clean_chars(t): return re.sub(r'[。、？！\?!\s　]', '', str(t))
-        is_correct = (get_hiragana(clean_chars(user_input)) == get_hiragana(clean_chars(target)))
-
-    # === 更新 Google Sheets ===
-    key = item['sentence'] if item['type'] == 'sentence' else item['kanji']
-    row_idx = item['row_idx']
-    
-    # 呼叫更新函式
-    new_interval, next_review_date = update_srs_status_sheet(key, is_correct, row_idx)
+    quiz.submit(user_input)
 
-    # 產生回饋訊息
-    msg_type = "success" if is_correct else "error"
-    msg_header = "🎉 正解！" if is_correct else f"❌ 残念... 正解: {target}"
-    
-    detail_html = f"""
-    <br>📅 下次複習: {next_review_date} (間隔: {new_interval} 天)
-    <br>💾 已同步至 Google Sheets
+# --- Mode 6 輔助 ---
+def select_block(idx): st.session_state.selected_indices.append(idx)
+def deselect_block(idx): st.session_state.selected_indices.remove(idx)
+def submit_parsing(): quiz.submit(st.session_state.selected_indices)
+
+def feedback_message(result):
+    # 同一個作答結果只產生一次 (差異比對不隨 rerun 重算)
+    cached = st.session_state.feedback
+    if cached is not None and cached[0] is result: return cached[1]
+    msg = "🎉 正解！" if result["correct"] else f"❌ 残念... 正解: {result['target']}"
+    if 0 < result["score"] < 1: msg += f" (相似度 {result['score']:.0%})"
+    msg += f"""
+    <br>📅 下次複習: {result['next_review']} (間隔: {result['interval']} 天)
+    <br>💾 已暫存，待同步 {result['pending']} 筆
     """
-    
-    st.session_state.feedback = {"type": msg_type, "msg": msg_header + detail_html}
-    
     # 若答錯顯示詳細比較
-    if not is_correct and mode not in [1,2,3,4,8]:
-        st.session_state.feedback["msg"] += f"<br>差異: {generate_diff(str(user_input), str(target))}"
+    if result["show_diff"]: msg += f"<br>差異: {generate_diff(*result['kana'])}"
+    st.session_state.feedback = (result, msg)
+    return msg
 
-    # 播放正確語音
-    speak_text = item['kanji'] if (mode in [7,8,10]) else item['sentence']
-    st.session_state.audio_data = get_audio_bytes(speak_text)
+# --- 7. 題庫增量同步 (任一 session 按了重整) ---
 
-# --- Mode 6 輔助 ---
-def select_block(idx): st.session_state.selected_indices.append(idx)
-def deselect_block(idx): st.session_state.selected_indices.remove(idx)
-def submit_parsing():
-    lookup = {item['id']: item['text'] for item in st.session_state.shuffled_parsing}
-    user_sentence = "".join([lookup[i] for i in st.session_state.selected_indices])
-    check_answer(user_sentence)
+quiz.sync()
+
+def get_workload_stats():
+    # 以 (題庫版本, SRS 版本, 今天) 快取：沒有作答 / 重整時 rerun 不重算
+    deck, srs = quiz.deck, quiz.srs
+    key = (deck.version, srs.version, datetime.now().date())
+    cached = st.session_state.get('stats_cache')
+    if cached is None or cached[0] != key:
+        cached = st.session_state.stats_cache = (key, workload_stats(deck, srs, key[2]))
+    return cached[1]
 
 # --- 8. UI 顯示 ---
 
@@ -467,31 +264,106 @@ st.set_page_config(page_title="雲端日語特訓", page_icon="🇯🇵")
 
 with st.sidebar:
     st.title("☁️ 雲端同步中")
-    srs_map = st.session_state.get('srs_map', {})
-    mistakes = st.session_state.get('mistakes_list', [])
-    today_str = datetime.now().strftime("%Y-%m-%d")
+    counts = quiz.stats()
     
-    due_count = sum(1 for v in srs_map.values() if v['next_review'] <= today_str)
-    st.metric("🔥 今日到期", f"{due_count} 題")
-    st.metric("💀 錯題本 (Weak)", f"{len(mistakes)} 題")
+    st.metric("🔥 今日到期", f"{counts['due']} 題")
+    st.metric("💀 錯題本 (Weak)", f"{counts['weak']} 題")
+    st.metric("⏳ 待同步", f"{counts['pending']} 筆")
+    if get_storage().read_only: st.caption(f"📄 唯讀題庫 ({XLSX_PATH})，進度不會保存")
+    
+    with st.expander("⚡ 語音快取 / 預載"):
+        a = get_tts().cache.stats()
+        st.caption(f"語音命中 {a['hits_mem']} (記憶體) / {a['hits_pack']} (語音包) / {a['hits_disk']} (磁碟)，未命中 {a['misses']}")
+        st.caption(f"記憶體 {a['mem_items']} 筆 {a['mem_bytes'] / 1e6:.1f} MB，磁碟 {a['disk_items']} 筆 {a['disk_bytes'] / 1e6:.1f} MB")
+        p = counts['prefetch']
+        st.caption(f"預載命中 {p['hits']} / 未命中 {p['misses']}，取消 {p['cancelled']}")
+    
+    with st.expander("📊 複習量預測"):
+        stats = get_workload_stats()
+        days = st.radio("預測天數", [30, FORECAST_DAYS], horizontal=True, format_func=lambda d: f"{d} 天")
+        forecast = pd.Series(stats["forecast"][:days], index=pd.date_range(datetime.now().date(), periods=days))
+        st.bar_chart(forecast, height=160)
+        st.caption(f"已排程 {stats['scheduled']} 張 (逾期 {stats['overdue']})，未來 {days} 天平均每天 {forecast.mean():.1f} 張")
+        st.caption("複習間隔 (天)")
+        st.bar_chart(pd.Series(stats["intervals"], index=INTERVAL_LABELS), height=160, sort=False)
+        backlog = stats["new_backlog"]
+        st.caption(f"未排程新卡 {int(backlog.sum())} 張，今天可出題 {stats['new_available']} 張")
+        upcoming = backlog[backlog.index > datetime.now().strftime("%Y-%m-%d")]
+        if len(upcoming): st.bar_chart(upcoming.head(days), height=120)
+        groups = stats["groups"]
+        if len(groups):
+            st.caption(f"各 Group 錯題比例 (共 {len(groups)} 組)")
+            st.dataframe(groups.head(10), hide_index=True, column_config={
+                "cards": "卡片", "weak": "Weak", "weak_ratio": st.column_config.ProgressColumn("比例", min_value=0, max_value=1)})
+
+    with st.expander("📦 批次練習", expanded=counts['batch'] is not None):
+        b = counts['batch']
+        if b is not None and not b['done']:
+            st.progress(b['shown'] / b['total'], text=f"第 {b['shown']} / {b['total']} 題 (答對 {b['correct']} / {b['answered']})")
+            if st.button("⏹️ 結束批次"):
+                st.session_state.batch_done = b
+                quiz.end_batch()
+                next_question()
+                st.rerun()
+        else:
+            n = st.number_input("題數", 5, 100, BATCH_SIZE, step=5)
+            every = st.number_input("每幾題寫回 (0 = 結束時一次寫回)", 0, 100, BATCH_CHECKPOINT_EVERY)
+            st.button("▶️ 開始批次", on_click=start_batch, args=(int(n), int(every)))
+
+    if PERF_PANEL or st.query_params.get("perf") == "1":
+        with st.expander("⏱️ 效能"):
+            rows = PERF.summary()
+            if rows:
+                st.dataframe(pd.DataFrame(rows).set_index("span"))
+                st.caption(f"百分位取自每個 span 最近 {PERF.size} 次")
+            else:
+                st.caption("尚無量測資料")
+            st.download_button("匯出 JSONL", PERF.export_jsonl, "jp_perf.jsonl", "application/jsonl")
+            if PERF.log_path: st.caption(f"持續寫入 {PERF.log_path}")
+
+    if st.button("💾 立即儲存", disabled=(counts['pending'] == 0)):
+        if quiz.flush(): st.toast("已同步至題庫")
     
     if st.button("🔄 強制重整資料"):
+        # 重整前先把未寫回的進度送出，以免遺失
+        if not quiz.flush(): st.stop()
         st.cache_data.clear()
-        del st.session_state.initialized
+        st.session_state.last_sync = get_deck_cache().refresh() # 只解析有變動的列 (版本 +1)
+        quiz.sync()
         st.rerun()
+    
+    sync = st.session_state.get('last_sync')
+    if sync:
+        st.caption(f"上次重整：新增 {sync['added']}、修改 {sync['changed']}、刪除 {sync['removed']} 列，"
+                   f"SRS {sync.get('srs', 0)} 張，{sync['seconds'] * 1000:.0f} ms" + (" (整份重建)" if sync['full'] else ""))
 
 st.title("🇯🇵 日本語智慧特訓 (G-Sheets Ver.)")
 
-if not st.session_state.get('initialized'):
-    st.stop()
+if quiz.deck.parse_issues:
+    with st.expander(f"⚠️ 有 {sum(len(v) for v in quiz.deck.parse_issues.values())} 處資料格式有誤"):
+        for col, rows in quiz.deck.parse_issues.items():
+            # 顯示 Sheet 上的列號 (表頭佔第 1 列)
+            st.write(f"**{col}**: 第 {', '.join(str(r + 2) for r in rows[:50])} 列" + (" ..." if len(rows) > 50 else ""))
+
+done = st.session_state.pop('batch_done', None)
+if done:
+    st.success(f"📦 批次完成：答對 {done['correct']} / {done['answered']} 題" +
+               ("，已寫回題庫" if quiz.batch is None else "，尚未寫回 (之後會再試)"))
 
-if st.session_state.current_q is None:
-    pick_new_question()
+if quiz.question is None:
+    next_question()
+    if quiz.question is None: st.stop()
 
-q = st.session_state.current_q
-mode = st.session_state.mode
+question = quiz.question
+q = question.item
+mode = question.mode
+result = quiz.result
+# 作答後改播正確答案的語音
+audio_data = result["audio"] if result is not None else question.audio
 
-st.info(f"{st.session_state.get('priority_msg')} | Mode {mode}")
+batch = quiz.batch
+st.info(f"{PRIORITY_MSG[question.priority]} | Mode {mode}" +
+        (f" | 📦 {batch.shown} / {len(batch.questions)}" if batch is not None and not batch.done else ""))
 
 # 顯示題目區 (依照模式)
 col1, col2 = st.columns([1, 4])
@@ -500,13 +372,13 @@ with col2:
     elif mode == 2: st.markdown(f"### {q['translation']}")
     elif mode == 3: 
         st.write("請聽音檔：")
-        if st.session_state.audio_data: st.audio(st.session_state.audio_data, format='audio/mpeg')
+        if audio_data: st.audio(audio_data, format='audio/mpeg')
     elif mode == 4: 
         st.subheader(f"題目: {q['sentence']}")
         st.write("👉 請選出意思最相近（同群組）的句子")
     elif mode == 5: 
         st.write("請聽音檔並寫下來：")
-        if st.session_state.audio_data: st.audio(st.session_state.audio_data, format='audio/mpeg')
+        if audio_data: st.audio(audio_data, format='audio/mpeg')
     elif mode == 6: 
         st.markdown(f"### {q['translation']}")
         st.write("請重組句子：")
@@ -515,7 +387,7 @@ with col2:
         st.caption(f"意思: {q['meaning']}")
     elif mode == 8: 
         st.write("請聽單字：")
-        if st.session_state.audio_data: st.audio(st.session_state.audio_data, format='audio/mpeg')
+        if audio_data: st.audio(audio_data, format='audio/mpeg')
     elif mode == 9: 
         st.markdown(f"### {q['sentence']}")
         st.caption(f"意思: {q['translation']}")
@@ -523,43 +395,46 @@ with col2:
 
 st.divider()
 
-has_answered = st.session_state.feedback is not None
+has_answered = result is not None
 
 # 作答區
-if mode in [1, 2, 3, 4, 8]: # 選擇題
+if mode in CHOICE_MODES: # 選擇題
     c1, c2 = st.columns(2)
-    for i, opt in enumerate(st.session_state.options):
+    for i, opt in enumerate(question.options):
         (c1 if i%2==0 else c2).button(opt, key=f"opt_{i}", on_click=check_answer, args=(opt,), disabled=has_answered, use_container_width=True)
 
-elif mode in [9, 10]: # 口說
+elif mode in SPEECH_MODES: # 口說
     if not has_answered:
         col_rec, col_msg = st.columns([1, 3])
         with col_rec:
             audio_blob = mic_recorder(start_prompt="🎙️ 録音", stop_prompt="⏹️ 停止", key='mic', format="wav")
         with col_msg:
-            if audio_blob:
-                res = transcribe_audio_bytes(audio_blob['bytes'])
-                st.write(f"👂: {res}")
-                check_answer(res)
-                st.rerun()
+            # 送進背景辨識 (同一段錄音不重送，見 Session.submit_speech)
+            if audio_blob: quiz.submit_speech(audio_blob['bytes'], audio_blob['id'])
+            job = quiz.asr_job
+            if job is not None and job["status"] == "pending":
+                # 只有這一塊每 ASR_POLL_SEC 秒重跑，直到有結果
+                st.fragment(poll_transcription, run_every=ASR_POLL_SEC)()
+            elif job is not None:
+                st.warning({"unrecognized": "👂 聽不清楚，請再錄一次", "timeout": "⌛ 辨識逾時，請再錄一次",
+                            "cancelled": "已取消辨識"}.get(job["status"], f"辨識失敗: {job.get('result')}"))
         if st.button("😶 Skip"): 
-            pick_new_question()
+            next_question()
             st.rerun()
 
 elif mode == 6: # 重組
-    # (省略部分重複代碼，邏輯同原版，只需確保 selected_indices 運作正常)
     # 顯示已選
     with st.container(border=True):
         ids = st.session_state.selected_indices
         if not ids: st.write("*(點擊下方字卡)*")
         else:
             cols = st.columns(6)
-            lookup = {item['id']: item['text'] for item in st.session_state.shuffled_parsing}
+            lookup = {b['id']: b['text'] for b in question.parsing}
             for i, idx in enumerate(ids):
                 cols[i%6].button(lookup[idx], key=f"sel_{idx}", on_click=deselect_block, args=(idx,), disabled=has_answered)
     
     st.write("⬇️ 待選區")
-    avail = [b for b in st.session_state.shuffled_parsing if b['id'] not in ids]
+    avail = [b for b in question.parsing if b['id'] not in ids]
     if avail:
         cols = st.columns(6)
         for i, b in enumerate(avail):
@@ -579,41 +454,39 @@ else: # 打字
 
 # 回饋區
 # --- 回饋區 (修改版) ---
-if st.session_state.feedback:
-    fb = st.session_state.feedback
+if result is not None:
+    msg = feedback_message(result)
     
     # 1. 顯示答題結果 (綠色/紅色橫幅)
-    if fb['type'] == 'success': 
-        st.success(fb['msg'], icon="✅")
+    if result['correct']: 
+        st.success(msg, icon="✅")
     else: 
-        st.error(fb['msg'], icon="❌")
+        st.error(msg, icon="❌")
     
     # 2. 顯示完整詳解 (日文 + 中文 + 音檔)
     with st.container(border=True):
         st.caption("📖 題目詳解")
-        
-        q_item = st.session_state.current_q
-        
+
         # 根據題目類型顯示不同資訊
         col_text, col_audio = st.columns([3, 1])
         
         with col_text:
-            if q_item['type'] == 'sentence':
-                st.markdown(f"**🇯🇵 日文：**\n### {q_item['sentence']}")
-                st.markdown(f"**🇹🇼 中文：** {q_item['translation']}")
+            if q['type'] == 'sentence':
+                st.markdown(f"**🇯🇵 日文：**\n### {q['sentence']}")
+                st.markdown(f"**🇹🇼 中文：** {q['translation']}")
                 # 如果有 parsing 資料也可以顯示，沒有則略過
-                if q_item.get('parsing'):
-                    st.caption(f"結構: {' | '.join(q_item['parsing'])}")
+                if q.get('parsing'):
+                    st.caption(f"結構: {' | '.join(q['parsing'])}")
             else:
                 # 單字題型
-                st.markdown(f"**🇯🇵 單字：**\n### {q_item['kanji']}")
-                st.markdown(f"**🗣️ 讀音：** {q_item['reading']}")
-                st.markdown(f"**🇹🇼 意思：** {q_item['meaning']}")
+                st.markdown(f"**🇯🇵 單字：**\n### {q['kanji']}")
+                st.markdown(f"**🗣️ 讀音：** {q['reading']}")
+                st.markdown(f"**🇹🇼 意思：** {q['meaning']}")
 
         with col_audio:
-            if st.session_state.audio_data:
+            if audio_data:
                 st.write("🔊 發音")
-                st.audio(st.session_state.audio_data, format='audio/mpeg')
+                st.audio(audio_data, format='audio/mpeg')
 
     # 3. 下一題按鈕
-    st.button("👉 下一題", on_click=pick_new_question, type="primary", use_container_width=True)
\ No newline at end of file
+    st.button("👉 下一題", on_click=next_question, type="primary", use_container_width=True)
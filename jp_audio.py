@@ -0,0 +1,286 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import edge_tts
+
+from jp_perf import span
+
+# --- TTS 語音快取 ---
+# 以 hash(text, voice, rate) 為 Key 的兩層快取：記憶體 LRU (位元組上限) + 磁碟 (容量上限)
+# 語音直接串流進記憶體，不再經過共用的暫存檔
+
+DEFAULT_VOICE = "ja-JP-KeitaNeural"
+DEFAULT_RATE = "+0%"
+
+
+def audio_key(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    return hashlib.sha1(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+
+
+# --- 預先合成的語音包 (jp_presynth.py 產生) ---
+# audio.pack：所有 mp3 依序串接；audio.idx：每筆 32 bytes (sha1 20 + offset 8 + length 4)
+
+PACK_BLOB = "audio.pack"
+PACK_INDEX = "audio.idx"
+_IDX_RECORD = struct.Struct("<20sQI")
+
+
+def _read_index(path):
+    with open(path, "rb") as f: raw = f.read()
+    usable = len(raw) - len(raw) % _IDX_RECORD.size # 中斷時可能留下不完整的最後一筆
+    return {k.hex(): (off, length) for k, off, length in _IDX_RECORD.iter_unpack(raw[:usable])}, usable
+
+
+class PackedAudioStore:
+    # 唯讀，以 mmap 讀取；多個 process 共用同一份 page cache
+    def __init__(self, pack_dir):
+        self.index, _ = _read_index(os.path.join(pack_dir, PACK_INDEX))
+        with open(os.path.join(pack_dir, PACK_BLOB), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        # 忽略超出 blob 大小的索引 (寫入中斷)
+        self.index = {k: v for k, v in self.index.items() if v[0] + v[1] <= size}
+
+    @classmethod
+    def open_if_exists(cls, pack_dir):
+        if pack_dir and os.path.exists(os.path.join(pack_dir, PACK_INDEX)):
+            return cls(pack_dir)
+        return None
+
+    def get(self, key):
+        loc = self.index.get(key)
+        if loc is None: return None
+        return bytes(self._mm[loc[0]:loc[0] + loc[1]])
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+
+class PackedAudioWriter:
+    # 只附加寫入：先寫 blob 再寫索引，中斷後重跑會略過已完成的 Key
+    def __init__(self, pack_dir):
+        os.makedirs(pack_dir, exist_ok=True)
+        idx_path = os.path.join(pack_dir, PACK_INDEX)
+        self.done = set()
+        if os.path.exists(idx_path):
+            index, usable = _read_index(idx_path)
+            self.done = set(index)
+            with open(idx_path, "r+b") as f: f.truncate(usable)
+        self._blob = open(os.path.join(pack_dir, PACK_BLOB), "ab")
+        self._idx = open(idx_path, "ab")
+
+    def append(self, key, data):
+        offset = self._blob.tell()
+        self._blob.write(data)
+        self._blob.flush()
+        self._idx.write(_IDX_RECORD.pack(bytes.fromhex(key), offset, len(data)))
+        self._idx.flush()
+        self.done.add(key)
+
+    def close(self):
+        self._blob.close()
+        self._idx.close()
+
+
+class AudioCache:
+    def __init__(self, mem_budget, disk_dir=None, disk_budget=0, pack=None):
+        self.mem_budget = mem_budget
+        self.disk_dir = disk_dir
+        self.disk_budget = disk_budget
+        self.pack = pack # PackedAudioStore：預先合成的唯讀層
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()  # Key -> bytes (最近使用的在最後)
+        self._mem_bytes = 0
+        self._disk = OrderedDict() # Key -> 檔案大小
+        self._disk_bytes = 0
+        self.hits_mem = self.hits_pack = self.hits_disk = self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            # 依修改時間還原磁碟 LRU 順序
+            entries = []
+            for name in os.listdir(disk_dir):
+                if not name.endswith(".mp3"): continue
+                st = os.stat(os.path.join(disk_dir, name))
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.mp3")
+
+    def get(self, key):
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.hits_mem += 1
+                return data
+            on_disk = key in self._disk
+        if self.pack is not None:
+            data = self.pack.get(key)
+            if data is not None:
+                with self._lock: self.hits_pack += 1
+                return data
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f: data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._disk_bytes -= self._disk.pop(key, 0)
+                else:
+                    if key in self._disk: self._disk.move_to_end(key)
+                    self.hits_disk += 1
+                    self._put_mem(key, data)
+                    return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._put_mem(key, data)
+        if self.disk_dir and len(data) <= self.disk_budget:
+            tmp = self._path(key) + f".{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, self._path(key))
+            with self._lock:
+                self._disk_bytes += len(data) - self._disk.pop(key, 0)
+                self._disk[key] = len(data)
+                evicted = []
+                while self._disk_bytes > self.disk_budget:
+                    old, size = self._disk.popitem(last=False)
+                    self._disk_bytes -= size
+                    evicted.append(old)
+            for old in evicted:
+                try: os.remove(self._path(old))
+                except OSError: pass
+
+    def _put_mem(self, key, data):
+        # 呼叫端需持有 lock
+        if len(data) > self.mem_budget: return
+        self._mem_bytes += len(data) - len(self._mem.pop(key, b""))
+        self._mem[key] = data
+        while self._mem_bytes > self.mem_budget:
+            _, old = self._mem.popitem(last=False)
+            self._mem_bytes -= len(old)
+
+    def __contains__(self, key):
+        if self.pack is not None and key in self.pack: return True
+        with self._lock:
+            return key in self._mem or key in self._disk
+
+    def stats(self):
+        with self._lock:
+            return {"hits_mem": self.hits_mem, "hits_pack": self.hits_pack, "hits_disk": self.hits_disk,
+                    "misses": self.misses, "pack_items": len(self.pack) if self.pack is not None else 0,
+                    "mem_items": len(self._mem), "mem_bytes": self._mem_bytes,
+                    "disk_items": len(self._disk), "disk_bytes": self._disk_bytes}
+
+
+# --- 背景事件迴圈：所有 TTS 共用一個 loop，不再每次 new_event_loop ---
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="jp-tts-loop", daemon=True).start()
+        return _loop
+
+
+async def edge_tts_stream(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    communicate = edge_tts.Communicate(text, voice, rate=rate)
+    buf = bytearray()
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio": buf.extend(chunk["data"])
+    return bytes(buf)
+
+
+async def stub_tts_stream(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    # 離線替身：不連網，回傳可重現的假音檔 (測試 / 效能量測用)
+    await asyncio.sleep(0)
+    return b"ID3STUB" + audio_key(text, voice, rate).encode() + text.encode("utf-8")
+
+
+SYNTH_BACKENDS = {"edge": edge_tts_stream, "stub": stub_tts_stream}
+
+
+class TTSService:
+    def __init__(self, cache, synth=edge_tts_stream, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, timeout=30,
+                 max_concurrency=4):
+        self.cache = cache
+        self.synth = synth
+        self.voice = voice
+        self.rate = rate
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._sem = None    # 在背景 loop 內建立
+        self._inflight = {} # Key -> (token, Future)：同一句同時被要求時只合成一次
+        self._lock = threading.Lock()
+
+    def key(self, text):
+        return audio_key(text, self.voice, self.rate)
+
+    def submit(self, text):
+        # 回傳 concurrent.futures.Future (結果為 bytes 或 None)
+        key = self.key(text)
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None and not entry[1].cancelled(): return entry[1]
+            token = object()
+            fut = asyncio.run_coroutine_threadsafe(self._synthesize(key, text, token), get_loop())
+            self._inflight[key] = (token, fut)
+        return fut
+
+    async def _synthesize(self, key, text, token):
+        if self._sem is None: self._sem = asyncio.Semaphore(self.max_concurrency)
+        try:
+            async with self._sem:
+                with span("tts_synthesize"): data = await self.synth(text, self.voice, self.rate)
+            if data: self.cache.put(key, data)
+            return data or None
+        except Exception:
+            return None
+        finally:
+            with self._lock:
+                entry = self._inflight.get(key)
+                if entry is not None and entry[0] is token: del self._inflight[key]
+
+    def result(self, fut, text):
+        # 等待 submit 回傳的 Future；若被其他 session 取消則重新送出
+        try:
+            return fut.result(self.timeout)
+        except concurrent.futures.CancelledError:
+            return self.get_audio(text)
+        except Exception:
+            return None
+
+    def get_audio(self, text):
+        data = self.cache.get(self.key(text))
+        if data is not None: return data
+        for _ in range(2):
+            try:
+                return self.submit(text).result(self.timeout)
+            except concurrent.futures.CancelledError:
+                continue
+            except Exception:
+                return None
+        return None
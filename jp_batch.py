@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import weakref
+from datetime import datetime
+
+# --- 批次練習的本機日誌 (當機後可接續) ---
+# 一個批次一個 JSONL 檔：第一行是整批題目 (Key、模式、優先級)，之後每次作答 / 跳過 / 寫回成功各附加一行。
+# 批次結束且整批寫回成功後刪除檔案；App 重開時若檔案還在，Session.resume_batch 從中斷的位置接續，
+# 並把最後一次寫回之後的作答重新套用 (使用 jp_reviewlog 時作答已在本機紀錄中，不重複套用)。
+# 同一個檔案只記一個批次 (開始新批次會取代舊的)。每位學習者各用一個檔案 (owner 寫在第一行)，
+# 同一個 process 中同一個檔案同時只能由一個 session 使用 (claim)，其他 session 不會接手別人進行中的批次。
+# 用法: python jp_batch.py .jp_batch.jsonl   (印出未完成批次的進度)
+
+_holders = weakref.WeakValueDictionary() # 檔案路徑 -> 使用中的 session (session 結束後自動釋放)
+_holders_lock = threading.Lock()
+
+
+class BatchJournal:
+    def __init__(self, path, owner=None):
+        self.path = path
+        self.owner = owner # 學習者 id；None = 不檢查
+        self._file = None
+
+    def claim(self, session):
+        # 取得這個檔案的使用權；已被同一個 process 中的其他 session 使用時回傳 False
+        path = os.path.abspath(self.path)
+        with _holders_lock:
+            holder = _holders.get(path)
+            if holder is not None and holder is not session: return False
+            _holders[path] = session
+            return True
+
+    def _write(self, entry):
+        if self._file is None:
+            if not os.path.exists(self.path): return # 已關閉 / 刪除：批次不再記錄
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def start(self, plan, checkpoint_every=0):
+        # plan: [(key, mode, priority)]
+        self.close()
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({"plan": [list(p) for p in plan], "checkpoint_every": checkpoint_every, "owner": self.owner,
+                     "created": datetime.now().isoformat(timespec="seconds")})
+
+    def reopen(self):
+        # 接續既有的檔案 (resume 後繼續附加)
+        if self._file is None: self._file = open(self.path, "a", encoding="utf-8")
+
+    def answer(self, i, key, mode, is_correct, when, latency_ms):
+        self._write({"i": i, "key": key, "mode": mode, "correct": int(bool(is_correct)),
+                     "ts": when.isoformat(), "latency_ms": latency_ms})
+
+    def skip(self, i):
+        self._write({"i": i, "skip": 1})
+
+    def committed(self, answers):
+        # 前 answers 筆作答已寫回題庫
+        self._write({"committed": answers})
+
+    def close(self, remove=False):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove and os.path.exists(self.path): os.remove(self.path)
+
+    def load(self):
+        # 未完成的批次：{"plan", "checkpoint_every", "position", "answers", "committed", "correct"}；沒有 (或不屬於 owner) 時回傳 None
+        # answers：[(key, mode, is_correct, when, latency_ms)]，position：下一題在 plan 中的位置
+        if not os.path.exists(self.path): return None
+        with open(self.path, encoding="utf-8") as f:
+            lines = [line for line in f if line.endswith("\n")] # 寫到一半中斷的最後一行略過
+        try:
+            header = json.loads(lines[0]) if lines else None
+        except ValueError:
+            return None
+        if not header or "plan" not in header: return None
+        if self.owner is not None and header.get("owner") != self.owner: return None # 別人的批次
+        state = {"plan": [tuple(p) for p in header["plan"]], "checkpoint_every": header.get("checkpoint_every", 0),
+                 "position": 0, "answers": [], "committed": 0, "correct": 0}
+        for line in lines[1:]:
+            entry = json.loads(line)
+            if "committed" in entry:
+                state["committed"] = entry["committed"]
+                continue
+            state["position"] = max(state["position"], entry["i"] + 1)
+            if entry.get("skip"): continue
+            state["answers"].append((entry["key"], entry["mode"], bool(entry["correct"]),
+                                     datetime.fromisoformat(entry["ts"]), entry["latency_ms"]))
+            state["correct"] += entry["correct"]
+        return state
+
+
+if __name__ == "__main__":
+    import sys
+    state = BatchJournal(sys.argv[1] if len(sys.argv) > 1 else ".jp_batch.jsonl").load()
+    if state is None:
+        print("沒有未完成的批次")
+    else:
+        print(f"第 {state['position']} / {len(state['plan'])} 題，作答 {len(state['answers'])} 題 (答對 {state['correct']})，"
+              f"已寫回 {state['committed']} 題")
@@ -0,0 +1,218 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from jp_perf import timed
+
+# --- 資料解析 (DataFrame -> App 格式) ---
+# 以欄為單位整批處理，取代逐列 iterrows
+
+
+def _raw_col(df, values, col):
+    # values = df.values：與 iterrows 取得的值相同 (含缺值與型別轉換)
+    return values[:, df.columns.get_loc(col)]
+
+
+def _str_col(df, values, col, default=""):
+    # 等同逐列 str(row.get(col, default))
+    if col not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    return pd.Series([str(v) for v in _raw_col(df, values, col)], index=df.index, dtype=object)
+
+
+def _map_unique(values, func):
+    # 對「不重複值」逐一轉換，再依代碼展開回整欄 (日期、數字欄位重複度極高)
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    mapped = np.empty(len(uniques), dtype=object)
+    for i, v in enumerate(uniques):
+        mapped[i] = func(v)
+    return mapped[codes]
+
+
+DATE_FORMATS = ["%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y/%m/%d"] # 常見格式先用 strptime，比 pd.to_datetime 快很多
+
+
+def _norm_date(value):
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    try:
+        return pd.to_datetime(value).strftime("%Y-%m-%d")
+    except Exception:
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(float(value or 0))
+    except Exception:
+        return None
+
+
+# --- 題目記錄 ---
+# 題目以 __slots__ 物件儲存 (比 dict 省記憶體)，但保留 dict 式的存取 (item['sentence']、item.get、'kana' in item)，
+# 既有程式不必改寫；沒有的欄位 (句子題的 kanji、尚未標註的 kana) 視為不存在。
+
+
+class Card:
+    __slots__ = ()
+    __getitem__ = object.__getattribute__ # type 為類別屬性
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return hasattr(self, name)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__ if hasattr(self, k))
+        return f"{type(self).__name__}({fields})"
+
+
+class SentenceCard(Card):
+    __slots__ = ("sentence", "translation", "group", "parsing", "start_date", "row_idx", "kana")
+    type = "sentence"
+
+    def __init__(self, sentence, translation, group, parsing, start_date, row_idx):
+        self.sentence, self.translation, self.group = sentence, translation, group
+        self.parsing, self.start_date, self.row_idx = parsing, start_date, row_idx
+
+
+class VocabCard(Card):
+    __slots__ = ("kanji", "reading", "meaning", "start_date", "row_idx", "kana", "reading_kana")
+    type = "vocab"
+
+    def __init__(self, kanji, reading, meaning, start_date, row_idx):
+        self.kanji, self.reading, self.meaning = kanji, reading, meaning
+        self.start_date, self.row_idx = start_date, row_idx
+
+
+def _interned(values):
+    # 相同內容的字串共用同一個物件 (日期、Group、常見的翻譯 / 意思重複度高)
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    return np.asarray(uniques, dtype=object)[codes]
+
+
+def item_key(item):
+    # 題目在 srs_map / 錯題本中的 Key
+    return item['sentence'] if item['type'] == 'sentence' else item['kanji']
+
+
+@timed("parse_data")
+def parse_data(df, issues=None, row_state=None):
+    # issues: 若傳入 dict，會填入格式有誤的列 {欄位: [row_idx, ...]}
+    # row_state: 若傳入 dict，會填入每列的 SRS 狀態 {row_idx: (srs 項目, 是否 Weak)} (增量更新用)
+    default_date = datetime.now().strftime("%Y-%m-%d")
+    n = len(df)
+    row_labels = np.array(df.index.tolist() + [None], dtype=object)[:-1] # 保留原本的 Python 型別
+    values = df.values
+
+    # --- 通用欄位處理 ---
+    time_raw = _str_col(df, values, 'Time', default_date).str.strip()
+    time_raw = time_raw.where(time_raw != "", default_date)
+    time_norm = _map_unique(time_raw.to_numpy(), _norm_date)
+    bad_time = pd.isna(time_norm)
+    time_str = _interned(np.where(bad_time, time_raw.to_numpy(), time_norm)) # 無法解析時保留原字串
+
+    # --- SRS 數據讀取 ---
+    review_raw = _str_col(df, values, 'Next_Review').str.strip()
+    review_raw = review_raw.where(review_raw != "", default_date) # 預設今天
+    review_norm = _map_unique(review_raw.to_numpy(), _norm_date)
+    bad_review = pd.isna(review_norm)
+    next_review = np.where(bad_review, default_date, review_norm)
+
+    zeros = np.zeros(n, dtype=object)
+    interval = _map_unique(_raw_col(df, values, 'Interval'), _to_int) if 'Interval' in df.columns else zeros
+    reps = _map_unique(_raw_col(df, values, 'Reps'), _to_int) if 'Reps' in df.columns else zeros
+    bad_num = pd.isna(interval) | pd.isna(reps)
+    interval = np.where(bad_num, 0, interval) # 任一欄錯誤時兩者皆歸零
+    reps = np.where(bad_num, 0, reps)
+
+    is_weak = _str_col(df, values, 'Weak').str.strip().str.lower().isin(['yes', 'true', '1']).to_numpy()
+
+    # --- 句子解析 ---
+    s_ja = _str_col(df, values, 'Sentence').str.strip().to_numpy()
+    s_ch = _interned(_str_col(df, values, 'Translation').str.strip().to_numpy())
+    gid = _interned(_str_col(df, values, 'Group').str.strip().to_numpy())
+    parsing_raw = _str_col(df, values, 'Parsing').str.strip().str.replace('＋', '+').to_numpy()
+
+    s_pos = np.flatnonzero(s_ja != "")
+    tokens = {} # 字卡 (助詞等) 共用
+    token = lambda x: tokens.setdefault(x, x)
+    sentence_data = [
+        SentenceCard(s_ja[p], s_ch[p], gid[p], tuple(token(x.strip()) for x in parsing_raw[p].split('+') if x.strip()),
+                     time_str[p], row_labels[p]) # 記住 Row Index 以便更新
+        for p in s_pos
+    ]
+    all_sentence_translations = s_ch[s_pos].tolist()
+
+    group_map = {}
+    grouped = pd.DataFrame({"gid": gid[s_pos], "s_ja": s_ja[s_pos]})
+    grouped = grouped[grouped["gid"] != ""].drop_duplicates()
+    for g, members in grouped.groupby("gid", sort=False)["s_ja"]:
+        group_map[g] = members.tolist()
+
+    # --- 單字解析：以 explode 整批拆開「。」分隔的清單 ---
+    v_raw = _str_col(df, values, 'Vocab List').str.strip()
+    m_raw = _str_col(df, values, 'Meaning').str.strip()
+    has_vocab = ((v_raw != "") & (m_raw != "")).to_numpy()
+    v_raw.index = m_raw.index = np.arange(n)
+
+    def _explode(col):
+        parts = col[has_vocab].str.split('。').explode().str.strip()
+        return parts[parts != ""]
+
+    v_parts = _explode(v_raw)
+    m_parts = _explode(m_raw)
+    v_count = v_parts.groupby(level=0).size().reindex(np.arange(n), fill_value=0).to_numpy()
+    m_count = m_parts.groupby(level=0).size().reindex(np.arange(n), fill_value=0).to_numpy()
+    count_ok = has_vocab & (v_count == m_count)
+    bad_vocab = has_vocab & ~count_ok
+
+    v_parts = v_parts[count_ok[v_parts.index.to_numpy()]]
+    m_parts = m_parts[count_ok[m_parts.index.to_numpy()]]
+    v_pos = v_parts.index.to_numpy(dtype=np.int64)
+    kanji = reading = meaning = np.empty(0, dtype=object)
+    if len(v_parts):
+        split = v_parts.str.partition('｜')
+        no_sep = (split[1] == "").to_numpy()
+        kanji = _interned(split[0].str.strip().to_numpy())
+        reading = np.where(no_sep, v_parts.to_numpy(), split[2].to_numpy())
+        reading = _interned(pd.Series(reading, dtype=object).str.strip().to_numpy())
+        meaning = _interned(m_parts.to_numpy())
+
+    # 單字的初始 SRS 取自所在列；之後每個單字各自在 jp_srs.SrsStore 中追蹤
+    vocab_data = [VocabCard(kanji[i], reading[i], meaning[i], time_str[p], row_labels[p]) for i, p in enumerate(v_pos)]
+    all_vocab_meanings = meaning.tolist()
+
+    # --- SRS Map / 錯題：依「句子 -> 同列單字」的原始順序建立 ---
+    # 同 Key 重複出現時以後者為準 (與逐列寫入 dict 相同)
+    key_pos = np.concatenate([s_pos, v_pos])
+    key_text = np.concatenate([s_ja[s_pos], kanji]).astype(object)
+    order = np.argsort(key_pos, kind="stable")
+    key_pos = key_pos[order]
+    key_text = key_text[order]
+
+    srs_map = {} # 用來快速查找 SRS 狀態
+    for key, p in zip(key_text, key_pos):
+        srs_map[key] = {"next_review": next_review[p], "interval": interval[p], "reps": reps[p], "row_idx": row_labels[p]}
+    mistakes_list = key_text[is_weak[key_pos]].tolist() # 用來快速查找錯題
+
+    if row_state is not None:
+        for p in np.unique(key_pos):
+            row_state[row_labels[p]] = ({"next_review": next_review[p], "interval": interval[p],
+                                         "reps": reps[p], "row_idx": row_labels[p]}, bool(is_weak[p]))
+
+    if issues is not None:
+        for name, mask in [("Time", bad_time), ("Next_Review", bad_review),
+                           ("Interval/Reps", bad_num), ("Vocab List/Meaning", bad_vocab)]:
+            if mask.any(): issues[name] = row_labels[mask].tolist()
+
+    return sentence_data, vocab_data, group_map, (all_sentence_translations, all_vocab_meanings), srs_map, mistakes_list
@@ -0,0 +1,328 @@
+import copy
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from jp_deck import item_key, parse_data
+from jp_distractors import DistractorEngine
+from jp_kana import annotate_readings_in_background
+from jp_schedule import FirstItems, ScheduleIndex
+from jp_srs import ORIGIN_ROW, ORIGIN_STORED, CardIndex, SrsStore
+from jp_stats import CardLayout
+from jp_storage import EXPECTED_COLUMNS
+
+# --- 整個 process 共用的題庫快取 ---
+# 解析後的題庫內容 (句子、單字、群組、選項池、干擾項) 不可變、只存一份；
+# 各 session 複製一份 SRS 狀態陣列 (Deck.srs)，只保留自己作答過的卡片。
+# 重整時以逐列 hash 找出新增 / 修改 / 刪除的列，只解析這些列並產生新版本 (Deck.delta)，
+# 各 session 再把同一份 delta 套用到自己的排程索引。
+# 有編譯好的題庫 (jp_deckpack) 時，第一次載入改由 mmap 開啟 (Deck.from_pack)，再以 load_delta 追上之後的變動。
+
+FULL_REBUILD_RATIO = 0.5 # 變動超過一半的列時直接整份重建 (順便清掉 catalog 中刪除留下的空位)
+
+
+def row_hashes(df):
+    # 每列內容的 64-bit hash (index = row_idx)
+    if df.empty: return pd.Series(dtype="uint64")
+    cols = [c for c in EXPECTED_COLUMNS if c in df.columns]
+    return pd.util.hash_pandas_object(df[cols].astype(str), index=False)
+
+
+class RowItems:
+    # row_idx -> 該列題目在 catalog 中的 id；依 (row_idx, id) 排序的兩個陣列 (不為每列存一個 list)
+    def __init__(self, rows, ids):
+        rows, ids = np.asarray(rows, dtype=np.int64), np.asarray(ids, dtype=np.int64)
+        order = np.lexsort((ids, rows))
+        self.rows, self.ids = rows[order], ids[order]
+
+    def _span(self, r):
+        return np.searchsorted(self.rows, r, side="left"), np.searchsorted(self.rows, r, side="right")
+
+    def get(self, r, default=()):
+        lo, hi = self._span(r)
+        return self.ids[lo:hi].tolist() if hi > lo else default
+
+    def __contains__(self, r):
+        lo, hi = self._span(r)
+        return hi > lo
+
+    def replace(self, removed_rows, rows, ids):
+        # 回傳去掉 removed_rows 的列、再加上 (rows, ids) 的新版本
+        keep = ~np.isin(self.rows, np.asarray(list(removed_rows), dtype=np.int64))
+        return RowItems(np.concatenate([self.rows[keep], np.asarray(rows, dtype=np.int64)]),
+                        np.concatenate([self.ids[keep], np.asarray(ids, dtype=np.int64)]))
+
+
+class Deck:
+    # 唯讀：session 不可修改這裡的任何物件 (SRS 變動請寫入 session 自己的 SrsStore)
+    def __init__(self, df, version, distractor_strategy="random", index=None, srs_frame=None, annotate=True):
+        # annotate=False：不在背景標註讀音 (編譯題庫時改為同步標註)
+        self.version = version
+        self.parent_version = None
+        self.delta = None # 由上一版增量產生時：見 apply_delta
+        self.row_hashes = row_hashes(df)
+        self.loaded_at = time.time()
+        self.parse_issues = {}
+        self.row_state = {} # row_idx -> (srs 項目, 是否 Weak)
+        sentence_data, vocab_data, self.group_map, pools, _, _ = parse_data(df, self.parse_issues, self.row_state)
+        self.catalog = ScheduleIndex.build_catalog(sentence_data, vocab_data)
+        items = self.catalog[0]
+        self.row_items = RowItems([item['row_idx'] for item in items], np.arange(len(items))) # row_idx -> 該列題目 id
+        self.group_items = {} # Group -> 句子題目 id
+        for i, item in enumerate(items):
+            if item['type'] == 'sentence' and item['group']: self.group_items.setdefault(item['group'], []).append(i)
+        self.weak_rows = {r for r, (_, weak) in self.row_state.items() if weak}
+        self.card_layout = None # 統計用的卡片欄位 (見 jp_stats.card_layout)
+        self._pack = None
+        self.srs = SrsStore(index)
+        self._seed_srs(self.catalog[1])
+        self.srs.apply_frame(srs_frame)
+        self.mistakes_list = self._weak_keys()
+        self.distractors = DistractorEngine(sentence_data, self.group_map, *pools, distractor_strategy)
+        if annotate: annotate_readings_in_background(sentence_data, vocab_data)
+
+    @classmethod
+    def from_pack(cls, pack, version, distractor_strategy="random", index=None, srs_frame=None):
+        # 由編譯好的題庫 (jp_deckpack.DeckPack) 建立：題目用到時才組出，逐列資料 (row_items 等) 第一次增量更新時才建立
+        from jp_deckpack import PackedItems
+        today = date.today()
+        today_str, today_ord = today.strftime("%Y-%m-%d"), today.toordinal()
+        deck = cls.__new__(cls)
+        deck.version, deck.parent_version, deck.delta = version, None, None
+        deck.row_hashes = pack.row_hashes()
+        deck.loaded_at = time.time()
+        deck.parse_issues = {k: list(v) for k, v in pack.meta.get("parse_issues", {}).items()}
+        deck.row_items = deck.row_state = deck.weak_rows = None
+        deck._pack, deck._pack_today = pack, today_str
+        keys = pack.key_texts()
+        items = PackedItems(pack, today_str)
+        key_items = pack.key_items(keys)
+        deck.catalog = (items, key_items, FirstItems(items, key_items))
+        deck.group_map, deck.group_items = pack.group_map(), pack.group_items()
+
+        deck.srs = SrsStore(index)
+        ids = deck.srs.index.add_many(keys)
+        deck.srs.set_ids(ids, *pack.seed_state(today_ord), ORIGIN_ROW)
+        deck.srs.apply_frame(srs_frame)
+        deck.mistakes_list = deck._weak_keys()
+        deck.card_layout = CardLayout.from_arrays(ids, *pack.layout(today_ord))
+        deck.distractors = DistractorEngine.from_pools({name: pack.pool(name) for name in ("translation", "sentence", "meaning")},
+                                                       deck.group_map, distractor_strategy)
+        return deck
+
+    @property
+    def empty(self):
+        return self.row_hashes.empty
+
+    def _ensure_rows(self):
+        # 由編譯好的題庫載入時，逐列資料延後到第一次需要時才建立 (唯讀，重複建立的結果相同)
+        if self.row_items is None:
+            self.row_items, self.row_state, self.weak_rows = self._pack.row_index(self._pack_today)
+
+    def _seed_srs(self, keys):
+        # 沒有存過狀態的卡片，以所在列 (同 Key 多列時取最後一列) 的 SRS 欄位為初始值；任一列為 Weak 即為 Weak
+        self._ensure_rows()
+        items, key_items, _ = self.catalog
+        seeds = []
+        for key in keys:
+            if self.srs.origin(key) == ORIGIN_STORED: continue
+            rows = {items[j]['row_idx'] for j in key_items[key]}
+            seeds.append((key, self.row_state[max(rows)][0], bool(rows & self.weak_rows)))
+        self.srs.set_many([k for k, _, _ in seeds], [e["next_review"] for _, e, _ in seeds],
+                          [e["interval"] for _, e, _ in seeds], [e["reps"] for _, e, _ in seeds],
+                          [w for _, _, w in seeds], ORIGIN_ROW)
+
+    def _weak_keys(self):
+        key_items = self.catalog[1]
+        return [k for k in self.srs.weak_keys() if k in key_items]
+
+    def apply_delta(self, changed, removed_rows, version, srs_frame=None):
+        # changed: 新增 / 修改的列 (完整欄位)；removed_rows: 已刪除的 row_idx；srs_frame: SRS 表中變動的卡片
+        # 只解析 changed，其餘題目物件原封不動沿用；回傳新版本的 Deck
+        self._ensure_rows()
+        items, key_items, _ = self.catalog
+        touched = set(changed.index) | set(removed_rows)
+        old_ids = [i for r in touched for i in self.row_items.get(r, ())]
+        old_items = [items[i] for i in old_ids]
+
+        issues, row_state = {}, {}
+        s_new, v_new = [], []
+        if not changed.empty: s_new, v_new, *_ = parse_data(changed, issues, row_state)
+        added = s_new + v_new
+
+        deck = copy.copy(self)
+        deck.version, deck.parent_version = version, self.version
+        deck.loaded_at = time.time()
+        deck.card_layout = None
+        keep = ~self.row_hashes.index.isin(list(touched))
+        deck.row_hashes = pd.concat([self.row_hashes[keep], row_hashes(changed)]).sort_index()
+        deck.parse_issues = {}
+        for name in set(self.parse_issues) | set(issues):
+            rows = sorted([r for r in self.parse_issues.get(name, []) if r not in touched] + issues.get(name, []))
+            if rows: deck.parse_issues[name] = rows
+
+        # catalog：新題目附加在後面，刪除 / 修改的舊題目位置留 None
+        new_items = items + added
+        for i in old_ids: new_items[i] = None
+        added_ids = list(range(len(items), len(new_items)))
+        deck.row_items = self.row_items.replace(touched, [new_items[i]['row_idx'] for i in added_ids], added_ids)
+
+        keys = {item_key(i) for i in old_items} | {item_key(i) for i in added}
+        deck.row_state = dict(self.row_state)
+        for r in touched: deck.row_state.pop(r, None)
+        deck.row_state.update(row_state)
+        deck.weak_rows = (self.weak_rows - touched) | {r for r, (_, weak) in row_state.items() if weak}
+
+        key_items = dict(key_items)
+        new_by_key = {}
+        for i in added_ids: new_by_key.setdefault(item_key(new_items[i]), []).append(i)
+        for key in keys:
+            ids = [i for i in key_items.get(key, ()) if new_items[i] is not None] + new_by_key.get(key, [])
+            if not ids:
+                key_items.pop(key, None)
+                continue
+            # 第一個 id 為代表題目，與 build_catalog 相同：句子優先、列順序
+            key_items[key] = sorted(ids, key=lambda i: (new_items[i]['type'] != 'sentence', new_items[i]['row_idx'], i))
+        deck.catalog = (new_items, key_items, FirstItems(new_items, key_items))
+
+        # SRS：受影響的卡片重新帶入列上的初始值 (SRS 表裡已有的不動)，再套用 SRS 表的變動
+        deck.srs = self.srs.copy()
+        deck._seed_srs([k for k in keys if k in key_items])
+        keys |= set(deck.srs.apply_frame(srs_frame))
+        weak = {k: k in key_items and deck.srs.is_weak(k) for k in keys}
+        if any(weak[k] != (k in self.catalog[1] and self.srs.is_weak(k)) for k in keys):
+            deck.mistakes_list = deck._weak_keys()
+
+        # 群組：只重算有變動的群組 (成員依列順序、去重)
+        changed_groups = {i['group'] for i in old_items + added if i['type'] == 'sentence' and i['group']}
+        deck.group_items, deck.group_map = dict(self.group_items), dict(self.group_map)
+        for gid in changed_groups:
+            ids = [i for i in self.group_items.get(gid, ()) if new_items[i] is not None]
+            ids += [i for i in added_ids if new_items[i]['type'] == 'sentence' and new_items[i]['group'] == gid]
+            ids.sort(key=lambda i: (new_items[i]['row_idx'], i))
+            if ids:
+                deck.group_items[gid] = ids
+                deck.group_map[gid] = list(dict.fromkeys(new_items[i]['sentence'] for i in ids))
+            else:
+                deck.group_items.pop(gid, None)
+                deck.group_map.pop(gid, None)
+        deck.distractors = self.distractors.apply_delta(old_items, added, deck.group_map, changed_groups)
+
+        deck.delta = {"removed_ids": old_ids, "added_ids": added_ids, "keys": keys, "weak": weak}
+        annotate_readings_in_background(s_new, v_new)
+        return deck
+
+
+class DeckCache:
+    def __init__(self, loader, distractor_strategy="random", delta_loader=None, srs_loader=None, pack=None,
+                 journal=None):
+        self.loader = loader             # () -> DataFrame
+        self.pack = pack                 # jp_deckpack.DeckPack：第一次載入用 (之後的重整仍經由 loader / delta_loader)
+        self.journal = journal           # jp_reviewlog.ReviewLog：整份建立題庫時重播尚未壓縮的作答
+        self.delta_loader = delta_loader # (since) -> DataFrame，見 DeckStorage.load_delta
+        self.srs_loader = srs_loader     # (since) -> DataFrame，見 DeckStorage.load_srs
+        self.distractor_strategy = distractor_strategy
+        self.index = CardIndex() # 所有版本共用，card id 不會因重整而改變
+        self._deck = None
+        self._version = 0
+        self._since = None     # 後端的版本 (load_delta 的起點)
+        self._srs_since = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        # 多個 session 同時啟動時只讀取 / 解析一次
+        with self._lock:
+            if self._deck is None or self._deck.empty: self._load() # 讀取失敗 (空表) 不快取
+            return self._deck
+
+    def refresh(self):
+        # 「強制重整」：只抓變動的列 / 卡片並增量套用
+        # 回傳 {"added", "changed", "removed", "srs", "seconds", "full"}
+        with self._lock:
+            start = time.perf_counter()
+            if self._deck is None or self._deck.empty or self.delta_loader is None:
+                report = self._load()
+            else:
+                report = self._sync()
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            report["version"] = self._deck.version
+            return report
+
+    def _load_srs(self, since):
+        if self.srs_loader is None: return None
+        frame = self.srs_loader(since)
+        if frame is not None: self._srs_since = frame.attrs.get("version")
+        return frame
+
+    def _load(self):
+        if self.pack is not None and self._deck is None and self.delta_loader is not None: return self._load_pack()
+        df = self.loader()
+        old = self._deck
+        self._version += 1
+        self._since = df.attrs.get("version")
+        srs_frame = self._load_srs(None)
+        self._deck = self._replay(Deck(df, self._version, self.distractor_strategy, self.index, srs_frame))
+        old_rows = set(old.row_hashes.index) if old is not None else set()
+        new_rows = set(self._deck.row_hashes.index)
+        return {"added": len(new_rows - old_rows), "changed": 0, "removed": len(old_rows - new_rows),
+                "srs": 0 if srs_frame is None else len(srs_frame), "full": True}
+
+    def _load_pack(self):
+        # 從編譯好的題庫啟動，再用 load_delta 補上編譯之後題庫的變動 (逐列 hash 比對，與一般重整相同)
+        pack, self.pack = self.pack, None
+        self._version += 1
+        self._since = pack.source_version
+        self._deck = self._replay(Deck.from_pack(pack, self._version, self.distractor_strategy, self.index,
+                                                 self._load_srs(None)))
+        report = self._sync()
+        report["pack"] = True
+        return report
+
+    def _replay(self, deck):
+        # SRS 表是上次壓縮時的快照，之後的作答還在本機紀錄的尾端 (deck 尚未給任何 session 使用，可直接修改)
+        if self.journal is not None and self.journal.replay_into(deck.srs): deck.mistakes_list = deck._weak_keys()
+        return deck
+
+    def _changed_srs(self, deck, frame):
+        # 沒有版本可比 (整張讀回) 時：只留下和目前狀態不同的卡片
+        if frame is None or frame.empty or frame.attrs.get("version") is not None: return frame
+        probe = SrsStore()
+        keys = probe.apply_frame(frame)
+        return frame[[deck.srs.get(k) != probe.get(k) or deck.srs.row_version(k) != probe.row_version(k) for k in keys]]
+
+    def _sync(self):
+        deck = self._deck
+        delta = self.delta_loader(self._since)
+        if "version" not in delta.attrs or (delta.empty and delta.attrs.get("full")):
+            # 讀取失敗 (空表)：保留目前的題庫
+            return {"added": 0, "changed": 0, "removed": 0, "srs": 0, "full": False}
+        hashes = row_hashes(delta)
+        old_hashes = deck.row_hashes
+        known = hashes.index.isin(old_hashes.index)
+        same = known.copy()
+        same[known] = hashes[known].to_numpy() == old_hashes.reindex(hashes.index[known]).to_numpy()
+        changed = delta[~same]
+        if delta.attrs.get("full"):
+            current = delta.index
+        else:
+            current = delta.attrs.get("row_ids")
+        removed = [] if current is None else old_hashes.index[~old_hashes.index.isin(current)].tolist()
+        srs_frame = self._changed_srs(deck, self._load_srs(self._srs_since))
+        report = {"added": int((~known).sum()), "changed": int((known & ~same).sum()), "removed": len(removed),
+                  "srs": 0 if srs_frame is None else len(srs_frame), "full": False}
+        self._since = delta.attrs.get("version")
+        if changed.empty and not removed and not report["srs"]: return report
+
+        if len(changed) + len(removed) > FULL_REBUILD_RATIO * max(len(old_hashes), 1):
+            df = delta if delta.attrs.get("full") else self.loader()
+            self._version += 1
+            self._since = df.attrs.get("version", self._since)
+            self._deck = self._replay(Deck(df, self._version, self.distractor_strategy, self.index, self._load_srs(None)))
+            report["full"] = True
+            return report
+        self._version += 1
+        self._deck = deck.apply_delta(changed, removed, self._version, srs_frame)
+        return report
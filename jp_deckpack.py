@@ -0,0 +1,343 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from jp_deck import SentenceCard, VocabCard, _map_unique, _norm_date, item_key
+from jp_kana import annotate_readings
+from jp_storage import create_storage
+
+# --- 編譯好的題庫 (欄位式二進位檔，mmap 載入) ---
+# 把解析結果 (題目、預先算好的讀音 / 答案、群組、選項池、卡片初始 SRS、逐列 hash) 存成一組 .npy 陣列 + 字串表。
+# App 啟動時以 mmap 開啟 (多個 process 共用 page cache)，題目要用到時才組出來 (見 PackedItems)；
+# 不再解析儲存格、也不用在背景算讀音。編譯後題庫有變動時，由 DeckCache 以 load_delta / 逐列 hash 增量追上。
+# 預設日期 (Time / Next_Review 空白 = 今天) 存成 0，載入時才換成當天，隔天開啟也不會變成逾期。
+# 用法: python jp_deckpack.py --storage sqlite --out .jp_deck_pack
+
+PACK_FORMAT = 1
+PACK_META = "meta.json"
+STRINGS_BLOB = "strings.bin"
+
+KIND_SENTENCE, KIND_VOCAB = 0, 1
+
+# 字串欄位皆為字串表 id (0 = 空字串 / 預設值)
+ITEM_DTYPE = np.dtype([("kind", "u1"), ("text", "<u4"), ("gloss", "<u4"), ("reading", "<u4"), ("group", "<u4"),
+                       ("kana", "<u4"), ("reading_kana", "<u4"), ("start", "<u4"), ("row", "<i8"),
+                       ("parse_off", "<u4"), ("parse_len", "<u4")])
+ROW_DTYPE = np.dtype([("row", "<i8"), ("hash", "<u8"), ("next_review", "<i4"), ("interval", "<i4"),
+                      ("reps", "<i4"), ("weak", "u1")])
+# start_ord：明確日期中最早的一天 (0 = 沒有)；start_today：有題目的 start_date 為預設 / 無法解析 (= 開啟當天)
+KEY_DTYPE = np.dtype([("text", "<u4"), ("seed_row", "<u4"), ("weak", "u1"), ("group", "<u4"), ("start_ord", "<i4"),
+                      ("start_today", "u1")])
+POOL_DTYPE = np.dtype([("value", "<u4"), ("count", "<u4")])
+POOLS = ["translation", "sentence", "meaning"]
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {"": 0}
+        self.values = [""]
+
+    def __call__(self, text):
+        i = self.ids.get(text)
+        if i is None:
+            i = self.ids[text] = len(self.values)
+            self.values.append(text)
+        return i
+
+    def save(self, out_dir):
+        blobs = [s.encode("utf-8") for s in self.values]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in blobs], out=offsets[1:])
+        with open(os.path.join(out_dir, STRINGS_BLOB), "wb") as f: f.write(b"".join(blobs))
+        np.save(os.path.join(out_dir, "strings.npy"), offsets)
+
+
+def _csr(lists):
+    # list of list -> (ptr, flat)
+    ptr = np.zeros(len(lists) + 1, dtype=np.uint32)
+    np.cumsum([len(x) for x in lists], out=ptr[1:])
+    return ptr, np.fromiter((v for x in lists for v in x), dtype=np.uint32, count=int(ptr[-1]))
+
+
+def compile_deck(df, out_dir, source=None, source_version=None):
+    # df：storage.load_all() 的結果；回傳 meta
+    from jp_deck_cache import Deck
+    start = time.perf_counter()
+    deck = Deck(df, 0, annotate=False)
+    items, key_items, _ = deck.catalog
+    s_items = [i for i in items if i['type'] == 'sentence']
+    annotate_readings(s_items, [i for i in items if i['type'] == 'vocab'])
+    sid = _StringTable()
+
+    # 逐列：hash、SRS 欄位 (空白 / 無法解析的 Next_Review 存 0)
+    rows = deck.row_hashes.index.to_numpy()
+    row_pos = {r: p for p, r in enumerate(rows.tolist())}
+    raw_review = df['Next_Review'].astype(str).str.strip().to_numpy() if 'Next_Review' in df.columns else None
+    review_ok = (pd.notna(_map_unique(raw_review, _norm_date)) & (raw_review != "")) if raw_review is not None else None
+    review_ok = pd.Series(review_ok, index=df.index) if review_ok is not None else None
+    raw_time = df['Time'].astype(str).str.strip() if 'Time' in df.columns else pd.Series("", index=df.index)
+    time_default = set(raw_time.index[raw_time.to_numpy() == ""].tolist())
+    row_arr = np.zeros(len(rows), ROW_DTYPE)
+    row_arr["row"] = rows
+    row_arr["hash"] = deck.row_hashes.to_numpy()
+    for r, (entry, weak) in deck.row_state.items():
+        p = row_pos[r]
+        if review_ok is not None and review_ok[r]:
+            row_arr["next_review"][p] = datetime.strptime(entry["next_review"], "%Y-%m-%d").toordinal()
+        row_arr["interval"][p], row_arr["reps"][p], row_arr["weak"][p] = entry["interval"], entry["reps"], weak
+
+    # 題目
+    item_arr = np.zeros(len(items), ITEM_DTYPE)
+    parsing = []
+    for i, item in enumerate(items):
+        rec = item_arr[i]
+        start_sid = 0 if item['row_idx'] in time_default else sid(item['start_date'])
+        if item['type'] == 'sentence':
+            rec["kind"], rec["text"], rec["gloss"] = KIND_SENTENCE, sid(item['sentence']), sid(item['translation'])
+            rec["group"], rec["parse_off"], rec["parse_len"] = sid(item['group']), len(parsing), len(item['parsing'])
+            parsing.extend(sid(p) for p in item['parsing'])
+        else:
+            rec["kind"], rec["text"], rec["gloss"] = KIND_VOCAB, sid(item['kanji']), sid(item['meaning'])
+            rec["reading"], rec["reading_kana"] = sid(item['reading']), sid(item['reading_kana'])
+        rec["kana"], rec["start"], rec["row"] = sid(item['kana']), start_sid, item['row_idx']
+
+    # 卡片 (Key)：代表題目排第一 (句子優先、列順序)，初始 SRS 取自所在列 (同 jp_deck_cache.Deck._seed_srs)
+    row_group = {}
+    for ids in deck.group_items.values():
+        for i in ids: row_group[items[i]['row_idx']] = items[i]['group']
+    keys = list(key_items)
+    key_arr = np.zeros(len(keys), KEY_DTYPE)
+    for n, key in enumerate(keys):
+        ids = key_items[key]
+        rows_of_key = {items[j]['row_idx'] for j in ids}
+        first = items[ids[0]]
+        starts = [None if items[j]['row_idx'] in time_default else _ordinal(items[j]['start_date']) for j in ids]
+        explicit = [o for o in starts if o is not None]
+        key_arr[n] = (sid(key), row_pos[max(rows_of_key)], bool(rows_of_key & deck.weak_rows),
+                      sid(first['group'] if first['type'] == 'sentence' else row_group.get(first['row_idx'], "")),
+                      min(explicit, default=0), len(explicit) < len(starts))
+    key_ptr, key_ids = _csr([key_items[k] for k in keys])
+
+    groups = list(deck.group_map)
+    group_ptr, group_members = _csr([[sid(s) for s in deck.group_map[g]] for g in groups])
+    gitem_ptr, gitem_ids = _csr([deck.group_items.get(g, []) for g in groups])
+
+    tmp = out_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    arrays = {"items": item_arr, "parsing": np.asarray(parsing, dtype=np.uint32), "rows": row_arr, "keys": key_arr,
+              "key_ptr": key_ptr, "key_ids": key_ids, "groups": np.asarray([sid(g) for g in groups], dtype=np.uint32),
+              "group_ptr": group_ptr, "group_members": group_members, "gitem_ptr": gitem_ptr, "gitem_ids": gitem_ids}
+    for name in POOLS:
+        pool = deck.distractors.pools[name]
+        arrays[f"pool_{name}"] = np.array([(sid(v), pool.counts[v]) for v in pool.values], dtype=POOL_DTYPE)
+    for name, arr in arrays.items(): np.save(os.path.join(tmp, f"{name}.npy"), arr)
+    sid.save(tmp)
+    meta = {"format": PACK_FORMAT, "source": source, "source_version": source_version,
+            "compiled_at": datetime.now().isoformat(timespec="seconds"), "rows": len(rows), "items": len(items),
+            "keys": len(keys), "strings": len(sid.values), "parse_issues": {k: [int(r) for r in v]
+                                                                           for k, v in deck.parse_issues.items()},
+            "seconds": round(time.perf_counter() - start, 3)}
+    with open(os.path.join(tmp, PACK_META), "w", encoding="utf-8") as f: json.dump(meta, f, ensure_ascii=False)
+    # 整個目錄替換 (已開啟的 mmap 仍指向舊檔，不受影響)
+    old = out_dir.rstrip("/") + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(out_dir): os.rename(out_dir, old)
+    os.rename(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def _ordinal(text):
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+class DeckPack:
+    # 唯讀；陣列皆為 mmap (np.load(mmap_mode="r"))，實際用到的 page 才會讀入
+    def __init__(self, pack_dir):
+        self.path = pack_dir
+        with open(os.path.join(pack_dir, PACK_META), encoding="utf-8") as f: self.meta = json.load(f)
+        if self.meta.get("format") != PACK_FORMAT: raise ValueError(f"不支援的題庫格式: {self.meta.get('format')}")
+        load = lambda name: np.load(os.path.join(pack_dir, f"{name}.npy"), mmap_mode="r")
+        self._offsets = load("strings")
+        with open(os.path.join(pack_dir, STRINGS_BLOB), "rb") as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self.items, self.parsing, self.rows, self.keys = load("items"), load("parsing"), load("rows"), load("keys")
+        self.key_ptr, self.key_ids = load("key_ptr"), load("key_ids")
+        self.groups, self.group_ptr, self.group_members = load("groups"), load("group_ptr"), load("group_members")
+        self.gitem_ptr, self.gitem_ids = load("gitem_ptr"), load("gitem_ids")
+        self.pools = {name: load(f"pool_{name}") for name in POOLS}
+        self._shared = {} # 字串表 id -> str：重複度高的欄位 (日期、Group、翻譯、字卡) 各題目共用同一個物件
+
+    @classmethod
+    def open_if_exists(cls, pack_dir, source=None):
+        # source 不同 (例如換了題庫檔) 時不使用
+        if not pack_dir or not os.path.exists(os.path.join(pack_dir, PACK_META)): return None
+        try:
+            pack = cls(pack_dir)
+        except (OSError, ValueError):
+            return None # 舊格式 / 檔案不完整：改為解析題庫
+        if source is not None and pack.meta.get("source") != source: return None
+        return pack
+
+    @property
+    def source_version(self):
+        return self.meta.get("source_version")
+
+    def string(self, i):
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    def strings(self, ids):
+        off, blob = self._offsets, self._blob
+        starts, ends = off[ids].tolist(), off[np.asarray(ids, dtype=np.int64) + 1].tolist()
+        return [blob[a:b].decode("utf-8") for a, b in zip(starts, ends)]
+
+    def shared(self, i):
+        text = self._shared.get(i)
+        if text is None: text = self._shared.setdefault(i, self.string(i))
+        return text
+
+    def item(self, i, today):
+        # 組出與 jp_deck.parse_data 相同格式的題目 (含預先算好的 kana / reading_kana)
+        rec = self.items[i]
+        s, shared = self.string, self.shared
+        start = int(rec["start"])
+        start_date = shared(start) if start else today
+        if rec["kind"] == KIND_SENTENCE:
+            off = int(rec["parse_off"])
+            parsing = tuple(map(shared, self.parsing[off:off + int(rec["parse_len"])].tolist()))
+            item = SentenceCard(s(int(rec["text"])), shared(int(rec["gloss"])), shared(int(rec["group"])), parsing,
+                                start_date, int(rec["row"]))
+        else:
+            item = VocabCard(s(int(rec["text"])), s(int(rec["reading"])), shared(int(rec["gloss"])), start_date, int(rec["row"]))
+            item.reading_kana = s(int(rec["reading_kana"]))
+        item.kana = s(int(rec["kana"]))
+        return item
+
+    def key_texts(self):
+        return self.strings(self.keys["text"])
+
+    def key_items(self, keys):
+        ptr, flat = self.key_ptr.tolist(), self.key_ids.tolist()
+        return dict(zip(keys, [flat[a:b] for a, b in zip(ptr, ptr[1:])]))
+
+    def group_map(self):
+        ptr, members = self.group_ptr.tolist(), self.strings(self.group_members)
+        return dict(zip(self.strings(self.groups), [members[a:b] for a, b in zip(ptr, ptr[1:])]))
+
+    def group_items(self):
+        ptr, flat = self.gitem_ptr.tolist(), self.gitem_ids.tolist()
+        return {g: flat[a:b] for g, a, b in zip(self.strings(self.groups), ptr, ptr[1:]) if b > a}
+
+    def pool(self, name):
+        arr = self.pools[name]
+        return self.strings(arr["value"]), arr["count"].tolist()
+
+    def row_hashes(self):
+        return pd.Series(np.asarray(self.rows["hash"]), index=np.asarray(self.rows["row"]), dtype="uint64")
+
+    def seed_state(self, today):
+        # 每張卡片的初始 SRS (jp_srs.SRS_DTYPE 的欄位)，依 keys 的順序
+        rows = self.rows[np.asarray(self.keys["seed_row"], dtype=np.int64)]
+        next_review = np.asarray(rows["next_review"])
+        return (np.where(next_review == 0, today, next_review), np.asarray(rows["interval"]),
+                np.asarray(rows["reps"]), np.asarray(self.keys["weak"], dtype=bool))
+
+    def row_index(self, today):
+        # (row_items, row_state, weak_rows)：同 Deck 的欄位，第一次增量更新時才需要
+        from jp_deck_cache import RowItems
+        item_rows = np.asarray(self.items["row"])
+        row_items = RowItems(item_rows, np.arange(len(item_rows)))
+        rows = self.rows[np.isin(np.asarray(self.rows["row"]), item_rows)] # 與 jp_deck.parse_data 相同：只有出題的列才有 row_state
+        reviews = [date.fromordinal(o).strftime("%Y-%m-%d") if o else today for o in rows["next_review"].tolist()]
+        row_state = {r: ({"next_review": nr, "interval": iv, "reps": rp, "row_idx": r}, bool(w))
+                     for r, nr, iv, rp, w in zip(rows["row"].tolist(), reviews, rows["interval"].tolist(),
+                                                 rows["reps"].tolist(), rows["weak"].tolist())}
+        return row_items, row_state, {r for r, (_, weak) in row_state.items() if weak}
+
+    def layout(self, today):
+        # jp_stats.CardLayout 的欄位 (依 keys 的順序)：(Group 名稱, start_date 序數)
+        start = np.asarray(self.keys["start_ord"])
+        start = np.where(start == 0, today, start)
+        start = np.where(np.asarray(self.keys["start_today"], dtype=bool), np.minimum(start, today), start)
+        return self.strings(self.keys["group"]), start.astype(np.int32)
+
+
+class PackedItems:
+    # catalog 的題目序列：前段由 DeckPack 即時組出 (組過的留著)，增量更新附加的題目接在後面，刪除的位置為 None
+    def __init__(self, pack, today, extra=(), cache=None):
+        self._pack = pack
+        self._today = today
+        self._n = len(pack.items)
+        self._extra = list(extra)
+        self._cache = cache if cache is not None else {}
+
+    def __len__(self):
+        return self._n + len(self._extra)
+
+    def __getitem__(self, i):
+        if i < 0: i += len(self)
+        if i >= self._n: return self._extra[i - self._n]
+        try:
+            return self._cache[i]
+        except KeyError:
+            if not 0 <= i < self._n: raise IndexError(i)
+            item = self._cache[i] = self._pack.item(i, self._today)
+            return item
+
+    def __setitem__(self, i, value):
+        # 只用於刪除 (留 None)
+        if i >= self._n: self._extra[i - self._n] = value
+        else: self._cache[i] = value
+
+    def __iter__(self):
+        for i in range(len(self)): yield self[i]
+
+    def start_dates(self, ids):
+        # 這些題目的 start_date (排程用；不必組出題目)
+        ids = np.asarray(ids, dtype=np.int64)
+        packed = ids[ids < self._n]
+        sids, inverse = np.unique(np.asarray(self._pack.items["start"])[packed], return_inverse=True)
+        texts = np.asarray([self._pack.shared(int(x)) if x else self._today for x in sids.tolist()] + [None], dtype=object)[:-1]
+        return texts[inverse].tolist() + [self[i]['start_date'] for i in ids[ids >= self._n].tolist()]
+
+    def __add__(self, other):
+        # 新版本共用 pack 與已組出的題目 (原本的序列仍在其他 session 使用中，不能就地修改)
+        return PackedItems(self._pack, self._today, self._extra + list(other), dict(self._cache))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把題庫編譯成 mmap 載入的二進位檔")
+    parser.add_argument("--storage", default=os.environ.get("JP_STORAGE", "gsheets"), choices=["gsheets", "sqlite", "xlsx"])
+    parser.add_argument("--sqlite-path", default=os.environ.get("JP_SQLITE_PATH", "jp_deck.db"))
+    parser.add_argument("--xlsx-path", default=os.environ.get("JP_XLSX_PATH", "Phrases.xlsx"))
+    parser.add_argument("--out", default=".jp_deck_pack")
+    args = parser.parse_args(argv)
+
+    from jp_presynth import _gsheets_conn
+    storage = create_storage(args.storage, _gsheets_conn, args.sqlite_path, args.xlsx_path)
+    df = storage.load_all()
+    meta = compile_deck(df, args.out, pack_source(storage), df.attrs.get("version"))
+    print(f"{meta['rows']} 列 / {meta['items']} 題 / {meta['keys']} 張卡片 -> {args.out} ({meta['seconds']}s)")
+    return 0
+
+
+def pack_source(storage):
+    # 題庫來源的識別 (換了題庫檔就不套用舊的編譯結果)
+    path = getattr(storage, "path", None)
+    return f"{storage.name}:{os.path.abspath(path)}" if path else storage.name
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import copy
+import random
+from collections import Counter
+
+# --- 選項 (干擾項) 產生 ---
+# 載入時建好去重後的陣列與群組補集，抽選項用拒絕取樣，成本與題庫大小無關。
+# hard 模式：依字元 bigram 相似度挑「長得像」的干擾項。
+
+HARD_CANDIDATES = 12       # hard 模式從最相似的前 N 個中抽
+HARD_MAX_POSTING = 200     # 出現在太多項目中的 bigram (如「です」) 不列入相似度，查詢成本有上限
+
+
+def _bigrams(text):
+    text = str(text)
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+class _Pool:
+    def __init__(self, values):
+        self.counts = Counter(v for v in values if v) # 去空字串；同值出現幾次 (增量更新用)
+        self.values = list(self.counts) # 去重
+        self.index = {v: i for i, v in enumerate(self.values)}
+        self._postings = None
+
+    @classmethod
+    def from_counts(cls, values, counts):
+        # 由編譯好的題庫 (jp_deckpack) 直接帶入去重後的值與次數
+        pool = cls(())
+        pool.counts = Counter(dict(zip(values, counts)))
+        pool.values = list(values)
+        pool.index = {v: i for i, v in enumerate(pool.values)}
+        return pool
+
+    def copy(self):
+        pool = copy.copy(self)
+        pool.counts, pool.values, pool.index = Counter(self.counts), list(self.values), dict(self.index)
+        pool._postings = None
+        return pool
+
+    def add(self, v):
+        if not v: return
+        self.counts[v] += 1
+        if v not in self.index:
+            self.index[v] = len(self.values)
+            self.values.append(v)
+            self._postings = None
+
+    def discard(self, v):
+        if not self.counts.get(v): return
+        self.counts[v] -= 1
+        if self.counts[v]: return
+        del self.counts[v]
+        # swap-remove
+        i = self.index.pop(v)
+        last = self.values.pop()
+        if last != v:
+            self.values[i] = last
+            self.index[last] = i
+        self._postings = None
+
+    def postings(self):
+        # bigram -> 項目 index (第一次用 hard 模式時才建立)
+        if self._postings is None:
+            postings = {}
+            for i, v in enumerate(self.values):
+                for g in _bigrams(v): postings.setdefault(g, []).append(i)
+            self._postings = {g: ids for g, ids in postings.items() if len(ids) <= HARD_MAX_POSTING}
+        return self._postings
+
+
+def _rejection_sample(n, k, excluded, rng):
+    # 從 range(n) 抽 k 個不重複、不在 excluded 的 index (excluded 需為 n 內的 index 集合)
+    available = n - len(excluded)
+    k = min(k, available)
+    if k <= 0: return []
+    if available <= 2 * k:
+        # 幾乎要抽光時直接列舉 (此時 n 很小)
+        return rng.sample([i for i in range(n) if i not in excluded], k)
+    chosen = set()
+    while len(chosen) < k:
+        i = rng.randrange(n)
+        if i not in excluded: chosen.add(i)
+    return list(chosen)
+
+
+class DistractorEngine:
+    def __init__(self, sentence_data, group_map, trans_pool, meaning_pool, strategy="random"):
+        self.strategy = strategy
+        self.pools = {
+            "translation": _Pool(trans_pool),
+            "sentence": _Pool(i['sentence'] for i in sentence_data),
+            "meaning": _Pool(meaning_pool),
+        }
+        self._layout_groups(group_map)
+
+    @classmethod
+    def from_pools(cls, pools, group_map, strategy="random"):
+        # pools: {"translation" / "sentence" / "meaning": (values, counts)}
+        engine = cls([], {}, (), (), strategy)
+        engine.pools = {name: _Pool.from_counts(*pools[name]) for name in engine.pools}
+        engine._layout_groups(group_map)
+        return engine
+
+    def _layout_groups(self, group_map):
+        # 群組成員攤平成一個陣列，每組佔連續區段；補集 = 扣掉自己那段
+        self.group_members = []
+        self.group_range = {}
+        for gid, members in group_map.items():
+            start = len(self.group_members)
+            self.group_members.extend(members)
+            self.group_range[gid] = (start, len(self.group_members))
+
+    def apply_delta(self, removed_items, added_items, group_map, changed_groups):
+        # 回傳套用題庫增量後的新 engine (原本的 engine 仍在其他 session 使用中，不能就地修改)
+        engine = copy.copy(self)
+        engine.pools = dict(self.pools)
+        fields = {"translation": ("sentence", "translation"), "sentence": ("sentence", "sentence"),
+                  "meaning": ("vocab", "meaning")}
+        for name, (kind, field) in fields.items():
+            removed = [i[field] for i in removed_items if i['type'] == kind]
+            added = [i[field] for i in added_items if i['type'] == kind]
+            if not removed and not added: continue
+            pool = engine.pools[name] = self.pools[name].copy()
+            for v in removed: pool.discard(v)
+            for v in added: pool.add(v)
+        if changed_groups: engine._layout_groups(group_map)
+        return engine
+
+    def sample(self, pool_name, correct, k=3, rng=random):
+        # rng: 呼叫端 session 的 rng (engine 由所有 session 共用)
+        pool = self.pools[pool_name]
+        n = len(pool.values)
+        excluded = {pool.index[correct]} if correct in pool.index else set()
+        picked = []
+        if self.strategy == "hard":
+            picked = self._similar(pool, correct, k, excluded, rng)
+            excluded |= set(picked)
+        picked += _rejection_sample(n, k - len(picked), excluded, rng)
+        return [pool.values[i] for i in picked]
+
+    def _similar(self, pool, correct, k, excluded, rng):
+        postings = pool.postings()
+        scores = Counter()
+        for g in _bigrams(correct):
+            for i in postings.get(g, ()): scores[i] += 1
+        ranked = [i for i, _ in scores.most_common(HARD_CANDIDATES + len(excluded)) if i not in excluded]
+        return rng.sample(ranked[:HARD_CANDIDATES], min(k, len(ranked[:HARD_CANDIDATES])))
+
+    def sample_other_groups(self, gid, k=3, rng=random):
+        # 從其他群組抽 k 個句子 (同時屬於本組的句子會被拒絕，避免出現兩個正解)
+        start, end = self.group_range.get(gid, (0, 0))
+        own = set(self.group_members[start:end]) # 群組通常只有幾句，用到時才建 (不為每組常駐一個 set)
+        n = len(self.group_members) - (end - start)
+        if n <= 0: return []
+        candidates = {}
+        attempts = 0
+        while len(candidates) < k and attempts < 20 * k:
+            attempts += 1
+            r = rng.randrange(n)
+            if r >= start: r += end - start # 跳過本組區段
+            value = self.group_members[r]
+            if value not in own: candidates[value] = None
+        if len(candidates) < k and n <= 64 * k:
+            # 小題庫：拒絕太多次時改為列舉
+            rest = list(dict.fromkeys(v for v in self.group_members[:start] + self.group_members[end:]
+                                      if v not in own and v not in candidates))
+            for v in rng.sample(rest, min(k - len(candidates), len(rest))): candidates[v] = None
+        return list(candidates)
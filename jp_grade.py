@@ -0,0 +1,143 @@
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+# --- 打字 / 口說題判分 (編輯距離) ---
+# 比對的是假名正規化後的字串 (見 jp_kana)。先去掉共同的前後綴，剩下的部分算有上限的 Levenshtein 距離：
+# 只走對角線 ±d 的帶狀範圍 (d = 目前的編輯數)，相同的字沿對角線直接滑過，超過上限就提早結束，成本約 O(n + d²)。
+# score = 1 - 距離 / 較長的長度 (部分給分)；低於 SCORE_FLOOR 的不再細算，記為 0。
+# 距離不超過 tolerance (錯誤比例) 即算答對：打字題預設 0 (須完全一致)，口說題可容許辨識誤差。
+# 差異顯示用的 opcodes 由帶寬 = 距離的帶狀 DP 回溯 (最短編輯；格式同 difflib.SequenceMatcher.get_opcodes)；
+# 短字串 (不超過 DIFFLIB_MAX_LEN) 仍用 difflib，實測在這個長度以下 difflib 較快。
+
+SCORE_FLOOR = 0.5
+DIFFLIB_MAX_LEN = 72
+
+
+def _strip_common(a, b):
+    # 回傳 (共同前綴長度, 去掉前後綴的 a, b)
+    n = min(len(a), len(b))
+    p = 0
+    while p < n and a[p] == b[p]: p += 1
+    s = 0
+    while s < n - p and a[-1 - s] == b[-1 - s]: s += 1
+    return p, a[p:len(a) - s], b[p:len(b) - s]
+
+
+def _band_rows(a, b, k, keep=False):
+    # 帶狀 DP：第 i 列只存 j = i-k .. i+k (位置 t = j - i + k)；超出帶狀的格子視為 k + 1
+    # 回傳 (距離或 None (> k), 各列 (keep=True 時，回溯用))
+    n, m = len(a), len(b)
+    inf = k + 1
+    width = 2 * k + 1
+    prev = [j - k if 0 <= j - k <= m else inf for j in range(width)] # 第 0 列：D[0][j] = j
+    rows = [prev] if keep else None
+    for i in range(1, n + 1):
+        ai = a[i - 1]
+        cur = [inf] * width
+        lo, hi = max(0, k - i), min(width - 1, m - i + k) # j 的合法範圍 0..m
+        best = inf
+        for t in range(lo, hi + 1):
+            j = i - k + t
+            if j == 0:
+                v = i
+            else:
+                v = prev[t] + (ai != b[j - 1])            # 對角 D[i-1][j-1]
+                if t + 1 < width and prev[t + 1] + 1 < v: v = prev[t + 1] + 1 # 上 D[i-1][j]
+                if t > lo and cur[t - 1] + 1 < v: v = cur[t - 1] + 1          # 左 D[i][j-1]
+            if v > inf: v = inf
+            cur[t] = v
+            if v < best: best = v
+        if best > k: return None, None # 整列都超過 k：提早結束
+        prev = cur
+        if keep: rows.append(cur)
+    d = prev[m - n + k]
+    return (d if d <= k else None), rows
+
+
+def _diagonal(a, b, limit):
+    # 對角線版 (Ukkonen / Landau–Vishkin)：e 個編輯時只看對角線 j - i = -e..e，
+    # 記下每條對角線最遠走到的 i，沿對角線直接滑過相同的字；e 超過 limit 就提早結束。成本約 O(n + d²)
+    n, m = len(a), len(b)
+    goal, off = m - n, limit + 1
+    prev = None
+    for e in range(limit + 1):
+        cur = [-1] * (2 * off + 1)
+        for diag in range(-e, e + 1):
+            if e == 0: i = 0
+            else:
+                i = max(prev[diag + off] + 1,      # 替換
+                        prev[diag + off + 1] + 1,  # 刪除 (a 多一個字)
+                        prev[diag + off - 1])      # 插入 (b 多一個字)
+                i = min(i, n, m - diag)
+            if i < 0 or i + diag < 0: continue
+            j = i + diag
+            while i < n and j < m and a[i] == b[j]:
+                i += 1
+                j += 1
+            cur[diag + off] = i
+            if diag == goal and i == n: return e
+        prev = cur
+    return None
+
+
+def distance(a, b, limit=None):
+    # Levenshtein 距離；超過 limit 時回傳 None
+    if a == b: return 0
+    _, a, b = _strip_common(a, b)
+    if len(a) > len(b): a, b = b, a
+    limit = len(b) if limit is None else limit
+    if len(b) - len(a) > limit: return None
+    if not a: return len(b)
+    return _diagonal(a, b, limit)
+
+
+@lru_cache(maxsize=65536)
+def grade(answer, target, tolerance=0.0):
+    # 回傳 (是否答對, score 0..1)
+    if answer == target: return True, 1.0
+    longest = max(len(answer), len(target))
+    if not longest: return True, 1.0
+    d = distance(answer, target, int(longest * (1 - SCORE_FLOOR)))
+    if d is None: return False, 0.0
+    return d <= int(longest * tolerance), 1 - d / longest
+
+
+def opcodes(a, b):
+    # [(tag, i1, i2, j1, j2)]，tag 為 equal / replace / delete / insert；連續的修改合併成一段
+    if max(len(a), len(b)) <= DIFFLIB_MAX_LEN: return SequenceMatcher(None, a, b).get_opcodes()
+    return _band_opcodes(a, b)
+
+
+def _band_opcodes(a, b):
+    # 最短編輯的 opcodes (帶狀 DP 回溯)
+    p, ma, mb = _strip_common(a, b)
+    ops = [["equal", 0, p, 0, p]] if p else []
+    if ma or mb:
+        n, m = len(ma), len(mb)
+        k = max(1, distance(ma, mb))
+        _, rows = _band_rows(ma, mb, k, keep=True) # 帶寬 = 距離：最短路徑一定在帶內
+        steps = [] # 回溯：(tag, a 位置, b 位置)，由尾到頭
+        i, j = n, m
+        while i or j:
+            t = j - i + k
+            v = rows[i][t]
+            if i and j and rows[i - 1][t] + (ma[i - 1] != mb[j - 1]) == v:
+                steps.append(("equal" if ma[i - 1] == mb[j - 1] else "replace", i - 1, j - 1))
+                i, j = i - 1, j - 1
+            elif i and t + 1 <= 2 * k and rows[i - 1][t + 1] + 1 == v:
+                steps.append(("delete", i - 1, j))
+                i -= 1
+            else:
+                steps.append(("insert", i, j - 1))
+                j -= 1
+        for tag, si, sj in reversed(steps):
+            i2, j2 = p + si + (tag != "insert"), p + sj + (tag != "delete")
+            tag = "equal" if tag == "equal" else "change"
+            if ops and ops[-1][0] == tag: ops[-1][2], ops[-1][4] = i2, j2
+            else: ops.append([tag, p + si, i2, p + sj, j2])
+    s = len(a) - p - len(ma)
+    if s:
+        if ops and ops[-1][0] == "equal": ops[-1][2], ops[-1][4] = len(a), len(b)
+        else: ops.append(["equal", len(a) - s, len(a), len(b) - s, len(b)])
+    return [(tag if tag == "equal" else "replace" if i2 > i1 and j2 > j1 else "delete" if i2 > i1 else "insert",
+             i1, i2, j1, j2) for tag, i1, i2, j1, j2 in ops]
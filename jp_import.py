@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from jp_deck import _map_unique, _norm_date, _to_int
+from jp_srs import review
+from jp_storage import EXPECTED_COLUMNS, create_storage
+
+# --- 匯入舊資料 (Phrases.xlsx / 舊版 jp_mistakes.json) ---
+# 串流讀取：xlsx 用 openpyxl 的 read-only 模式逐列讀，JSON 陣列用 raw_decode 逐個元素解碼，不整份載入。
+# 每 BATCH_ROWS 列整理 / 驗證一次，再整批 upsert 到題庫 (DeckStorage.upsert_rows：依 Sentence，
+# 沒有句子時依 Vocab List 比對既有的列)；記憶體用量只和批次大小有關 (xlsx 的共用字串表除外)。
+# JSON 中的物件是題庫列 (欄位同 EXPECTED_COLUMNS)；字串是舊版錯題本的 Key，匯入為答錯一次 (Weak)。
+# 用法: python jp_import.py Phrases.xlsx jp_mistakes.json --storage sqlite
+
+BATCH_ROWS = 2000
+JSON_CHUNK = 1 << 16
+ISSUE_SAMPLES = 20 # 每種格式錯誤最多記下幾個列號
+SAVE_RETRIES = 5   # 錯題寫入 SRS 表遇到版本衝突時的重試次數
+
+
+def iter_xlsx(path):
+    # (列號, {表頭: 值})；列號同 Excel (表頭為第 1 列)
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = ["" if h is None else str(h).strip() for h in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            if all(v is None or v == "" for v in values): continue
+            yield line, dict(zip(header, values))
+    finally:
+        wb.close()
+
+
+def iter_json(path, chunk_size=JSON_CHUNK):
+    # (第幾個元素 (從 1 起算), 元素)；檔案需為 JSON 陣列，每次只讀 chunk_size 個字元
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buf, pos, eof
+            more = f.read(chunk_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            return not eof
+
+        def skip(chars):
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in chars: pos += 1
+                if pos < len(buf) or not fill(): return
+
+        skip(" \t\r\n")
+        if buf[pos:pos + 1] != "[": raise ValueError(f"{path}: 需為 JSON 陣列")
+        pos += 1
+        n = 1
+        while True:
+            skip(" \t\r\n,")
+            if pos >= len(buf): raise ValueError(f"{path}: JSON 陣列未結束")
+            if buf[pos] == "]": return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if fill(): continue # 元素被 chunk 切斷：多讀一段再解
+                raise
+            if end == len(buf) and fill(): continue # 數字可能還沒讀完
+            pos = end
+            yield n, item
+            n += 1
+
+
+def _cell_text(value):
+    if value is None: return ""
+    if isinstance(value, (datetime, date, pd.Timestamp)): return value.strftime("%Y-%m-%d")
+    if isinstance(value, float):
+        if np.isnan(value): return ""
+        if value.is_integer(): return str(int(value))
+    return str(value).strip()
+
+
+def normalize_rows(lines, records, issues):
+    # 一批原始列 -> 題庫列 ({EXPECTED_COLUMNS: 字串})；格式錯誤的欄位清成空白 (= App 的預設值) 並記在 issues
+    # 回傳 (rows, 略過的空白列數)
+    df = pd.DataFrame.from_records(records, columns=EXPECTED_COLUMNS)
+    cols = {c: _map_unique(df[c].to_numpy(), _cell_text) for c in EXPECTED_COLUMNS}
+    lines = np.asarray(lines)
+
+    def flag(name, mask):
+        if not mask.any(): return
+        entry = issues.setdefault(name, {"count": 0, "lines": []})
+        entry["count"] += int(mask.sum())
+        entry["lines"] += lines[mask][:ISSUE_SAMPLES - len(entry["lines"])].tolist()
+
+    for col in ["Time", "Next_Review"]:
+        raw = cols[col]
+        norm = _map_unique(raw, lambda v: _norm_date(v) if v else "")
+        bad = pd.isna(norm)
+        flag(col, bad)
+        cols[col] = np.where(bad, "", norm)
+    interval, reps = _map_unique(cols["Interval"], _to_int), _map_unique(cols["Reps"], _to_int)
+    bad = pd.isna(interval) | pd.isna(reps)
+    flag("Interval/Reps", bad)
+    for col in ["Interval", "Reps"]: cols[col] = np.where(bad, "", cols[col])
+    cols["Weak"] = np.where(pd.Series(cols["Weak"]).str.lower().isin(["yes", "true", "1"]), "Yes", "")
+
+    # 單字與意思的個數需相同 (與 jp_deck.parse_data 相同的檢查；只記錄，不修改)
+    count = lambda col: pd.Series(cols[col]).str.split("。").map(lambda parts: sum(1 for p in parts if p.strip()))
+    has_vocab = (cols["Vocab List"] != "") & (cols["Meaning"] != "")
+    flag("Vocab List/Meaning", has_vocab & (count("Vocab List") != count("Meaning")).to_numpy())
+
+    keep = (cols["Sentence"] != "") | (cols["Vocab List"] != "")
+    rows = [dict(zip(EXPECTED_COLUMNS, values)) for values in zip(*(cols[c][keep] for c in EXPECTED_COLUMNS))]
+    return rows, int((~keep).sum())
+
+
+def mark_mistakes(storage, keys, when=None):
+    # 舊版錯題本：每個 Key 記為答錯一次 (jp_srs.review)；SRS 表的列版本衝突時以表上的版本重試
+    next_review, interval, reps, weak = review(None, False, when or datetime.now())
+    pending = dict.fromkeys(keys, 0)
+    for _ in range(SAVE_RETRIES):
+        if not pending: break
+        _, conflicts = storage.save_srs([{"key": k, "next_review": next_review, "interval": interval, "reps": reps,
+                                          "weak": int(weak), "version": v} for k, v in pending.items()])
+        pending = {k: int(r["version"] or 0) for k, r in conflicts.items()}
+    return len(keys) - len(pending)
+
+
+def import_file(storage, path, batch_rows=BATCH_ROWS, report=None):
+    # report: 每批寫入後呼叫 report(stats)；回傳 stats
+    stats = {"file": path, "rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "mistakes": 0, "issues": {}}
+    start = time.perf_counter()
+    lines, records, mistakes = [], [], []
+
+    def flush_rows():
+        rows, skipped = normalize_rows(lines, records, stats["issues"])
+        inserted, updated = storage.upsert_rows(rows)
+        stats["inserted"] += inserted
+        stats["updated"] += updated
+        stats["skipped"] += skipped
+        lines.clear()
+        records.clear()
+
+    def flush_mistakes():
+        stats["mistakes"] += mark_mistakes(storage, list(dict.fromkeys(mistakes)))
+        mistakes.clear()
+
+    def progress():
+        stats["seconds"] = time.perf_counter() - start
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        if report: report(stats)
+
+    source = iter_xlsx(path) if path.lower().endswith((".xlsx", ".xlsm")) else iter_json(path)
+    for line, item in source:
+        stats["rows"] += 1
+        if isinstance(item, str):
+            if item.strip(): mistakes.append(item.strip())
+        elif isinstance(item, dict):
+            lines.append(line)
+            records.append({str(k).strip(): v for k, v in item.items()})
+        else:
+            stats["skipped"] += 1
+        if len(records) >= batch_rows:
+            flush_rows()
+            progress()
+        if len(mistakes) >= batch_rows:
+            flush_mistakes()
+            progress()
+    if records: flush_rows()
+    if mistakes: flush_mistakes()
+    progress()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把 xlsx / 舊版 JSON 匯入題庫")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--storage", default=os.environ.get("JP_STORAGE", "gsheets"), choices=["gsheets", "sqlite"])
+    parser.add_argument("--sqlite-path", default=os.environ.get("JP_SQLITE_PATH", "jp_deck.db"))
+    parser.add_argument("--batch", type=int, default=BATCH_ROWS)
+    args = parser.parse_args(argv)
+
+    from jp_presynth import _gsheets_conn
+    storage = create_storage(args.storage, _gsheets_conn, args.sqlite_path)
+    last = [0.0]
+
+    def report(stats):
+        if stats["seconds"] - last[0] < 1.0: return
+        last[0] = stats["seconds"]
+        print(f"  [{stats['rows']}] {stats['rows_per_sec']:,.0f} 列/秒", flush=True)
+
+    for path in args.files:
+        last[0] = 0.0
+        stats = import_file(storage, path, args.batch, report)
+        print(f"{path}：{stats['rows']} 列，新增 {stats['inserted']}、更新 {stats['updated']}、略過 {stats['skipped']}，"
+              f"錯題 {stats['mistakes']} 張，{stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} 列/秒)")
+        for name, entry in stats["issues"].items():
+            print(f"  格式有誤 ({name})：{entry['count']} 列，例如第 {', '.join(map(str, entry['lines'][:5]))} 列")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import re
+import threading
+from functools import lru_cache
+
+import pykakasi
+
+# --- 假名正規化 (答案比對用) ---
+# 共用一個 kakasi 實例；正規化結果有上限地快取。題目的讀音在載入後於背景預先算好，
+# 作答時只需轉換使用者輸入。
+
+_kks = None
+_kks_lock = threading.Lock()
+
+_PUNCT = re.compile(r'[。、？！\?!\s　]')
+
+
+def get_kakasi():
+    global _kks
+    with _kks_lock:
+        if _kks is None: _kks = pykakasi.kakasi()
+        return _kks
+
+
+def clean_chars(text):
+    return _PUNCT.sub('', str(text))
+
+
+@lru_cache(maxsize=65536)
+def to_hiragana(text):
+    return "".join(item['hira'] for item in get_kakasi().convert(text))
+
+
+@lru_cache(maxsize=65536)
+def normalize_answer(text):
+    # 去標點 -> 平假名
+    return to_hiragana(clean_chars(text))
+
+
+def annotate_readings(sentence_data, vocab_data):
+    # 在題目旁存好正規化讀音：kana (句子 / 單字本身)、reading_kana (單字讀音)
+    # 用未快取的版本計算，避免整份題庫擠掉使用者輸入的快取
+    for item in sentence_data:
+        if 'kana' not in item: item['kana'] = to_hiragana.__wrapped__(clean_chars(item['sentence']))
+    for item in vocab_data:
+        if 'kana' not in item: item['kana'] = to_hiragana.__wrapped__(clean_chars(item['kanji']))
+        if 'reading_kana' not in item: item['reading_kana'] = to_hiragana.__wrapped__(clean_chars(item['reading']))
+
+
+def annotate_readings_in_background(sentence_data, vocab_data):
+    thread = threading.Thread(target=annotate_readings, args=(sentence_data, vocab_data),
+                              name="jp-kana-annotate", daemon=True)
+    thread.start()
+    return thread
+
+
+def target_kana(item, mode):
+    # 打字 / 口說題的正規化答案 (尚未預先算好時才即時轉換)
+    if mode == 7:
+        return item.get('reading_kana') or normalize_answer(item['reading'])
+    text = item['sentence'] if item['type'] == 'sentence' else item['kanji']
+    return item.get('kana') or normalize_answer(text)
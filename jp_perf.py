@@ -0,0 +1,112 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# --- 效能量測 (timing span) ---
+# 每個 span 名稱各有一個固定大小的 ring buffer (numpy)，記錄最近 N 次的耗時；
+# 一次量測只是兩次 perf_counter 加一次陣列寫入，可以在正式環境常開。
+# 設定 JP_PERF_LOG=<路徑> 時另外把每筆樣本以 JSONL 附加寫入該檔。
+
+PERF_BUFFER_SIZE = 1024
+
+
+class _Ring:
+    def __init__(self, size):
+        self.ms = np.zeros(size)
+        self.ts = np.zeros(size)
+        self.count = 0 # 累計次數 (寫入位置 = count % size)
+
+    def add(self, ms, ts):
+        i = self.count % len(self.ms)
+        self.ms[i], self.ts[i] = ms, ts
+        self.count += 1
+
+    def values(self):
+        # (耗時, 時間戳)，依時間先後
+        n = len(self.ms)
+        if self.count <= n: return self.ms[:self.count], self.ts[:self.count]
+        i = self.count % n
+        return np.roll(self.ms, -i), np.roll(self.ts, -i)
+
+
+class PerfRecorder:
+    def __init__(self, size=PERF_BUFFER_SIZE, log_path=None):
+        self.size = size
+        self.log_path = log_path
+        self._log = None # 匯出檔 (行緩衝，開一次)
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, ms):
+        ts = time.time()
+        with self._lock:
+            ring = self._rings.get(name)
+            if ring is None: ring = self._rings[name] = _Ring(self.size)
+            ring.add(ms, ts)
+            if self.log_path:
+                try:
+                    if self._log is None: self._log = open(self.log_path, "a", encoding="utf-8", buffering=1)
+                    self._log.write(json.dumps({"span": name, "ms": round(ms, 3), "ts": round(ts, 3)}) + "\n")
+                except OSError:
+                    self.log_path = None # 寫不進去就停止匯出，不影響量測
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, name=None):
+        # 裝飾器版的 span
+        def wrap(fn):
+            label = name or fn.__name__
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(label, (time.perf_counter() - start) * 1000)
+            return inner
+        return wrap
+
+    def summary(self):
+        # [{"span", "count", "last_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}]；百分位只看 buffer 內的樣本
+        with self._lock:
+            snap = {name: (ring.count, ring.values()[0].copy()) for name, ring in self._rings.items()}
+        rows = []
+        for name, (count, ms) in sorted(snap.items()):
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            rows.append({"span": name, "count": count, "last_ms": round(float(ms[-1]), 2), "p50_ms": round(p50, 2),
+                         "p95_ms": round(p95, 2), "p99_ms": round(p99, 2), "max_ms": round(float(ms.max()), 2)})
+        return rows
+
+    def samples(self):
+        # {span: buffer 內的耗時陣列 (ms)}
+        with self._lock:
+            return {name: ring.values()[0].copy() for name, ring in self._rings.items()}
+
+    def export_jsonl(self):
+        # buffer 內所有樣本 (依時間排序) 的 JSONL 字串
+        with self._lock:
+            samples = [(ts, name, ms) for name, ring in self._rings.items() for ms, ts in zip(*ring.values())]
+        samples.sort()
+        return "".join(json.dumps({"span": name, "ms": round(float(ms), 3), "ts": round(float(ts), 3)}) + "\n"
+                       for ts, name, ms in samples)
+
+    def reset(self):
+        with self._lock:
+            self._rings = {}
+
+
+# 整個 process 共用 (背景 worker 與各 session 的量測都記在這裡)
+PERF = PerfRecorder(log_path=os.environ.get("JP_PERF_LOG") or None)
+span = PERF.span
+timed = PERF.timed
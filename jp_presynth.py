@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from jp_audio import DEFAULT_RATE, DEFAULT_VOICE, SYNTH_BACKENDS, PackedAudioWriter, audio_key
+from jp_deck import item_key, parse_data
+from jp_storage import create_storage
+
+# --- 整份題庫預先合成語音 ---
+# 用法: python jp_presynth.py --storage sqlite --out .jp_audio_pack
+# 產生 audio.pack + audio.idx，App 啟動時以 mmap 載入，答題時不再呼叫 TTS
+
+
+def _gsheets_conn():
+    import streamlit as st
+    from streamlit_gsheets import GSheetsConnection
+    return st.connection("gsheets", type=GSheetsConnection)
+
+
+def collect_texts(df):
+    # 與 App 念的文字相同：句子念 sentence、單字念 kanji (去重、保持順序)
+    s_data, v_data, *_ = parse_data(df)
+    return list(dict.fromkeys(item_key(i) for i in s_data + v_data))
+
+
+async def presynthesize(texts, writer, synth, voice=DEFAULT_VOICE, rate=DEFAULT_RATE,
+                        concurrency=8, retries=4, backoff=1.0, report=print):
+    todo = [(t, audio_key(t, voice, rate)) for t in texts]
+    todo = [(t, k) for t, k in todo if k not in writer.done]
+    skipped = len(texts) - len(todo)
+    stats = {"total": len(texts), "skipped": skipped, "done": 0, "failed": 0, "bytes": 0}
+    failed = []
+    sem = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    last_report = [start]
+
+    async def one(text, key):
+        # 每次嘗試各自取得 semaphore，退避等待時先釋放：被限流的句子不佔住並行名額
+        for attempt in range(retries + 1):
+            async with sem:
+                try:
+                    data = await synth(text, voice, rate)
+                except Exception:
+                    data = None
+            if data: break
+            if attempt < retries: await asyncio.sleep(backoff * 2 ** attempt)
+        # 單一事件迴圈內執行，寫入不需上鎖
+        if data:
+            writer.append(key, data)
+            stats["done"] += 1
+            stats["bytes"] += len(data)
+        else:
+            stats["failed"] += 1
+            failed.append(text)
+        now = time.perf_counter()
+        if now - last_report[0] >= 1.0:
+            last_report[0] = now
+            finished = stats["done"] + stats["failed"]
+            report(f"[{skipped + finished}/{stats['total']}] 完成 {stats['done']}，失敗 {stats['failed']}，"
+                   f"{finished / (now - start):.1f} 句/秒")
+
+    await asyncio.gather(*(one(t, k) for t, k in todo))
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    stats["failed_texts"] = failed
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="預先合成整份題庫的語音")
+    parser.add_argument("--storage", default=os.environ.get("JP_STORAGE", "gsheets"), choices=["gsheets", "sqlite", "xlsx"])
+    parser.add_argument("--sqlite-path", default=os.environ.get("JP_SQLITE_PATH", "jp_deck.db"))
+    parser.add_argument("--xlsx-path", default=os.environ.get("JP_XLSX_PATH", "Phrases.xlsx"))
+    parser.add_argument("--out", default=".jp_audio_pack")
+    parser.add_argument("--synth", default="edge", choices=sorted(SYNTH_BACKENDS))
+    parser.add_argument("--voice", default=DEFAULT_VOICE)
+    parser.add_argument("--rate", default=DEFAULT_RATE)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    storage = create_storage(args.storage, _gsheets_conn, args.sqlite_path, args.xlsx_path)
+    texts = collect_texts(storage.load_all())
+    writer = PackedAudioWriter(args.out)
+    try:
+        stats = asyncio.run(presynthesize(texts, writer, SYNTH_BACKENDS[args.synth], args.voice, args.rate,
+                                          args.concurrency, args.retries))
+    finally:
+        writer.close()
+    print(f"共 {stats['total']} 句：新增 {stats['done']}，略過 {stats['skipped']} (已存在)，"
+          f"失敗 {stats['failed']}，{stats['bytes'] / 1e6:.1f} MB，{stats['seconds']}s")
+    for text in stats["failed_texts"][:20]: print(f"  失敗: {text}")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
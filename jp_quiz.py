@@ -0,0 +1,573 @@
+import random
+import time
+from datetime import datetime
+
+from jp_deck import item_key
+from jp_grade import grade
+from jp_kana import normalize_answer, target_kana
+from jp_perf import timed
+from jp_schedule import ScheduleIndex
+from jp_srs import record_state, replay, review
+
+# --- 出題 / 判分引擎 (不依賴 Streamlit) ---
+# QuizEngine 整個 process 共用 (題庫快取、寫回函式、TTS、語音辨識)；Session 是一位學習者的狀態。
+# 選題、出題、判分、SRS 更新、延遲寫回、預載、題庫增量同步都在這裡；
+# japanese_app.py 只負責畫面與把操作轉給 Session，也可以直接由 CLI / HTTP / 效能量測驅動。
+# span 名稱沿用原本 App 內的函式名稱，新舊量測結果可以直接比較。
+
+CHOICE_MODES = [1, 2, 3, 4, 8]   # 選擇題
+AUDIO_MODES = [3, 5, 8, 9, 10]   # 出題時要播語音
+SPEECH_MODES = [9, 10]           # 口說 (語音辨識)
+VOCAB_MODES = [7, 8, 10]         # 單字題
+
+MERGE_RETRIES = 5 # 寫回衝突時合併後重試的次數 (超過就留到下次 flush)
+
+
+def answer_target(item, mode):
+    # 判分 / 顯示用的正確答案 (模式 4 的正解是出題時抽的同組句子，見 Question.correct)
+    if mode in [1, 3]: return item['translation']
+    if mode == 8: return item['meaning']
+    if mode == 7: return item['reading']
+    return item['sentence'] if item['type'] == 'sentence' else item['kanji']
+
+
+def speak_text(item, mode):
+    # 作答後播放的語音 (聽力 / 口說題出題時也念同一句)
+    return item['kanji'] if mode in VOCAB_MODES else item['sentence']
+
+
+class Question:
+    __slots__ = ("item", "mode", "priority", "options", "parsing", "audio_text", "audio_future", "audio",
+                 "answer_audio", "correct", "started")
+
+    def __init__(self, item, mode, priority=None):
+        self.item = item
+        self.mode = mode
+        self.priority = priority
+        self.options = None       # 選擇題選項
+        self.parsing = None       # 模式 6：打亂的字卡 [{"id", "text"}]
+        self.audio_text = None    # 要念的文字
+        self.audio_future = None  # 預載時在背景合成的語音
+        self.audio = None
+        self.answer_audio = None  # 批次練習時預先合成的作答後語音
+        self.correct = None       # 正確答案 (選擇題為正確的選項)
+        self.started = None
+
+
+class Batch:
+    __slots__ = ("questions", "shown", "answered", "correct", "checkpoint_every", "journal", "done")
+
+    def __init__(self, questions, journal=None, checkpoint_every=0, shown=0):
+        self.questions = questions  # Question；接續時已出過 / 已刪除的題目為 None
+        self.shown = shown          # 已出的題數 (= 下一題的位置)
+        self.answered = 0
+        self.correct = 0
+        self.checkpoint_every = checkpoint_every # 每 N 題寫回一次；0 = 批次結束時一次寫回
+        self.journal = journal      # jp_batch.BatchJournal；None = 不記錄 (當機後無法接續)
+        self.done = False           # 最後一題之後 (寫回成功前仍保留，見 Session._batch_committed)
+
+    def progress(self):
+        return {"shown": self.shown, "total": len(self.questions), "answered": self.answered, "correct": self.correct,
+                "done": self.done}
+
+
+class QuizEngine:
+    __slots__ = ("deck_cache", "save", "tts", "speech", "flush_every", "flush_interval", "prefetch_depth",
+                 "journal", "compact", "tolerance")
+
+    def __init__(self, deck_cache, save=None, tts=None, speech=None, flush_every=10, flush_interval=120,
+                 prefetch_depth=3, journal=None, compact=None, tolerance=None):
+        self.deck_cache = deck_cache  # jp_deck_cache.DeckCache
+        self.save = save              # (records, log_records) -> DeckStorage.save_srs 的 (written, conflicts)，失敗回傳 None；None = 不寫回
+        self.journal = journal        # jp_reviewlog.ReviewLog：每次作答先寫入本機紀錄，寫回改為壓縮紀錄 (不經過 save)
+        self.compact = compact        # () -> 是否成功 (通常是 journal.compact)；None = 只寫本機紀錄
+        self.tts = tts                # jp_audio.TTSService；None = 不產生語音
+        self.speech = speech          # jp_speech.SpeechService；None = 不支援口說辨識
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.prefetch_depth = prefetch_depth
+        self.tolerance = tolerance or {} # {模式: 可容許的錯誤比例} (jp_grade.grade)；沒列出的模式須完全一致
+
+    def session(self, rng=random):
+        return Session(self, rng)
+
+    @timed("get_audio_bytes")
+    def get_audio(self, text):
+        # 快取命中時不呼叫 edge-tts；失敗回傳 None
+        return self.tts.get_audio(text) if self.tts is not None else None
+
+
+class Session:
+    __slots__ = ("engine", "rng", "deck", "srs", "answered", "mistakes", "schedule",
+                 "pending_writes", "pending_log", "answers_since_flush", "last_flush_ts",
+                 "question", "result", "prefetch_queue", "prefetch_stats", "asr_job", "asr_blob_id", "batch",
+                 "__weakref__") # __weakref__：jp_batch 以弱參照記錄使用中的 session
+
+    def __init__(self, engine, rng=random):
+        # 題庫內容整個 process 共用一份 (唯讀)；session 只持有自己的 SRS 變動
+        self.engine = engine
+        self.rng = rng
+        deck = self.deck = engine.deck_cache.get()
+        self.srs = deck.srs.copy() # 本 session 的卡片狀態 (作答只改這份)
+        self.answered = set()      # 本 session 作答過的 Key
+        self.mistakes = list(deck.mistakes_list)
+        self.schedule = ScheduleIndex([], [], self.srs, deck.catalog, rng)
+
+        self.pending_writes = {}
+        self.pending_log = []
+        self.answers_since_flush = 0
+        self.last_flush_ts = time.time()
+
+        self.question = None
+        self.result = None # 本題作答結果 (見 submit)；None = 尚未作答
+        self.prefetch_queue = []
+        self.prefetch_stats = {"hits": 0, "misses": 0, "cancelled": 0}
+        self.asr_job = None
+        self.asr_blob_id = None
+        self.batch = None # 批次練習 (Batch)；None = 一般練習
+
+    # --- 選題 ---
+
+    def _choose(self):
+        # 依優先級 (到期 -> 錯題 -> 新題 -> 隨機) 選題並決定模式，不改動 session 的題目狀態
+        schedule, mistakes, rng = self.schedule, self.mistakes, self.rng
+        item = None
+        if schedule.due_count():
+            item, priority = schedule.pick_due(), "due"
+        elif mistakes and rng.random() < 0.7:
+            item, priority = schedule.lookup(rng.choice(mistakes)), "weak"
+        if item is None: # 錯題的列已被刪除時 lookup 為 None：同 _plan 改選新題
+            item, priority = schedule.pick_new(), "new"
+            if item is None: item, priority = schedule.pick_any(), "random"
+        if item is None: return None
+        return item, rng.choice(self._modes(item)), priority
+
+    def _modes(self, item):
+        if item['type'] != 'sentence': return VOCAB_MODES
+        modes = [1, 2, 3, 5, 6, 9]
+        if len(self.deck.group_map.get(item['group'], ())) >= 2: modes.append(4)
+        return modes
+
+    @timed("build_question")
+    def _build(self, item, mode, priority=None):
+        # 產生選項 / 重組字卡 / 要念的文字 (純計算，可提前預載)
+        q = Question(item, mode, priority)
+        if mode in AUDIO_MODES:
+            q.audio_text = item['kanji'] if mode in VOCAB_MODES else item['sentence']
+
+        if mode in CHOICE_MODES:
+            # 由載入時建好的 DistractorEngine 抽干擾項
+            engine, rng = self.deck.distractors, self.rng
+            if mode in [1, 3]:
+                correct, distractors = item['translation'], engine.sample("translation", item['translation'], rng=rng)
+            elif mode == 2:
+                correct, distractors = item['sentence'], engine.sample("sentence", item['sentence'], rng=rng)
+            elif mode == 8:
+                correct, distractors = item['meaning'], engine.sample("meaning", item['meaning'], rng=rng)
+            else:
+                gid = item['group']
+                correct = rng.choice([s for s in self.deck.group_map[gid] if s != item['sentence']])
+                distractors = engine.sample_other_groups(gid, rng=rng)
+            q.options = distractors + [correct]
+            rng.shuffle(q.options)
+            q.correct = correct
+        else:
+            q.correct = answer_target(item, mode)
+
+        if mode == 6:
+            parts = item['parsing'] or [item['sentence']]
+            q.parsing = [{'id': i, 'text': t} for i, t in enumerate(parts)]
+            self.rng.shuffle(q.parsing)
+        return q
+
+    @timed("setup_question")
+    def _setup(self, q):
+        self.question = q
+        self.result = None
+        q.started = time.time()
+        if q.audio_text and q.audio is None and self.engine.tts is not None:
+            q.audio = (self.engine.tts.result(q.audio_future, q.audio_text) if q.audio_future
+                       else self.engine.get_audio(q.audio_text))
+
+    @timed("pick_new_question")
+    def next_question(self):
+        # 換下一題 (必要時先寫回)；題庫沒有題目時回傳 None
+        if self.batch is not None and not self.batch.done: return self._next_in_batch()
+        self.maybe_flush()
+        self.cancel_speech()
+        q = self._pop_prefetched()
+        if q is None:
+            choice = self._choose()
+            if choice is None:
+                self.question = None
+                return None
+            q = self._build(*choice)
+        self._setup(q)
+        self._refill_prefetch()
+        return q
+
+    # --- 批次練習 ---
+    # 開始時一次選好 N 題 (到期 -> 錯題 -> 新題 -> 隨機，卡片不重複)，選項 / 字卡 / 語音全部先準備好，
+    # 作答之間不做任何 I/O；SRS 結果在批次結束 (或每 checkpoint_every 題) 時整批寫回一次。
+    # 傳入 journal (jp_batch.BatchJournal) 時每次作答先記在本機，當機後可用 resume_batch 接續；
+    # journal 已被其他 session 使用時不接續、新批次也不記錄 (不會兩個 session 寫同一個檔案)。
+
+    @timed("start_batch")
+    def start_batch(self, n, journal=None, checkpoint_every=0):
+        # 回傳實際的題數 (題庫不夠時可能少於 n)
+        self.flush() # 批次前的作答先寫回 (失敗時留在佇列，與批次一起寫回)
+        questions = [self._build(*choice) for choice in self._plan(n)]
+        if journal is not None and not journal.claim(self): journal = None
+        if journal is not None:
+            journal.start([(item_key(q.item), q.mode, q.priority) for q in questions], checkpoint_every)
+        return self._start_batch(Batch(questions, journal, checkpoint_every))
+
+    @timed("start_batch")
+    def resume_batch(self, journal):
+        # 接續中斷的批次；沒有未完成的批次 (或日誌正由其他 session 使用) 時回傳 None，否則回傳剩下的題數
+        if not journal.claim(self): return None
+        state = journal.load()
+        if state is None: return None
+        if self.engine.journal is None:
+            # 最後一次寫回之後的作答重新套用 (之後整批寫回)
+            for key, mode, is_correct, when, latency_ms in state["answers"][state["committed"]:]:
+                if key in self.deck.catalog[1]: self._record(key, is_correct, mode, when, latency_ms)
+        questions = [None] * state["position"]
+        for key, mode, priority in state["plan"][state["position"]:]:
+            item = self.schedule.lookup(key)
+            if item is not None and mode not in self._modes(item): mode = self.rng.choice(self._modes(item))
+            questions.append(None if item is None else self._build(item, mode, priority))
+        journal.reopen()
+        batch = Batch(questions, journal, state["checkpoint_every"], state["position"])
+        batch.answered, batch.correct = len(state["answers"]), state["correct"]
+        self._start_batch(batch)
+        return sum(q is not None for q in questions)
+
+    def end_batch(self):
+        # 提前結束：剩下的題目不出，已作答的整批寫回；回傳是否寫回成功
+        if self.batch is None: return True
+        self.batch.done = True
+        self.question = None
+        return self.flush()
+
+    def _plan(self, n):
+        # 一次選 n 張不同的卡片 (不改動排程)
+        schedule, rng = self.schedule, self.rng
+        plan, seen = [], set()
+
+        def take(items, priority):
+            for item in items:
+                if len(plan) >= n: return
+                if item is None or item_key(item) in seen: continue
+                seen.add(item_key(item))
+                plan.append((item, rng.choice(self._modes(item)), priority))
+
+        take(schedule.sample_due(n * 2), "due")
+        take(map(schedule.lookup, rng.sample(self.mistakes, min(n, len(self.mistakes)))), "weak")
+        take(schedule.sample_new(n * 2), "new")
+        for _ in range(n * 3):
+            if len(plan) >= n: break
+            take([schedule.pick_any()], "random")
+        return plan
+
+    def _start_batch(self, batch):
+        for q in self.prefetch_queue: self._cancel_prefetch(q)
+        self.prefetch_queue = []
+        self._prepare_audio([q for q in batch.questions if q is not None])
+        self.batch = batch
+        self.question = None
+        return len(batch.questions)
+
+    def _prepare_audio(self, questions):
+        # 所有要念的句子一次送出 (TTSService 在背景並行合成，已快取的不送)，全部完成後才開始作答
+        tts = self.engine.tts
+        if tts is None: return
+        futures = {}
+        for q in questions:
+            text = speak_text(q.item, q.mode)
+            if text not in futures and tts.cache.get(tts.key(text)) is None: futures[text] = tts.submit(text)
+        for q in questions:
+            text = speak_text(q.item, q.mode)
+            q.answer_audio = tts.result(futures[text], text) if text in futures else tts.get_audio(text)
+            if q.audio_text: q.audio = q.answer_audio
+
+    def _next_in_batch(self):
+        batch = self.batch
+        self.cancel_speech()
+        if batch.shown and self.question is not None and self.result is None and batch.journal is not None:
+            batch.journal.skip(batch.shown - 1)
+        self.maybe_flush() # checkpoint
+        while batch.shown < len(batch.questions):
+            q = batch.questions[batch.shown]
+            batch.shown += 1
+            if q is None: continue
+            self._setup(q)
+            return q
+        # 最後一題之後：整批寫回 (失敗時保留日誌，之後的 flush 成功時才刪除)，再回到一般練習
+        batch.done = True
+        self.question = None
+        self.flush()
+        return self.next_question()
+
+    def _batch_committed(self):
+        # 寫回成功：記下進度；批次已結束時刪除日誌
+        batch = self.batch
+        if batch is None: return
+        if batch.journal is not None:
+            if batch.done: batch.journal.close(remove=True)
+            else: batch.journal.committed(batch.answered)
+        if batch.done: self.batch = None
+
+    # --- 預載下一題 (語音在背景合成) ---
+
+    def _prefetch_still_valid(self, q):
+        # 答題後選題條件可能改變 (例如答錯變成 Weak 又到期)，不再成立的預載就丟棄
+        key = item_key(q.item)
+        if q.priority == "due": return self.schedule.is_due(key)
+        if self.schedule.due_count(): return False
+        if q.priority == "weak": return key in self.mistakes
+        return True
+
+    def _cancel_prefetch(self, q):
+        if q.audio_future is not None: q.audio_future.cancel()
+        self.prefetch_stats["cancelled"] += 1
+
+    def _pop_prefetched(self):
+        queue = self.prefetch_queue
+        while queue:
+            q = queue.pop(0)
+            if self._prefetch_still_valid(q):
+                self.prefetch_stats["hits"] += 1
+                return q
+            self._cancel_prefetch(q)
+        self.prefetch_stats["misses"] += 1
+        return None
+
+    def _refill_prefetch(self):
+        queue = self.prefetch_queue
+        taken = {item_key(q.item) for q in queue}
+        taken.add(item_key(self.question.item))
+        tts = self.engine.tts
+        for _ in range(self.engine.prefetch_depth * 2):
+            if len(queue) >= self.engine.prefetch_depth: break
+            choice = self._choose()
+            if choice is None: break
+            if item_key(choice[0]) in taken: continue # 不連續出同一題
+            taken.add(item_key(choice[0]))
+            q = self._build(*choice)
+            if q.audio_text and tts is not None: q.audio_future = tts.submit(q.audio_text)
+            queue.append(q)
+
+    # --- 作答 ---
+
+    @timed("check_answer")
+    def submit(self, answer):
+        # answer：選項文字 / 輸入的文字 / 辨識結果；模式 6 也可以傳字卡 id 的序列
+        # 回傳 {"correct", "score", "answer", "target", "kana", "interval", "next_review", "pending", "show_diff", "audio"}
+        # score：部分給分 (jp_grade.grade)；kana：(作答, 正解) 正規化後的假名 (差異顯示用；選擇題為 None)
+        if self.result is not None: return self.result
+        q = self.question
+        item, mode = q.item, q.mode
+        if mode == 6 and isinstance(answer, (list, tuple)):
+            lookup = {b['id']: b['text'] for b in q.parsing}
+            answer = "".join(lookup[i] for i in answer)
+        answer = str(answer)
+        target = answer_target(item, mode)
+
+        if mode == 4: is_correct = answer in self.deck.group_map.get(item['group'], [])
+        elif mode in [1, 2, 3, 8]:
+            is_correct = answer.replace(" ", "").replace("　", "") == str(target).replace(" ", "")
+        else:
+            # 題目讀音已預先正規化，只需轉換使用者輸入；以編輯距離判分 (口說題可容許辨識誤差)
+            kana = (normalize_answer(answer), target_kana(item, mode))
+            is_correct, score = grade(*kana, self.engine.tolerance.get(mode, 0.0))
+        if mode in CHOICE_MODES: score, kana = (1.0 if is_correct else 0.0), None
+
+        interval, next_review = self._update_srs(item_key(item), is_correct, mode)
+        batch = self.batch
+        if batch is not None and not batch.done:
+            batch.answered += 1
+            batch.correct += is_correct
+        self.result = {"correct": is_correct, "score": score, "answer": answer, "target": target, "kana": kana,
+                       "interval": interval, "next_review": next_review, "pending": len(self.pending_writes),
+                       "show_diff": score < 1 and mode not in CHOICE_MODES,
+                       "audio": q.answer_audio if q.answer_audio is not None
+                                else self.engine.get_audio(speak_text(item, mode))}
+        return self.result
+
+    @timed("update_srs_status_sheet")
+    def _update_srs(self, key, is_correct, mode=None):
+        started = self.question.started if self.question is not None and self.question.started else time.time()
+        now = datetime.now()
+        latency_ms = round((time.time() - started) * 1000)
+        batch = self.batch
+        if batch is not None and not batch.done and batch.journal is not None:
+            batch.journal.answer(batch.shown - 1, key, mode, is_correct, now, latency_ms)
+        return self._record(key, is_correct, mode, now, latency_ms)
+
+    def _record(self, key, is_correct, mode, now, latency_ms):
+        # 單字卡有自己的狀態，不連動同列的句子 / 其他單字 (批次接續時以原本的作答時間重新套用)
+        next_review, interval, reps, weak = review(self.srs.get(key), is_correct, now)
+
+        # 只改本 session 的卡片狀態 (共用題庫不動)，實際寫回交給 flush
+        self.srs.set(key, next_review, interval, reps, weak)
+        self.answered.add(key)
+        log_record = {"ts": now.isoformat(timespec="seconds"), "key": key, "mode": mode,
+                      "correct": int(is_correct), "latency_ms": latency_ms}
+        # 記下每次作答 (寫回衝突時在對方的狀態上重算)；同一張卡片只寫最後的狀態
+        self.pending_writes.setdefault(key, []).append((now, is_correct))
+        if self.engine.journal is not None:
+            self.engine.journal.append(key, mode, is_correct, log_record["latency_ms"], now)
+        else:
+            self.pending_log.append(log_record)
+        self.answers_since_flush += 1
+        self._apply_state(key)
+        return interval, next_review
+
+    def _apply_state(self, key):
+        # 卡片狀態改變後，更新排程與錯題本
+        self.schedule.reschedule(key, self.srs.next_review(key))
+        if not self.srs.is_weak(key):
+            if key in self.mistakes: self.mistakes.remove(key)
+        elif key not in self.mistakes:
+            self.mistakes.append(key)
+
+    # --- 延遲寫回 (compare-and-set，衝突時自動合併) ---
+
+    def flush(self):
+        # 寫回失敗時保留佇列，下次再試；仍有未解決的衝突時回傳 False
+        if not self._flush(): return False
+        self._batch_committed()
+        return True
+
+    def _flush(self):
+        if not self.pending_writes: return True
+        if self.engine.journal is not None:
+            # 作答已在本機紀錄中：由紀錄整批壓縮寫回 (整個 process 的作答一起)，衝突在壓縮時處理
+            if self.engine.compact is not None and not self.engine.compact(): return False
+            self.pending_writes = {}
+        if self.engine.save is None:
+            self.pending_writes, self.pending_log = {}, []
+        log = self.pending_log
+        for _ in range(MERGE_RETRIES):
+            if not self.pending_writes: break
+            result = self.engine.save([self.srs.record(k) for k in self.pending_writes], log)
+            if result is None: return False
+            self.pending_log = log = [] # 作答紀錄只寫一次
+            written, conflicts = result
+            for key, version in written.items():
+                self.srs.set_row_version(key, version)
+                del self.pending_writes[key]
+            for key, remote in conflicts.items(): self._merge(key, remote)
+        if self.pending_writes: return False
+        self.answers_since_flush = 0
+        self.last_flush_ts = time.time()
+        return True
+
+    def _merge(self, key, remote):
+        # 別的 session / 裝置已先寫入這張卡片：以表上目前的狀態為起點，依序重算本 session 的作答，再以新版本重試
+        state = replay(record_state(remote), self.pending_writes[key])
+        self.srs.set(key, state["next_review"], state["interval"], state["reps"], state["weak"])
+        self.srs.set_row_version(key, int(remote["version"]))
+        self._apply_state(key)
+
+    def maybe_flush(self):
+        if not self.pending_writes: return
+        batch = self.batch
+        if batch is not None and not batch.done:
+            # 批次中只在 checkpoint 寫回 (0 = 批次結束時一次寫回)
+            if batch.checkpoint_every and self.answers_since_flush >= batch.checkpoint_every: self.flush()
+            return
+        elapsed = time.time() - self.last_flush_ts
+        if self.answers_since_flush >= self.engine.flush_every or elapsed >= self.engine.flush_interval:
+            self.flush()
+
+    # --- 口說題 (背景辨識) ---
+
+    @timed("asr_submit")
+    def submit_speech(self, data, blob_id=None):
+        # 送進背景辨識 (不等結果)；同一段錄音不重送 (換題後錄音元件可能仍回傳上一段錄音)
+        if blob_id is not None and blob_id == self.asr_blob_id: return self.asr_job
+        self.cancel_speech()
+        self.asr_job = self.engine.speech.submit(data)
+        self.asr_blob_id = blob_id
+        return self.asr_job
+
+    def poll_speech(self):
+        # 回傳 (狀態, 文字或錯誤訊息)，狀態見 SpeechService.poll；辨識完成時自動判分 (只判一次)
+        job = self.asr_job
+        if job is None: return None, None
+        status, text = self.engine.speech.poll(job)
+        if status == "done" and not job.get("graded"):
+            job["graded"] = True
+            self.submit(text)
+        return status, text
+
+    def cancel_speech(self):
+        if self.asr_job is not None: self.engine.speech.cancel(self.asr_job)
+        self.asr_job = None
+
+    # --- 題庫增量同步 ---
+
+    def sync(self):
+        # 題庫有新版本時 (任一 session 按了重整)，把變動套用到本 session；作答過的 Key 以本 session 為準
+        deck = self.engine.deck_cache.get()
+        mine = self.deck
+        if deck is mine: return False
+        answered = self.answered
+        srs = deck.srs.copy()
+        srs.copy_cards(self.srs, answered)
+        self.srs = srs
+        if deck.parent_version == mine.version:
+            d = deck.delta
+            self.schedule.apply_delta(deck.catalog, d["removed_ids"], d["added_ids"], d["keys"], srs)
+            drop = set()
+            for key, weak in d["weak"].items():
+                if key in answered and key in deck.catalog[1]: continue
+                if weak and key not in self.mistakes: self.mistakes.append(key)
+                elif not weak: drop.add(key)
+            if drop: self.mistakes = [k for k in self.mistakes if k not in drop]
+        else:
+            # 中間隔了不只一版 (或整份重建)：重建本 session 的排程索引
+            keys = deck.catalog[1]
+            still_weak = [k for k in self.mistakes if k in answered and k in keys] # 已刪除的列不留
+            self.mistakes = [k for k in deck.mistakes_list if k not in answered] + still_weak
+            self.schedule = ScheduleIndex([], [], srs, deck.catalog, self.rng)
+        self.deck = deck
+        # 預載的題目可能來自已修改的列
+        for q in self.prefetch_queue: self._cancel_prefetch(q)
+        self.prefetch_queue = []
+        return True
+
+    def stats(self):
+        return {"due": self.schedule.due_count(), "weak": len(self.mistakes), "pending": len(self.pending_writes),
+                "answered": len(self.answered), "prefetch": dict(self.prefetch_stats),
+                "batch": self.batch.progress() if self.batch is not None else None}
+
+
+if __name__ == "__main__":
+    # 用法: python jp_quiz.py Phrases.xlsx [seed]   (終端機練習，不寫回、不播語音；給 seed 時出題順序可重現)
+    import sys
+    from jp_deck_cache import DeckCache
+    from jp_storage import XlsxStorage
+    storage = XlsxStorage(sys.argv[1] if len(sys.argv) > 1 else "Phrases.xlsx")
+    rng = random.Random(int(sys.argv[2])) if len(sys.argv) > 2 else random
+    session = QuizEngine(DeckCache(storage.load_all)).session(rng)
+    while True:
+        q = session.next_question()
+        if q is None: break
+        item = q.item
+        prompt = {1: item.get('sentence'), 2: item.get('translation'), 4: item.get('sentence'), 6: item.get('translation'),
+                  7: item.get('kanji'), 9: item.get('sentence'), 10: item.get('kanji')}.get(q.mode, f"(語音) {q.audio_text}")
+        print(f"\n[Mode {q.mode}] {prompt}")
+        if q.options:
+            for i, opt in enumerate(q.options): print(f"  {i + 1}. {opt}")
+        if q.parsing: print("  " + " / ".join(b['text'] for b in q.parsing))
+        try:
+            text = input("> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if q.options and text.isdigit() and 0 < int(text) <= len(q.options): text = q.options[int(text) - 1]
+        r = session.submit(text)
+        print(("🎉 正解！" if r["correct"] else f"❌ 正解: {r['target']}") + f"  (下次複習 {r['next_review']})")
+    print(session.stats())
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from jp_srs import record_state, replay
+from jp_storage import LOG_COLUMNS
+
+# --- 本機作答紀錄 (append-only) 與壓縮寫回 ---
+# 每次作答只在 reviews.bin 尾端加一筆固定長度的紀錄 (18 bytes：時間、卡片 id、模式、對錯、作答毫秒)，O(1)；
+# 卡片 id 是 keys.txt 的行號 (第一次出現時附加)。不改任何既有資料，整份紀錄一直保留。
+# compact()：把還沒壓縮的尾端依卡片彙整，在 SRS 表目前的狀態上依序重算 (jp_srs.replay)，整批寫回一次
+# (compare-and-set，衝突時在新狀態上重算)；作答紀錄另外整批送到後端的作答紀錄表。
+# App 啟動 / 題庫整份重建時，把尚未壓縮的尾端重播到 SRS 快照上 (replay_into)，重開也不會遺失進度。
+# 每次寫入 SRS 表前先在 state.json 記下 inflight (這次壓縮到哪一筆、各卡片預期的列版本)：寫入後、記下進度前中斷時，
+# 依表上的列版本判斷哪些卡片已寫入 (列版本已改變)，已寫入的不再重算，同一筆作答不會套用兩次。
+# 同一個目錄只能由一個 process 寫入 (Streamlit 的所有 session 共用同一個 ReviewLog)。
+# 用法: python jp_reviewlog.py .jp_review_log [--compact --storage sqlite]   (印出統計 / 手動壓縮)
+
+LOG_DTYPE = np.dtype([("ts", "<f8"), ("card", "<u4"), ("mode", "u1"), ("correct", "u1"), ("latency_ms", "<f4")])
+_RECORD = struct.Struct("<dIBBf") # 與 LOG_DTYPE 相同的排列
+
+REVIEWS_FILE = "reviews.bin"
+KEYS_FILE = "keys.txt"
+STATE_FILE = "state.json"
+
+COMPACT_RETRIES = 5     # 寫回衝突時重算的次數 (超過就留到下次壓縮)
+SHIP_BATCH = 5000       # 每次送到後端作答紀錄表的筆數
+
+
+class ReviewLog:
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()         # append
+        self._compact_lock = threading.Lock() # 同時只有一個壓縮
+        keys_path, reviews_path = os.path.join(path, KEYS_FILE), os.path.join(path, REVIEWS_FILE)
+        self.keys = []
+        if os.path.exists(keys_path):
+            with open(keys_path, encoding="utf-8") as f:
+                self.keys = [json.loads(line) for line in f if line.endswith("\n")] # 不完整的最後一行 (寫到一半中斷) 略過
+        self.ids = {k: i for i, k in enumerate(self.keys)}
+        self._keys_file = open(keys_path, "a", encoding="utf-8")
+        size = os.path.getsize(reviews_path) if os.path.exists(reviews_path) else 0
+        self.count = size // LOG_DTYPE.itemsize
+        if size % LOG_DTYPE.itemsize:
+            os.truncate(reviews_path, self.count * LOG_DTYPE.itemsize) # 寫到一半中斷的紀錄
+        self._file = open(reviews_path, "ab")
+        self.state = {"compacted": 0, "shipped": 0, "carry": [], "inflight": None}
+        if os.path.exists(os.path.join(path, STATE_FILE)):
+            with open(os.path.join(path, STATE_FILE), encoding="utf-8") as f: self.state.update(json.load(f))
+
+    def append(self, key, mode, is_correct, latency_ms, when=None):
+        with self._lock:
+            card = self.ids.get(key)
+            if card is None:
+                card = self.ids[key] = len(self.keys)
+                self.keys.append(key)
+                self._keys_file.write(json.dumps(key, ensure_ascii=False) + "\n")
+                self._keys_file.flush() # 先於紀錄寫入，重播時一定找得到 Key
+            ts = (when or datetime.now()).timestamp()
+            self._file.write(_RECORD.pack(ts, card, mode or 0, int(bool(is_correct)), latency_ms or 0))
+            self._file.flush()
+            self.count += 1
+
+    def records(self, start=0, end=None):
+        # 結構陣列 (LOG_DTYPE)
+        end = self.count if end is None else end
+        if end <= start: return np.zeros(0, LOG_DTYPE)
+        return np.fromfile(os.path.join(self.path, REVIEWS_FILE), LOG_DTYPE, count=end - start,
+                           offset=start * LOG_DTYPE.itemsize)
+
+    def frame(self, start=0, end=None):
+        # 統計用：DataFrame[ts, key, mode, correct, latency_ms]
+        rec = self.records(start, end)
+        keys = np.asarray(self.keys, dtype=object)
+        return pd.DataFrame({"ts": pd.to_datetime(rec["ts"], unit="s"), "key": keys[rec["card"]] if len(rec) else [],
+                             "mode": rec["mode"], "correct": rec["correct"].astype(bool), "latency_ms": rec["latency_ms"]})
+
+    def _events(self, rec, carry=True):
+        # 依時間順序：{key: [(when, is_correct), ...]} (carry：含上次壓縮留下的衝突)
+        events = {}
+        for key, when, correct in self.state["carry"] if carry else ():
+            events.setdefault(key, []).append((datetime.fromisoformat(when), bool(correct)))
+        keys = self.keys
+        for ts, card, correct in zip(rec["ts"].tolist(), rec["card"].tolist(), rec["correct"].tolist()):
+            events.setdefault(keys[card], []).append((datetime.fromtimestamp(ts), bool(correct)))
+        return events
+
+    def _unsettled(self, version_of):
+        # 上次寫入 SRS 表時中斷 (inflight)：回傳到 inflight["end"] 為止還沒寫入的作答 (同 _events 的格式)
+        # version_of(key) -> 表上目前的列版本 (沒有該列為 0)；列版本已不是寫入前預期的版本 = 已寫入
+        # (之後別的裝置又寫過時無法分辨，一律當作已寫入：寧可少算一次，不重複套用)
+        # 不在 inflight 的卡片在之前的重試中已寫入
+        inflight = self.state["inflight"]
+        expected = inflight["versions"]
+        events = self._events(self.records(self.state["compacted"], inflight["end"]))
+        return {k: v for k, v in events.items() if k in expected and version_of(k) == expected[k]}
+
+    def tail(self, version_of=None):
+        # 尚未壓縮的作答 (同 _events 的格式)；有 inflight 時需傳入 version_of (見 _unsettled)
+        inflight = self.state["inflight"]
+        if not inflight: return self._events(self.records(self.state["compacted"]))
+        events = self._unsettled(version_of)
+        for key, reviews in self._events(self.records(inflight["end"]), carry=False).items():
+            events.setdefault(key, []).extend(reviews)
+        return events
+
+    def replay_into(self, srs):
+        # 把尚未壓縮的作答重算到 srs (jp_srs.SrsStore，SRS 表的快照) 上；回傳有變動的 Key
+        tail = self.tail(srs.row_version)
+        for key, reviews in tail.items():
+            state = replay(srs.get(key), reviews)
+            srs.set(key, state["next_review"], state["interval"], state["reps"], state["weak"])
+        return list(tail)
+
+    def _save_state(self):
+        tmp = os.path.join(self.path, STATE_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, STATE_FILE))
+
+    def _commit(self, end, carry):
+        self.state.update(compacted=end, inflight=None,
+                          carry=[[k, when.isoformat(), int(c)] for k, reviews in carry.items() for when, c in reviews])
+        self._save_state()
+
+    def _settle(self, storage):
+        # 上次壓縮在寫入 SRS 表時中斷：讀回 inflight 卡片目前的列版本，沒寫入的作答改為 carry，進度推進到 inflight["end"]
+        inflight = self.state["inflight"]
+        remote = storage.load_srs_records(list(inflight["versions"]))
+        self._commit(inflight["end"], self._unsettled(
+            lambda k: int(remote[k]["version"] or 0) if k in remote else 0))
+
+    def compact(self, storage):
+        # storage: DeckStorage；例外 (網路等) 直接丟出，進度不前進、下次重試
+        # 回傳 {"reviews", "cards", "carried", "shipped", "seconds"}
+        with self._compact_lock:
+            start = time.perf_counter()
+            if self.state["inflight"]: self._settle(storage)
+            end = self.count
+            events = self._events(self.records(self.state["compacted"], end))
+            pending = events
+            remote = storage.load_srs_records(list(events)) if events else {}
+            for _ in range(COMPACT_RETRIES):
+                if not pending: break
+                records = []
+                for key, reviews in pending.items():
+                    state = replay(record_state(remote.get(key)), reviews)
+                    records.append({"key": key, "next_review": state["next_review"], "interval": state["interval"],
+                                    "reps": state["reps"], "weak": int(state["weak"]),
+                                    "version": int(remote[key]["version"] or 0) if key in remote else 0})
+                # 重算不是冪等的：先記下這次寫入的範圍與預期的列版本，寫入後中斷時由 _settle 判斷
+                self.state["inflight"] = {"end": end, "versions": {r["key"]: r["version"] for r in records}}
+                self._save_state()
+                _, remote = storage.save_srs(records)
+                pending = {k: pending[k] for k in remote}
+            # SRS 寫入後立即記下進度；仍衝突的卡片留到下次
+            self._commit(end, pending)
+
+            shipped = 0
+            while self.state["shipped"] < end:
+                chunk = self.records(self.state["shipped"], min(end, self.state["shipped"] + SHIP_BATCH))
+                storage.append_log([dict(zip(LOG_COLUMNS, (datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+                                                           self.keys[card], mode, correct, round(latency))))
+                                    for ts, card, mode, correct, latency in chunk.tolist()])
+                self.state["shipped"] += len(chunk)
+                shipped += len(chunk)
+                self._save_state()
+            return {"reviews": sum(len(v) for v in events.values()), "cards": len(events), "carried": len(pending),
+                    "shipped": shipped, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本機作答紀錄：統計 / 壓縮寫回")
+    parser.add_argument("path", nargs="?", default=".jp_review_log")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--storage", default=os.environ.get("JP_STORAGE", "gsheets"), choices=["gsheets", "sqlite"])
+    parser.add_argument("--sqlite-path", default=os.environ.get("JP_SQLITE_PATH", "jp_deck.db"))
+    args = parser.parse_args(argv)
+
+    log = ReviewLog(args.path)
+    df = log.frame()
+    print(f"{log.count} 筆作答 / {len(log.keys)} 張卡片，尚未壓縮 {log.count - log.state['compacted']} 筆，"
+          f"尚未送出 {log.count - log.state['shipped']} 筆")
+    if len(df):
+        by_mode = df.groupby("mode").agg(answers=("correct", "size"), accuracy=("correct", "mean"),
+                                         latency_ms=("latency_ms", "median"))
+        print(by_mode.to_string(float_format=lambda x: f"{x:.2f}"))
+    if args.compact:
+        from jp_presynth import _gsheets_conn
+        from jp_storage import create_storage
+        print(log.compact(create_storage(args.storage, _gsheets_conn, args.sqlite_path)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
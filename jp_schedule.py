@@ -0,0 +1,309 @@
+import bisect
+import heapq
+import itertools
+import random
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from jp_deck import item_key
+from jp_srs import date_to_ordinal
+
+# --- 排程索引 (選題用) ---
+# 以 card id (jp_srs.CardIndex) 為索引的陣列 (struct-of-arrays)，每個 session 只有幾個 numpy 陣列，不再為每張卡片存 dict / set 項目：
+# _review[c] 為已排程卡片的 next_review 日序數 (0 = 未排程)，_due_card[c] 標記已到期；到期 / 新題目的題目 id 放在 int32 陣列的 pool。
+# 未到期的卡片依日序數排好 (建立時排一次)，日期到了整段移入到期池；答題後重新排程的卡片另放小 heap (取出時檢查是否仍有效)。
+# 尚未排程的題目依 start_date 排序的 id 陣列由同一個 catalog 的所有 session 共用 (CatalogArrays)，各 session 只記游標。
+# 選題 O(1)，重新排程 O(log n)。題庫增量更新時 catalog 只會附加新題目、刪除的位置留 None，既有 id 不變。
+
+
+def _today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def _spans(starts, lengths):
+    # 多段連續區間 [start, start + length) 串接後的位置
+    total = int(lengths.sum())
+    if not total: return np.zeros(0, np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total)
+
+
+class _Pool:
+    # 可 O(1) 隨機抽取、O(1) 移除的集合 (swap-remove)；ids / pos 為 int32 陣列 (pos = -1：不在集合中)
+    def __init__(self):
+        self.ids = np.zeros(0, np.int32)
+        self.pos = np.zeros(0, np.int32)
+        self.n = 0
+
+    def _reserve(self, count, top):
+        if self.n + count > len(self.ids):
+            grown = np.zeros(max(self.n + count, 2 * len(self.ids), 64), np.int32) # 攤提 O(1) 擴充
+            grown[:self.n] = self.ids[:self.n]
+            self.ids = grown
+        if top >= len(self.pos):
+            grown = np.full(max(top + 1, len(self.pos) * 5 // 4, 64), -1, np.int32) # 題目 id 大多一次到齊
+            grown[:len(self.pos)] = self.pos
+            self.pos = grown
+
+    def add(self, i):
+        self._reserve(1, i)
+        if self.pos[i] >= 0: return
+        self.pos[i] = self.n
+        self.ids[self.n] = i
+        self.n += 1
+
+    def add_many(self, ids):
+        # ids 不重複
+        if not len(ids): return
+        self._reserve(len(ids), int(ids.max()))
+        ids = ids[self.pos[ids] < 0]
+        self.pos[ids] = np.arange(self.n, self.n + len(ids))
+        self.ids[self.n:self.n + len(ids)] = ids
+        self.n += len(ids)
+
+    def remove(self, i):
+        if i >= len(self.pos) or self.pos[i] < 0: return
+        p = self.pos[i]
+        self.pos[i] = -1
+        self.n -= 1
+        last = self.ids[self.n]
+        if last != i:
+            self.ids[p] = last
+            self.pos[last] = p
+
+    def choice(self, rng):
+        return int(self.ids[rng.randrange(self.n)]) if self.n else None
+
+    def sample(self, k, rng):
+        return [int(self.ids[j]) for j in rng.sample(range(self.n), min(k, self.n))]
+
+    def __len__(self):
+        return self.n
+
+
+class FirstItems:
+    # Key -> 第一個題目 (key_items 中排第一的 id：句子優先、列順序)；只是 view，不另存一份 dict
+    def __init__(self, items, key_items):
+        self.items = items
+        self.key_items = key_items
+        self.arrays = None # 排程用的共用陣列 (CatalogArrays.of)
+
+    def get(self, key, default=None):
+        ids = self.key_items.get(key)
+        return self.items[ids[0]] if ids else default
+
+    def __getitem__(self, key):
+        return self.items[self.key_items[key][0]]
+
+    def __contains__(self, key):
+        return key in self.key_items
+
+    def __len__(self):
+        return len(self.key_items)
+
+    def values(self):
+        return (self.items[ids[0]] for ids in self.key_items.values())
+
+
+class CatalogArrays:
+    # 同一個 catalog 的所有 session 共用 (唯讀)：
+    # cards：catalog 中每張卡片的 card id；ptr / flat：card id -> 題目 id (CSR)；item_card：題目 id -> card id (刪除的為 -1)
+    # new_order：題目 id 依 start_date 排序 (同日期依 id)，new_rank 為對應的日期名次 (dates 的位置)
+    @classmethod
+    def of(cls, catalog, index):
+        first = catalog[2]
+        if first.arrays is None: first.arrays = cls(catalog[0], catalog[1], index)
+        return first.arrays
+
+    def __init__(self, items, key_items, index):
+        lengths = np.fromiter(map(len, key_items.values()), np.int64, len(key_items))
+        flat = np.fromiter(itertools.chain.from_iterable(key_items.values()), np.int64, int(lengths.sum()))
+        cards = index.add_many(list(key_items))
+        self.cards = cards.astype(np.int32)
+        counts = np.zeros(len(index), np.int64)
+        counts[cards] = lengths
+        self.ptr = np.zeros(len(index) + 1, np.int64)
+        np.cumsum(counts, out=self.ptr[1:])
+        order = np.argsort(cards, kind="stable")
+        self.flat = flat[_spans((np.cumsum(lengths) - lengths)[order], lengths[order])].astype(np.int32)
+        self.item_card = np.full(len(items), -1, np.int32)
+        self.item_card[flat] = np.repeat(self.cards, lengths)
+
+        live = np.flatnonzero(self.item_card >= 0)
+        starts = items.start_dates(live) if hasattr(items, "start_dates") else [items[i]['start_date'] for i in live]
+        codes, uniques = pd.factorize(pd.Series(starts, dtype=object), use_na_sentinel=False)
+        sorted_uniques = np.argsort(np.asarray(uniques, dtype=object))
+        self.dates = [uniques[j] for j in sorted_uniques]
+        rank = np.empty(len(uniques), np.int32)
+        rank[sorted_uniques] = np.arange(len(uniques))
+        rank = rank[codes]
+        by_start = np.argsort(rank, kind="stable")
+        self.new_order, self.new_rank = live[by_start].astype(np.int32), rank[by_start]
+
+    @property
+    def n_cards(self):
+        return len(self.ptr) - 1
+
+    def items_of(self, card):
+        if card >= self.n_cards: return []
+        return self.flat[self.ptr[card]:self.ptr[card + 1]].tolist()
+
+    def expand(self, cards):
+        return self.flat[_spans(self.ptr[cards], self.ptr[cards + 1] - self.ptr[cards])]
+
+    def new_upto(self, today):
+        # new_order 中 start_date <= today 的題目數
+        return int(np.searchsorted(self.new_rank, bisect.bisect_right(self.dates, today)))
+
+
+class ScheduleIndex:
+    @staticmethod
+    def build_catalog(sentence_data, vocab_data):
+        # 與 SRS 狀態無關的部分，可在多個 session 間共用
+        items = sentence_data + vocab_data
+        key_items = {} # Key -> 所有同 Key 題目的 id
+        for i, item in enumerate(items):
+            key_items.setdefault(item_key(item), []).append(i)
+        return items, key_items, FirstItems(items, key_items)
+
+    def __init__(self, sentence_data, vocab_data, srs, catalog=None, rng=random):
+        # srs: jp_srs.SrsStore (本 session 的卡片狀態)；rng: 隨機選題用 (session 的 rng，固定種子時可重現)
+        if catalog is None: catalog = self.build_catalog(sentence_data, vocab_data)
+        self.rng = rng
+        self.index = srs.index
+        self._review = np.zeros(0, np.int32)  # card id -> 已排程的 next_review 日序數 (0 = 未排程)
+        self._due_card = np.zeros(0, bool)    # card id -> 已到期
+        self._due_count = 0
+        self._bind(catalog)
+
+        cards = self._cat.cards
+        state = srs.state
+        cards = cards[cards < len(state)]
+        cards = cards[state["origin"][cards] != 0]
+        self._review[cards] = state["next_review"][cards]
+        order = np.argsort(self._review[cards], kind="stable")
+        self._later = cards[order]                    # 未到期：依日序數排序的 card id
+        self._later_review = self._review[self._later]
+        self._heap = []       # 重新排程到之後日期的 (日序數, card id)；取出時與 _review 不符的略過
+        self._due = _Pool()   # 已到期題目 id
+        self._new = _Pool()   # 尚未排程、start_date 已到的題目 id
+        self._new_pos = 0     # CatalogArrays.new_order 的游標
+        self._today = None
+        self._today_ord = 0
+
+    def _bind(self, catalog):
+        self.items, self.key_items, self.item_by_key = catalog
+        self._cat = CatalogArrays.of(catalog, self.index)
+        n = self._cat.n_cards
+        if n > len(self._review):
+            self._review = np.concatenate([self._review, np.zeros(n - len(self._review), np.int32)])
+            self._due_card = np.concatenate([self._due_card, np.zeros(n - len(self._due_card), bool)])
+
+    def _place(self, card, ordinal):
+        self._review[card] = ordinal
+        if self._today is not None and ordinal <= self._today_ord:
+            self._due_card[card] = True
+            self._due_count += 1
+            for i in self._cat.items_of(card): self._due.add(i)
+        else:
+            heapq.heappush(self._heap, (ordinal, card))
+
+    def _unplace(self, card):
+        self._review[card] = 0
+        if self._due_card[card]:
+            self._due_card[card] = False
+            self._due_count -= 1
+            for i in self._cat.items_of(card): self._due.remove(i)
+
+    def _card(self, key):
+        # 已排程的 card id；沒有時回傳 None
+        c = self.index.get(key)
+        return c if c is not None and c < len(self._review) and self._review[c] else None
+
+    def advance(self, today=None):
+        # 把日序數 <= today 的卡片移入到期池 (每個日期只處理一次)
+        today = today or _today()
+        if today == self._today: return
+        self._today, self._today_ord = today, date_to_ordinal(today)
+        hi = int(np.searchsorted(self._later_review, self._today_ord, side="right"))
+        if hi:
+            cards = self._later[:hi]
+            cards = cards[(self._review[cards] == self._later_review[:hi]) & ~self._due_card[cards]]
+            self._later, self._later_review = self._later[hi:].copy(), self._later_review[hi:].copy()
+            self._due_card[cards] = True
+            self._due_count += len(cards)
+            self._due.add_many(self._cat.expand(cards))
+        while self._heap and self._heap[0][0] <= self._today_ord:
+            ordinal, card = heapq.heappop(self._heap)
+            if self._review[card] == ordinal and not self._due_card[card]: self._place(card, ordinal)
+        hi = self._cat.new_upto(today)
+        if hi > self._new_pos:
+            ids = self._cat.new_order[self._new_pos:hi]
+            self._new.add_many(ids[self._review[self._cat.item_card[ids]] == 0])
+            self._new_pos = hi
+
+    def reschedule(self, key, next_review):
+        # 答題後只移動這張卡片，不重建索引
+        card = self._card(key)
+        if card is None: return
+        self.advance()
+        self._unplace(card)
+        self._place(card, date_to_ordinal(next_review))
+
+    def pick_due(self):
+        self.advance()
+        i = self._due.choice(self.rng)
+        return None if i is None else self.items[i]
+
+    def pick_new(self):
+        self.advance()
+        i = self._new.choice(self.rng)
+        return None if i is None else self.items[i]
+
+    def sample_due(self, k):
+        # 批次選題：一次抽 k 個不重複的到期題目 (同一張卡片可能有多個題目，由呼叫端去重)
+        self.advance()
+        return [self.items[i] for i in self._due.sample(k, self.rng)]
+
+    def sample_new(self, k):
+        self.advance()
+        return [self.items[i] for i in self._new.sample(k, self.rng)]
+
+    def pick_any(self):
+        for _ in range(20):
+            item = self.rng.choice(self.items) if self.items else None
+            if item is not None: return item
+        return next(iter(self.item_by_key.values()), None) # 幾乎全被刪除的 catalog
+
+    def apply_delta(self, catalog, removed_ids, added_ids, keys, srs):
+        # 題庫增量更新：只重新排程受影響的 Key (srs 為本 session 的 SrsStore，作答過的卡片保留本 session 的值)
+        self.advance()
+        for key in keys:
+            card = self._card(key)
+            if card is not None: self._unplace(card) # 用舊 catalog 的題目 id 移除到期題目
+        for i in removed_ids: self._new.remove(i)
+        self._bind(catalog)
+        self._new_pos = self._cat.new_upto(self._today) # 新 catalog 的游標：之後的日期由排序好的陣列補上
+        added = set(added_ids)
+        for key in keys:
+            if key not in self.key_items: continue
+            if key in srs:
+                self._place(self.index.get(key), date_to_ordinal(srs.next_review(key)))
+                continue
+            for i in self.key_items[key]:
+                if i in added and self.items[i]['start_date'] <= self._today: self._new.add(i)
+
+    def lookup(self, key):
+        return self.item_by_key.get(key)
+
+    def is_due(self, key):
+        self.advance()
+        card = self.index.get(key)
+        return card is not None and card < len(self._due_card) and bool(self._due_card[card])
+
+    def due_count(self):
+        # 以 Key (卡片) 計算
+        self.advance()
+        return self._due_count
@@ -0,0 +1,172 @@
+import io
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from jp_perf import span
+
+# --- 語音辨識 (口說題) ---
+# 錄音先在背景 worker 做前處理 (去頭尾靜音、單聲道、16 kHz)，再交給可替換的辨識後端；
+# 畫面只輪詢結果，不會卡在遠端辨識上。
+
+TARGET_RATE = 16000       # 語音辨識用的取樣率
+FRAME_MS = 20             # VAD 音框長度
+VAD_REL_THRESHOLD = 0.1   # 音框 RMS >= 最大音框的 10% 視為有聲
+VAD_MIN_RMS = 300         # 絕對門檻 (16-bit 振幅)，避免全靜音時把雜訊當成語音
+VAD_PAD_MS = 200          # 語音段前後多留一點，避免切到子音
+
+
+def read_wav(data):
+    # WAV bytes -> (float32 陣列 [樣本, 聲道]，振幅以 16-bit 為準, 取樣率)
+    with wave.open(io.BytesIO(data), "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        x = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) * 256
+    elif width == 2:
+        x = np.frombuffer(raw, "<i2").astype(np.float32)
+    elif width == 3:
+        b = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+        x = (((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8) >> 8).astype(np.float32) / 256
+    elif width == 4:
+        x = np.frombuffer(raw, "<i4").astype(np.float32) / 65536
+    else:
+        raise ValueError(f"不支援的 sample width: {width}")
+    return x[:len(x) - len(x) % channels].reshape(-1, channels), rate
+
+
+def write_wav(x, rate):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.clip(np.round(x), -32768, 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def resample(x, src_rate, dst_rate=TARGET_RATE):
+    # 降頻前先做簡單的移動平均低通，再線性內插
+    if src_rate == dst_rate or len(x) == 0: return x
+    ratio = src_rate / dst_rate
+    if ratio > 1:
+        k = int(round(ratio))
+        if k > 1: x = np.convolve(x, np.ones(k, dtype=np.float32) / k, mode="same")
+    n_out = int(len(x) / ratio)
+    return np.interp(np.arange(n_out) * ratio, np.arange(len(x)), x).astype(np.float32)
+
+
+def trim_silence(x, rate):
+    # 以音框能量判斷有聲段，去掉頭尾靜音 (中間的停頓保留)
+    frame = max(1, rate * FRAME_MS // 1000)
+    n = len(x) // frame
+    if n == 0: return x
+    rms = np.sqrt(np.mean(np.square(x[:n * frame].reshape(n, frame)), axis=1))
+    voiced = np.flatnonzero(rms >= max(VAD_MIN_RMS, rms.max() * VAD_REL_THRESHOLD))
+    if len(voiced) == 0: return x[:0]
+    pad = VAD_PAD_MS // FRAME_MS
+    start = max(0, voiced[0] - pad) * frame
+    end = min(n, voiced[-1] + 1 + pad) * frame
+    return x[start:end]
+
+
+def preprocess_wav(data):
+    # 回傳 (處理後的 WAV, 統計)；不是 WAV (如 webm) 時原樣送出
+    try:
+        x, rate = read_wav(data)
+    except (wave.Error, EOFError, ValueError):
+        return data, {"bytes_in": len(data), "bytes_out": len(data), "seconds_in": None, "seconds_out": None}
+    seconds_in = len(x) / rate
+    x = resample(x.mean(axis=1), rate)
+    x = trim_silence(x, TARGET_RATE)
+    out = write_wav(x, TARGET_RATE)
+    return out, {"bytes_in": len(data), "bytes_out": len(out),
+                 "seconds_in": round(seconds_in, 3), "seconds_out": round(len(x) / TARGET_RATE, 3)}
+
+
+# --- 辨識後端：(wav bytes, language) -> 文字；聽不懂回傳 None，連線錯誤等直接丟例外 ---
+
+def google_recognize(wav, language="ja-JP", timeout=None):
+    r = sr.Recognizer()
+    r.operation_timeout = timeout # 讓 worker 不會無限期卡在網路上
+    with sr.AudioFile(io.BytesIO(wav)) as source:
+        audio = r.record(source)
+    try:
+        return r.recognize_google(audio, language=language)
+    except sr.UnknownValueError:
+        return None
+
+
+class StubRecognizer:
+    # 離線替身：不連網，依上傳大小與音長模擬延遲 (效能量測用)；回傳固定文字
+    def __init__(self, text="", upload_bytes_per_sec=256 * 1024, seconds_per_audio_second=0.1):
+        self.text = text
+        self.upload_bytes_per_sec = upload_bytes_per_sec
+        self.seconds_per_audio_second = seconds_per_audio_second
+
+    def __call__(self, wav, language="ja-JP", timeout=None):
+        try:
+            x, rate = read_wav(wav)
+            audio_seconds = len(x) / rate
+        except (wave.Error, EOFError, ValueError):
+            audio_seconds = 0
+        time.sleep(len(wav) / self.upload_bytes_per_sec + audio_seconds * self.seconds_per_audio_second)
+        return self.text or None
+
+
+RECOGNIZER_BACKENDS = {"google": google_recognize, "stub": StubRecognizer()}
+
+
+class SpeechService:
+    # 整個 process 共用的辨識 worker pool；job 是可放進 session_state 的 dict
+    def __init__(self, recognize=google_recognize, language="ja-JP", workers=2, timeout=15):
+        self.recognize = recognize
+        self.language = language
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jp-asr")
+        self.stats = {"jobs": 0, "done": 0, "unrecognized": 0, "timeout": 0, "error": 0, "cancelled": 0,
+                      "bytes_in": 0, "bytes_out": 0}
+
+    def _run(self, data):
+        start = time.perf_counter()
+        with span("asr_preprocess"): wav, info = preprocess_wav(data)
+        info["preprocess_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.stats["bytes_in"] += info["bytes_in"]
+        self.stats["bytes_out"] += info["bytes_out"]
+        if info["seconds_out"] == 0: return None, info # 整段都是靜音，不必送辨識
+        with span("asr_recognize"): text = self.recognize(wav, self.language, self.timeout)
+        info["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return text, info
+
+    def submit(self, data):
+        self.stats["jobs"] += 1
+        return {"future": self._pool.submit(self._run, data), "started": time.monotonic(), "status": "pending"}
+
+    def poll(self, job):
+        # 回傳 (狀態, 文字或錯誤訊息)；狀態: pending / done / unrecognized / timeout / error / cancelled
+        if job["status"] != "pending": return job["status"], job.get("result")
+        fut = job["future"]
+        if fut.cancelled():
+            status, result = "cancelled", None
+        elif not fut.done():
+            if time.monotonic() - job["started"] <= self.timeout: return "pending", None
+            # 已在執行的辨識無法中斷，只是不再等它 (結果會被丟棄)
+            fut.cancel()
+            status, result = "timeout", None
+        elif fut.exception() is not None:
+            status, result = "error", str(fut.exception())
+        else:
+            text, job["info"] = fut.result()
+            status, result = ("done", text) if text else ("unrecognized", None)
+        job["status"], job["result"] = status, result
+        self.stats[status] += 1
+        return status, result
+
+    def cancel(self, job):
+        if job["status"] != "pending": return
+        job["future"].cancel()
+        job["status"] = "cancelled"
+        self.stats["cancelled"] += 1
@@ -0,0 +1,243 @@
+import itertools
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# --- SRS 狀態 (以卡片為單位，陣列儲存) ---
+# 每個題目 Key (句子 / 單字) 是一張卡片、對應一個整數 id；狀態存在 numpy 結構陣列 (每張 16 bytes)，
+# next_review 以日序數 (date.toordinal) 儲存。單字各自有自己的狀態，不再共用所在列的 SRS 欄位。
+# 狀態寫入獨立的 SRS 表 (見 DeckStorage.load_srs / save_srs)；題庫列上的 SRS 欄位只當作初始值。
+# row_version 是讀到這張卡片時 SRS 表上的列版本 (0 = 表中沒有)，寫回時用來比對 (compare-and-set)。
+
+SRS_DTYPE = np.dtype([("next_review", "<i4"), ("interval", "<i4"), ("reps", "<i2"),
+                      ("weak", "u1"), ("origin", "u1"), ("row_version", "<u4")])
+
+ORIGIN_NONE = 0   # 沒有狀態 (尚未排程)
+ORIGIN_ROW = 1    # 由題庫列上的 SRS 欄位帶入
+ORIGIN_STORED = 2 # SRS 表中的值 / 本 session 作答過
+
+MAX_INTERVAL = 36500 # 間隔上限 (天)：再大的值加到日期上會超出 datetime 的範圍
+REPS_MAX = np.iinfo(SRS_DTYPE["reps"]).max
+
+_revisions = itertools.count(1) # SrsStore.version：所有 store 共用、不重複
+
+
+@lru_cache(maxsize=4096)
+def ordinal_to_date(ordinal):
+    return date.fromordinal(ordinal).strftime("%Y-%m-%d")
+
+
+@lru_cache(maxsize=4096)
+def date_to_ordinal(text):
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        try:
+            return pd.to_datetime(text).toordinal()
+        except Exception:
+            return date.today().toordinal() # 無法解析時視為今天到期
+
+
+def review(state, is_correct, when):
+    # 排程規則：state 為 SrsStore.get 的格式 (None = 新卡)，回傳作答後的 (next_review, interval, reps, weak)
+    interval = state["interval"] if state else 0
+    reps = state["reps"] if state else 0
+    if is_correct:
+        # 答對：拉長間隔，移除 Weak 標記
+        if interval == 0: interval = 1
+        elif interval == 1: interval = 3
+        else: interval = min(int(interval * 2.2), MAX_INTERVAL)
+        reps += 1
+    else:
+        # 答錯：重置並標記為 Weak
+        interval, reps = 0, 0
+    return (when + timedelta(days=interval)).strftime("%Y-%m-%d"), interval, reps, not is_correct
+
+
+def replay(state, reviews):
+    # 在 state 上依序套用 [(when, is_correct)] (寫回衝突合併、本機作答紀錄壓縮 / 重播用)，回傳最後的狀態
+    for when, is_correct in reviews:
+        next_review, interval, reps, weak = review(state, is_correct, when)
+        state = {"next_review": next_review, "interval": interval, "reps": reps, "weak": weak}
+    return state
+
+
+def record_state(record):
+    # SRS 表的一筆 (SRS_TABLE_COLUMNS) -> SrsStore.get 的格式；None = 表中沒有
+    if record is None: return None
+    return {"next_review": str(record["next_review"]), "interval": int(record["interval"] or 0),
+            "reps": int(record["reps"] or 0), "weak": str(record["weak"]).strip().lower() in ("1", "true", "yes")}
+
+
+def _clip(values, dtype, high):
+    # 超出範圍的值 (例如表格上手動改過的 Interval / Reps) 截到 0 .. 上限，不讓它溢位繞回
+    return np.clip(np.asarray(values, dtype=np.int64), 0, high).astype(dtype)
+
+
+def date_ordinals(values):
+    # 日期字串 -> 日序數 (日期重複度高，只轉換不重複值)
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    return np.array([date_to_ordinal(str(v)) for v in uniques], dtype=np.int32)[codes]
+
+
+class CardIndex:
+    # 題目 Key -> card id；只增不減，所有題庫版本與 session 共用
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.ids.get(key)
+
+    def add(self, key):
+        i = self.ids.get(key)
+        if i is not None: return i
+        with self._lock:
+            i = self.ids.get(key)
+            if i is None:
+                i = len(self.keys)
+                self.keys.append(key)
+                self.ids[key] = i
+        return i
+
+    def add_many(self, keys):
+        # 回傳 card id 陣列；還沒有任何 Key 時 (從編譯好的題庫啟動) 直接整批建立
+        if not self.keys:
+            with self._lock:
+                if not self.keys:
+                    unique = list(dict.fromkeys(keys)) # 同 Key 重複時共用一個 id (回傳值仍與 keys 一一對應)
+                    self.keys.extend(unique)
+                    self.ids.update(zip(unique, range(len(unique))))
+        return np.fromiter((self.add(k) for k in keys), dtype=np.int64, count=len(keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class SrsStore:
+    def __init__(self, index=None, state=None):
+        self.index = index if index is not None else CardIndex()
+        self.version = next(_revisions) # 每次變動都會換新 (統計等快取的 Key)
+        self._bind(state if state is not None else np.zeros(0, SRS_DTYPE))
+
+    def _bind(self, state):
+        # 各欄位的 view (單筆存取時比經由結構陣列的 record 快)
+        self.state = state
+        self._next, self._interval, self._reps = state["next_review"], state["interval"], state["reps"]
+        self._weak, self._origin, self._row_version = state["weak"], state["origin"], state["row_version"]
+
+    def _ensure(self, n):
+        if n <= len(self.state): return
+        grown = np.zeros(max(n, 2 * len(self.state), 1024), SRS_DTYPE) # 攤提 O(1) 擴充
+        grown[:len(self.state)] = self.state
+        self._bind(grown)
+
+    def _id(self, key):
+        i = self.index.ids.get(key)
+        if i is None or i >= len(self._origin) or not self._origin[i]: return None
+        return i
+
+    def __contains__(self, key):
+        return self._id(key) is not None
+
+    def origin(self, key):
+        i = self._id(key)
+        return ORIGIN_NONE if i is None else int(self._origin[i])
+
+    def get(self, key):
+        # {"next_review", "interval", "reps", "weak"}；沒有狀態時回傳 None
+        i = self._id(key)
+        if i is None: return None
+        return {"next_review": ordinal_to_date(int(self._next[i])), "interval": int(self._interval[i]),
+                "reps": int(self._reps[i]), "weak": bool(self._weak[i])}
+
+    def next_review(self, key):
+        return ordinal_to_date(int(self._next[self.index.ids[key]]))
+
+    def is_weak(self, key):
+        i = self._id(key)
+        return i is not None and bool(self._weak[i])
+
+    def row_version(self, key):
+        i = self._id(key)
+        return 0 if i is None else int(self._row_version[i])
+
+    def set_row_version(self, key, version):
+        # 寫回成功 / 合併後記下新的列版本 (不算狀態變動)
+        self._row_version[self.index.ids[key]] = version
+
+    def set(self, key, next_review, interval, reps, weak, origin=ORIGIN_STORED):
+        i = self.index.add(key)
+        self._ensure(i + 1)
+        self._next[i] = date_to_ordinal(next_review)
+        self._interval[i], self._reps[i] = min(max(int(interval), 0), MAX_INTERVAL), min(max(int(reps), 0), REPS_MAX)
+        self._weak[i], self._origin[i] = bool(weak), origin
+        self.version = next(_revisions)
+        return i
+
+    def set_many(self, keys, next_review, interval, reps, weak, origin=ORIGIN_STORED, row_version=None):
+        # 整批寫入 (載入 / 帶入初始值用)；回傳 card id 陣列；row_version 為 None 時不改列版本
+        ids = self.index.add_many(keys)
+        return self.set_ids(ids, date_ordinals(next_review), interval, reps, weak, origin, row_version)
+
+    def set_ids(self, ids, next_ordinal, interval, reps, weak, origin=ORIGIN_STORED, row_version=None):
+        # 同 set_many，但以 card id 與日序數寫入
+        if not len(ids): return ids
+        self._ensure(int(ids.max()) + 1)
+        self._next[ids] = next_ordinal
+        self._interval[ids] = _clip(interval, self._interval.dtype, MAX_INTERVAL)
+        self._reps[ids] = _clip(reps, self._reps.dtype, REPS_MAX)
+        self._weak[ids] = np.asarray(weak, dtype=bool)
+        self._origin[ids] = origin
+        if row_version is not None: self._row_version[ids] = row_version
+        self.version = next(_revisions)
+        return ids
+
+    def apply_frame(self, df):
+        # SRS 表 (SRS_TABLE_COLUMNS) -> 狀態；回傳有變動的 Key
+        if df is None or df.empty: return []
+        num = lambda col: pd.to_numeric(df[col], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+        weak = df["weak"].astype(str).str.strip().str.lower().isin(["1", "true", "yes"]).to_numpy()
+        keys = df["key"].astype(str).tolist()
+        row_version = num("version") if "version" in df.columns else None
+        self.set_many(keys, df["next_review"].astype(str).str.strip().tolist(), num("interval"), num("reps"), weak,
+                      row_version=row_version)
+        return keys
+
+    def copy(self):
+        # 只複製用到的部分 (不帶走 _ensure 預留的空間)
+        return SrsStore(self.index, self.state[:min(len(self.state), len(self.index))].copy())
+
+    def copy_cards(self, other, keys):
+        # 把 other 中這些 Key 的狀態複製過來 (保留 session 作答過的卡片)
+        ids = [i for i in (other.index.get(k) for k in keys) if i is not None and i < len(other.state)]
+        if not ids: return
+        self._ensure(max(ids) + 1)
+        self.state[ids] = other.state[ids]
+        self.version = next(_revisions)
+
+    def keys_where(self, mask):
+        return [self.index.keys[i] for i in np.flatnonzero(mask)]
+
+    def weak_keys(self):
+        n = min(len(self.state), len(self.index))
+        s = self.state[:n]
+        return self.keys_where((s["weak"] != 0) & (s["origin"] != ORIGIN_NONE))
+
+    def record(self, key):
+        # SRS 表的一筆 (SRS_TABLE_COLUMNS)；version 為寫回時預期的列版本 (見 DeckStorage.save_srs)
+        s = self.get(key)
+        return {"key": key, "next_review": s["next_review"], "interval": s["interval"], "reps": s["reps"],
+                "weak": int(s["weak"]), "version": self.row_version(key)}
+
+    def __len__(self):
+        n = min(len(self.state), len(self.index))
+        return int(np.count_nonzero(self.state["origin"][:n]))
+
+    @property
+    def nbytes(self):
+        return self.state.nbytes
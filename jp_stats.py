@@ -0,0 +1,109 @@
+import threading
+import weakref
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from jp_srs import ORIGIN_NONE, date_ordinals
+
+# --- 複習量預測 / 學習統計 ---
+# 直接在 SrsStore 的狀態陣列上做向量運算 (bincount / histogram)，不逐張卡片跑 Python 迴圈。
+# 與 SRS 無關的部分 (卡片 id、Group、start_date) 每個題庫版本只算一次；
+# 統計結果以 (題庫版本, SrsStore.version, 今天) 快取，沒有作答 / 重整時 rerun 不重算。
+
+FORECAST_DAYS = 90
+INTERVAL_BINS = [0, 1, 3, 7, 14, 30, 60, 120, 240, 365]  # 最後一格為 365 天以上
+INTERVAL_LABELS = ["0", "1-2", "3-6", "7-13", "14-29", "30-59", "60-119", "120-239", "240-364", "365+"]
+
+
+class CardLayout:
+    # 題庫版本中每張卡片 (Key) 的靜態欄位，依 card id 對齊
+    def __init__(self, deck):
+        items, key_items, item_by_key = deck.catalog
+        row_group = {}
+        for ids in deck.group_items.values():
+            for i in ids: row_group[items[i]['row_idx']] = items[i]['group']
+
+        keys = list(key_items)
+        index = deck.srs.index
+        card_ids, groups, starts = [], [], []
+        for k, ids in key_items.items():
+            i = index.ids.get(k)
+            card_ids.append(index.add(k) if i is None else i)
+            first = item_by_key[k]
+            # 單字歸入所在列句子的 Group
+            groups.append(first['group'] if first['type'] == 'sentence' else row_group.get(first['row_idx'], ""))
+            # 最早的一題可出題時，整張卡片即可出題
+            starts.append(first['start_date'] if len(ids) == 1 else min(items[i]['start_date'] for i in ids))
+        self.card_ids = np.array(card_ids, dtype=np.int64)
+        codes, self.groups = pd.factorize(pd.Series(groups, dtype=object))
+        codes[np.asarray(groups, dtype=object) == ""] = -1
+        self.group_codes = codes
+        self.groups = self.groups.tolist()
+        self.start_ord = date_ordinals(starts) if keys else np.zeros(0, np.int32)
+
+    @classmethod
+    def from_arrays(cls, card_ids, groups, start_ord):
+        # 編譯好的題庫 (jp_deckpack) 已有每張卡片的 Group / start_date，不必逐題計算
+        layout = cls.__new__(cls)
+        layout.card_ids = np.asarray(card_ids, dtype=np.int64)
+        codes, uniques = pd.factorize(pd.Series(groups, dtype=object))
+        codes[np.asarray(groups, dtype=object) == ""] = -1
+        layout.group_codes, layout.groups = codes, uniques.tolist()
+        layout.start_ord = np.asarray(start_ord, dtype=np.int32)
+        return layout
+
+
+_layouts = weakref.WeakKeyDictionary() # Deck -> CardLayout (題庫版本不可變)
+_layouts_lock = threading.Lock()
+
+
+def card_layout(deck):
+    if getattr(deck, "card_layout", None) is not None: return deck.card_layout # 由編譯好的題庫載入時已附上
+    with _layouts_lock:
+        layout = _layouts.get(deck)
+        if layout is None: layout = _layouts[deck] = CardLayout(deck)
+        return layout
+
+
+def workload_stats(deck, srs, today=None):
+    # 回傳 dict：
+    #   forecast     未來 FORECAST_DAYS 天每天到期張數 (第 0 天含逾期)
+    #   overdue      已逾期 (next_review < 今天)
+    #   intervals    各間隔區間的卡片數 (INTERVAL_LABELS)
+    #   groups       DataFrame[Group, cards, weak, weak_ratio]，依 weak_ratio 排序
+    #   new_backlog  Series：start_date -> 尚未排程的卡片數；new_available 為今天已可出題的數量
+    today = (today or date.today()).toordinal()
+    layout = card_layout(deck)
+    ids = layout.card_ids
+    state = srs.state
+    inside = ids < len(state)
+    rec = np.zeros(len(ids), state.dtype)
+    rec[inside] = state[ids[inside]]
+    scheduled = rec["origin"] != ORIGIN_NONE
+
+    days = rec["next_review"][scheduled].astype(np.int64) - today
+    upcoming = np.clip(days, 0, None)
+    forecast = np.bincount(upcoming[upcoming < FORECAST_DAYS], minlength=FORECAST_DAYS)
+
+    interval = rec["interval"][scheduled]
+    intervals = np.histogram(interval, bins=INTERVAL_BINS + [max(int(interval.max(initial=0)), 365) + 1])[0]
+
+    weak = (rec["weak"] != 0) & scheduled
+    grouped = layout.group_codes >= 0
+    n_groups = len(layout.groups)
+    cards = np.bincount(layout.group_codes[grouped], minlength=n_groups)
+    weak_cards = np.bincount(layout.group_codes[grouped & weak], minlength=n_groups)
+    groups = pd.DataFrame({"Group": layout.groups, "cards": cards, "weak": weak_cards})
+    groups = groups[groups["cards"] > 0]
+    groups["weak_ratio"] = groups["weak"] / groups["cards"]
+    groups = groups.sort_values(["weak_ratio", "weak"], ascending=False, kind="stable").reset_index(drop=True)
+
+    start = layout.start_ord[~scheduled]
+    ords, counts = np.unique(start, return_counts=True)
+    new_backlog = pd.Series(counts, index=[date.fromordinal(int(o)).strftime("%Y-%m-%d") for o in ords], dtype=np.int64)
+
+    return {"forecast": forecast, "overdue": int(np.count_nonzero(days < 0)), "intervals": intervals,
+            "scheduled": int(np.count_nonzero(scheduled)), "weak": int(np.count_nonzero(weak)), "groups": groups,
+            "new_backlog": new_backlog, "new_available": int(np.count_nonzero(start <= today))}
@@ -0,0 +1,518 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import pandas as pd
+
+# --- 題庫儲存後端 ---
+# 介面：load_all / load_delta / upsert_rows / append_log / load_srs / load_srs_records / save_srs
+# row_idx 一律對應 DataFrame 的 index (= 原始資料的第幾列，從 0 起算)
+
+EXPECTED_COLUMNS = ["Sentence", "Translation", "Group", "Parsing",
+                    "Vocab List", "Meaning", "Time", "Weak",
+                    "Next_Review", "Interval", "Reps"]
+
+SRS_COLUMNS = ["Weak", "Next_Review", "Interval", "Reps"]
+
+LOG_COLUMNS = ["ts", "key", "mode", "correct", "latency_ms"]
+
+LOG_WORKSHEET = "ReviewLog"
+
+# 每張卡片 (句子 / 單字) 的 SRS 狀態，存在題庫以外的獨立表 (見 jp_srs)
+# version 是列版本：每次寫入都會改變，寫回時比對 (compare-and-set)，多個 session / 裝置同時作答不會互相覆蓋
+SRS_TABLE_COLUMNS = ["key", "next_review", "interval", "reps", "weak", "version"]
+
+SRS_WORKSHEET = "SRS"
+
+
+class StorageError(Exception):
+    pass
+
+
+def row_key(row):
+    # 匯入時比對既有列用：有句子時依 Sentence，否則依 Vocab List
+    return ("Sentence", row["Sentence"]) if row["Sentence"] else ("Vocab List", row["Vocab List"])
+
+
+def normalize_frame(df):
+    # 補齊必要欄位，防止新 Sheet 缺少欄位報錯
+    for col in EXPECTED_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    # 資料清理
+    df = df.fillna("")
+    # SRS 欄位會被寫入數字與字串，固定用 object 欄位以免被推斷成純文字型別
+    for col in SRS_COLUMNS:
+        df[col] = df[col].astype(object)
+    return df
+
+
+class DeckStorage:
+    name = "base"
+    read_only = False
+
+    def load_all(self):
+        # 回傳整份題庫；df.attrs["version"] 為之後 load_delta 的起點
+        raise NotImplementedError
+
+    def load_delta(self, since):
+        # 回傳 version > since 的列 (index 與 load_all 相同)
+        # df.attrs["full"]: True 表示回傳的是整份題庫 (呼叫端需自行比對哪些列有變)
+        # df.attrs["row_ids"]: 只回傳部分列時，目前所有列的 row_idx (用來判斷刪除)；None 表示沒有刪除
+        raise NotImplementedError
+
+    def upsert_rows(self, rows):
+        # rows: [{EXPECTED_COLUMNS: 字串}]；依 row_key 覆寫既有的列 (同 Key 多列時為第一列)，其餘附加在最後
+        # 同一批中重複的 Key 以後者為準；回傳 (新增列數, 有變動的既有列數)
+        raise NotImplementedError
+
+    def append_log(self, records):
+        # records: [{"ts", "key", "mode", "correct", "latency_ms"}]
+        raise NotImplementedError
+
+    def load_srs(self, since=None):
+        # 回傳 SRS 表 (SRS_TABLE_COLUMNS)；since 不為 None 時只回傳之後變動的卡片
+        # df.attrs["version"] 為下次呼叫的 since
+        raise NotImplementedError
+
+    def load_srs_records(self, keys):
+        # 只讀這些卡片：{key: SRS 表的一筆 (SRS_TABLE_COLUMNS)}，表中沒有的 Key 不回傳
+        raise NotImplementedError
+
+    def save_srs(self, records):
+        # records: [{"key", "next_review", "interval", "reps", "weak", "version"}]，依 key 新增或覆寫
+        # compare-and-set：只有表上的列版本仍等於 record["version"] (0 = 表中沒有) 才寫入
+        # 回傳 (written, conflicts)：written = {key: 新的列版本}；conflicts = {key: 表上目前的 record} (未寫入)
+        raise NotImplementedError
+
+
+def empty_srs_frame(version=None):
+    df = pd.DataFrame(columns=SRS_TABLE_COLUMNS)
+    df.attrs["version"] = version
+    return df
+
+
+# --- Google Sheets ---
+
+def _col_letter(col_num):
+    # 1 -> A, 27 -> AA
+    letters = ""
+    while col_num > 0:
+        col_num, rem = divmod(col_num - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+class GSheetsStorage(DeckStorage):
+    name = "gsheets"
+
+    def __init__(self, conn, open_spreadsheet=None):
+        # conn: st.connection("gsheets", type=GSheetsConnection)，只用來讀整張題庫 (read)
+        # open_spreadsheet: () -> gspread.Spreadsheet (見 gspread_opener)，寫入與其他分頁 (SRS / ReviewLog) 用
+        self.conn = conn
+        self.open_spreadsheet = open_spreadsheet
+        self._book = None
+
+    def _spreadsheet(self):
+        if self._book is None:
+            if self.open_spreadsheet is not None:
+                self._book = self.open_spreadsheet()
+            else:
+                # 沒有服務帳號的 secrets：退回 streamlit-gsheets 的內部方法 (只有這裡用，套件改版時可能失效)
+                opener = getattr(getattr(self.conn, "client", None), "_open_spreadsheet", None)
+                if opener is None:
+                    raise StorageError("無法開啟 Google Sheets 試算表：請在 secrets 的 [connections.gsheets] "
+                                       "設定服務帳號 (type = \"service_account\") 與 spreadsheet")
+                self._book = opener()
+        return self._book
+
+    def _deck_worksheet(self):
+        # 與 conn.read() 相同：第一個分頁
+        return self._spreadsheet().get_worksheet(0)
+
+    def load_all(self):
+        # read(ttl=0) 確保每次都讀取最新資料，不快取
+        df = self.conn.read(ttl=0)
+        df = normalize_frame(df)
+        df.attrs["version"] = None # Sheets 沒有逐列版本，只能整張重讀
+        df.attrs["full"] = True
+        return df
+
+    def load_delta(self, since):
+        # Sheets API 沒有「哪些列變了」的查詢，由呼叫端用逐列 hash 比對
+        return self.load_all()
+
+    def upsert_rows(self, rows):
+        # 只讀 Key 兩欄比對；既有列整列覆寫 (沒有逐列版本，內容相同也會寫入)
+        if not rows: return 0, 0
+        rows = list({row_key(r): r for r in rows}.values())
+        ws = self._deck_worksheet()
+        header = ws.row_values(1)
+        missing = [c for c in EXPECTED_COLUMNS if c not in header]
+        if missing:
+            header += missing
+            ws.batch_update([{"range": f"A1:{_col_letter(len(header))}1", "values": [header]}])
+        existing = {}
+        sentences, vocab = ws.col_values(header.index("Sentence") + 1), ws.col_values(header.index("Vocab List") + 1)
+        for n in range(1, max(len(sentences), len(vocab))):
+            row = {"Sentence": sentences[n].strip() if n < len(sentences) else "",
+                   "Vocab List": vocab[n].strip() if n < len(vocab) else ""}
+            if row["Sentence"] or row["Vocab List"]: existing.setdefault(row_key(row), n + 1)
+        last_col = _col_letter(len(header))
+        values = lambda r: [r.get(c, "") for c in header]
+        updates, new = [], []
+        for r in rows:
+            sheet_row = existing.get(row_key(r))
+            if sheet_row: updates.append({"range": f"A{sheet_row}:{last_col}{sheet_row}", "values": [values(r)]})
+            else: new.append(values(r))
+        if updates: ws.batch_update(updates)
+        if new: ws.append_rows(new)
+        return len(new), len(updates)
+
+    def append_log(self, records):
+        if not records: return
+        from gspread.exceptions import WorksheetNotFound
+        spreadsheet = self._spreadsheet()
+        try:
+            ws = spreadsheet.worksheet(LOG_WORKSHEET)
+        except WorksheetNotFound:
+            ws = spreadsheet.add_worksheet(LOG_WORKSHEET, rows=1, cols=len(LOG_COLUMNS))
+            ws.append_row(LOG_COLUMNS)
+        ws.append_rows([[r.get(c, "") for c in LOG_COLUMNS] for r in records])
+
+    def _srs_worksheet(self, create=False):
+        from gspread.exceptions import WorksheetNotFound
+        spreadsheet = self._spreadsheet()
+        try:
+            return spreadsheet.worksheet(SRS_WORKSHEET)
+        except WorksheetNotFound:
+            if not create: return None
+            ws = spreadsheet.add_worksheet(SRS_WORKSHEET, rows=1, cols=len(SRS_TABLE_COLUMNS))
+            ws.append_row(SRS_TABLE_COLUMNS)
+            return ws
+
+    def load_srs(self, since=None):
+        # 沒有逐列版本：每次整張讀取
+        ws = self._srs_worksheet()
+        rows = [r + [""] * (len(SRS_TABLE_COLUMNS) - len(r)) for r in (ws.get_all_values()[1:] if ws else []) if r and r[0]]
+        df = pd.DataFrame([r[:len(SRS_TABLE_COLUMNS)] for r in rows], columns=SRS_TABLE_COLUMNS)
+        df = df.drop_duplicates("key").reset_index(drop=True) # 同 Key 多列時以第一列為準 (見 save_srs)
+        df.attrs["version"] = None
+        return df
+
+    def load_srs_records(self, keys):
+        # 讀 Key 欄找出列號，再只讀這些列
+        ws = self._srs_worksheet()
+        if ws is None or not keys: return {}
+        rows = _key_rows(ws.col_values(1))
+        wanted = [rows[k] for k in dict.fromkeys(keys) if k in rows]
+        if not wanted: return {}
+        last_col = _col_letter(len(SRS_TABLE_COLUMNS))
+        records = {}
+        for values in ws.batch_get([f"A{row}:{last_col}{row}" for row in wanted]):
+            values = (values[0] if values else []) + [""] * len(SRS_TABLE_COLUMNS)
+            records[values[0]] = _srs_record(values)
+        return records
+
+    def save_srs(self, records):
+        # Sheets 沒有交易：先讀版本欄 (只讀一欄) 比對，再寫入版本相符的列 (讀寫之間仍有極短的空窗)
+        if not records: return {}, {}
+        ws = self._srs_worksheet(create=True)
+        keys = ws.col_values(1)
+        rows = _key_rows(keys)
+        versions = ws.col_values(len(SRS_TABLE_COLUMNS))
+        current = lambda row: _to_int(versions[row - 1]) if row <= len(versions) else 0
+        last_col = _col_letter(len(SRS_TABLE_COLUMNS))
+        updates, new, written, stale = [], [], {}, []
+        for r in records:
+            row = rows.get(r["key"])
+            if row and current(row) != int(r["version"] or 0):
+                stale.append(row)
+                continue
+            version = written[r["key"]] = int(r["version"] or 0) + 1
+            values = [r[c] for c in SRS_TABLE_COLUMNS[:-1]] + [version]
+            if row: updates.append({"range": f"A{row}:{last_col}{row}", "values": [values]})
+            else: new.append(values)
+        if updates: ws.batch_update(updates)
+        if new:
+            # 新卡片沒有列版本可比，兩台裝置可能同時附加同一個 Key：附加後讀回 Key 欄，同 Key 以第一列為準。
+            # 自己附加的不是第一列時改回報衝突 (由呼叫端合併後重寫)，並清掉該列的 Key。
+            # 不刪列：其他裝置剛讀到的列號不會錯位；沒有 Key 的列讀取時一律略過。
+            first = _appended_row(ws.append_rows(new), len(keys) + 1)
+            rows = _key_rows(ws.col_values(1))
+            lost = []
+            for n, values in enumerate(new):
+                key, row = values[0], first + n
+                if rows.get(key, row) == row: continue
+                lost.append({"range": f"A{row}", "values": [[""]]})
+                stale.append(rows[key])
+                del written[key]
+            if lost: ws.batch_update(lost)
+        conflicts = {}
+        if stale:
+            # 只讀回衝突的列
+            for values in ws.batch_get([f"A{row}:{last_col}{row}" for row in stale]):
+                values = (values[0] if values else []) + [""] * len(SRS_TABLE_COLUMNS)
+                conflicts[values[0]] = _srs_record(values)
+        return written, conflicts
+
+
+def _key_rows(keys):
+    # Key 欄 (含表頭) -> {key: Sheet 列號}；同 Key 多列時取第一列
+    rows = {}
+    for n, k in enumerate(keys):
+        if n and k: rows.setdefault(k, n + 1)
+    return rows
+
+
+def _appended_row(response, default):
+    # append_rows 的回應 {"updates": {"updatedRange": "SRS!A5:F6"}} -> 第一列的列號 (5)
+    try:
+        start = response["updates"]["updatedRange"].split("!")[-1].split(":")[0]
+        return int(start.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _srs_record(values):
+    record = dict(zip(SRS_TABLE_COLUMNS, values))
+    for col in ["interval", "reps", "version"]: record[col] = _to_int(record[col])
+    record["weak"] = int(str(record["weak"]).strip().lower() in ("1", "true", "yes"))
+    return record
+
+
+# --- SQLite (本機) ---
+
+class SqliteStorage(DeckStorage):
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            cols = ", ".join(f'"{c}" TEXT' for c in EXPECTED_COLUMNS)
+            db.execute(f"CREATE TABLE IF NOT EXISTS deck (row_idx INTEGER PRIMARY KEY, {cols}, "
+                       "version INTEGER NOT NULL DEFAULT 0)")
+            db.execute("CREATE INDEX IF NOT EXISTS deck_version ON deck (version)")
+            db.execute('CREATE INDEX IF NOT EXISTS deck_sentence ON deck ("Sentence")')
+            db.execute('CREATE INDEX IF NOT EXISTS deck_vocab ON deck ("Vocab List")')
+            db.execute("CREATE TABLE IF NOT EXISTS review_log (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                       "ts TEXT, key TEXT, mode INTEGER, correct INTEGER, latency_ms REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS srs (key TEXT PRIMARY KEY, next_review TEXT, interval INTEGER, "
+                       "reps INTEGER, weak INTEGER, version INTEGER NOT NULL DEFAULT 0)")
+            db.execute("CREATE INDEX IF NOT EXISTS srs_version ON srs (version)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v INTEGER)")
+            db.execute("INSERT OR IGNORE INTO meta VALUES ('version', 0)")
+
+    def _connect(self):
+        # 每次操作開新連線：Streamlit 各 session 在不同 thread 執行
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _bump_version(self, db):
+        db.execute("UPDATE meta SET v = v + 1 WHERE k = 'version'")
+        return db.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()[0]
+
+    def _read(self, where="", params=()):
+        with self._connect() as db:
+            version = db.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()[0]
+            df = pd.read_sql_query(f"SELECT * FROM deck {where} ORDER BY row_idx", db,
+                                   params=params, index_col="row_idx")
+        df = normalize_frame(df.drop(columns=["version"]))
+        df.index.name = None
+        df.attrs["version"] = version
+        df.attrs["full"] = not where
+        return df
+
+    def load_all(self):
+        return self._read()
+
+    def load_delta(self, since):
+        if since is None: return self.load_all()
+        df = self._read("WHERE version > ?", (since,))
+        with self._connect() as db:
+            df.attrs["row_ids"] = [r for (r,) in db.execute("SELECT row_idx FROM deck ORDER BY row_idx")]
+        return df
+
+    def upsert_rows(self, rows):
+        # 整批在同一個交易內；只有內容不同的列才會更新 (換新版本，DeckCache 重整時才會被視為變動)
+        if not rows: return 0, 0
+        rows = list({row_key(r): r for r in rows}.values())
+        cols = ", ".join(f'"{c}"' for c in EXPECTED_COLUMNS)
+        with self._connect() as db:
+            existing = {} # row_key -> (row_idx, 原本的值)
+            lookups = [("Sentence", '"Sentence" IN'), ("Vocab List", '"Sentence" = \'\' AND "Vocab List" IN')]
+            for col, where in lookups:
+                keys = [k for c, k in map(row_key, rows) if c == col]
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    marks = ", ".join("?" for _ in chunk)
+                    for row_idx, *values in db.execute(f"SELECT row_idx, {cols} FROM deck WHERE {where} ({marks}) "
+                                                    "ORDER BY row_idx", chunk):
+                        existing.setdefault(row_key(dict(zip(EXPECTED_COLUMNS, values))), (row_idx, tuple(values)))
+            inserts, updates = [], []
+            for r in rows:
+                values = tuple(_to_text(r.get(c, "")) for c in EXPECTED_COLUMNS)
+                found = existing.get(row_key(r))
+                if found is None: inserts.append(values)
+                elif found[1] != values: updates.append(values + (found[0],))
+            if not inserts and not updates: return 0, 0
+            version = self._bump_version(db)
+            next_idx = db.execute("SELECT COALESCE(MAX(row_idx), -1) + 1 FROM deck").fetchone()[0]
+            marks = ", ".join("?" for _ in EXPECTED_COLUMNS)
+            db.executemany(f"INSERT INTO deck (row_idx, {cols}, version) VALUES (?, {marks}, ?)",
+                           [(next_idx + n, *values, version) for n, values in enumerate(inserts)])
+            assigns = ", ".join(f'"{c}" = ?' for c in EXPECTED_COLUMNS)
+            db.executemany(f"UPDATE deck SET {assigns}, version = {int(version)} WHERE row_idx = ?", updates)
+        return len(inserts), len(updates)
+
+    def append_log(self, records):
+        if not records: return
+        with self._connect() as db:
+            db.executemany("INSERT INTO review_log (ts, key, mode, correct, latency_ms) VALUES (?, ?, ?, ?, ?)",
+                           [tuple(r.get(c) for c in LOG_COLUMNS) for r in records])
+
+    def load_srs(self, since=None):
+        with self._connect() as db:
+            version = db.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()[0]
+            cols = ", ".join(SRS_TABLE_COLUMNS)
+            df = pd.read_sql_query(f"SELECT {cols} FROM srs WHERE version > ?", db, params=(since or 0,))
+        df.attrs["version"] = version
+        return df
+
+    def load_srs_records(self, keys):
+        keys, records = list(dict.fromkeys(keys)), {}
+        cols = ", ".join(SRS_TABLE_COLUMNS)
+        with self._connect() as db:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ", ".join("?" for _ in chunk)
+                for row in db.execute(f"SELECT {cols} FROM srs WHERE key IN ({marks})", chunk):
+                    records[row[0]] = dict(zip(SRS_TABLE_COLUMNS, row))
+        return records
+
+    def save_srs(self, records):
+        # 列版本用全域版本號 (同時是 load_srs 的增量起點)；整批在同一個交易內比對與寫入
+        if not records: return {}, {}
+        keys = [r["key"] for r in records]
+        with self._connect() as db:
+            version = self._bump_version(db)
+            db.executemany("INSERT INTO srs (key, next_review, interval, reps, weak, version) VALUES (?, ?, ?, ?, ?, ?) "
+                           "ON CONFLICT (key) DO UPDATE SET next_review = excluded.next_review, "
+                           "interval = excluded.interval, reps = excluded.reps, weak = excluded.weak, "
+                           "version = excluded.version WHERE srs.version = ?",
+                           [(r["key"], r["next_review"], int(r["interval"]), int(r["reps"]), int(r["weak"]), version,
+                             int(r["version"] or 0)) for r in records])
+            cols = ", ".join(SRS_TABLE_COLUMNS)
+            conflicts = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ", ".join("?" for _ in chunk)
+                for row in db.execute(f"SELECT {cols} FROM srs WHERE key IN ({marks}) AND version != ?", chunk + [version]):
+                    conflicts[row[0]] = dict(zip(SRS_TABLE_COLUMNS, row))
+        return {k: version for k in keys if k not in conflicts}, conflicts
+
+    def replace_all(self, df):
+        # 以整份 DataFrame 取代題庫 (初次匯入用)
+        df = normalize_frame(df.copy())
+        with self._connect() as db:
+            version = self._bump_version(db)
+            db.execute("DELETE FROM deck")
+            cols = ", ".join(f'"{c}"' for c in EXPECTED_COLUMNS)
+            marks = ", ".join("?" for _ in EXPECTED_COLUMNS)
+            db.executemany(f"INSERT INTO deck (row_idx, {cols}, version) VALUES (?, {marks}, ?)",
+                           [(i, *(_to_text(v) for v in row), version)
+                            for i, row in enumerate(df[EXPECTED_COLUMNS].itertuples(index=False))])
+
+
+def _to_text(value):
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.strftime("%Y-%m-%d")
+    if value is None or value == "":
+        return ""
+    return str(value)
+
+
+# --- Phrases.xlsx (唯讀) ---
+
+class XlsxStorage(DeckStorage):
+    name = "xlsx"
+    read_only = True
+
+    def __init__(self, path):
+        self.path = path
+
+    def load_all(self):
+        df = normalize_frame(pd.read_excel(self.path))
+        df.attrs["version"] = os.path.getmtime(self.path)
+        df.attrs["full"] = True
+        return df
+
+    def load_delta(self, since):
+        if since is not None and os.path.getmtime(self.path) <= since:
+            df = normalize_frame(pd.DataFrame(columns=EXPECTED_COLUMNS))
+            df.attrs.update(version=since, full=False, row_ids=None)
+            return df
+        return self.load_all()
+
+    def upsert_rows(self, rows):
+        raise StorageError(f"{self.path} 為唯讀題庫，無法寫入")
+
+    def append_log(self, records):
+        raise StorageError(f"{self.path} 為唯讀題庫，無法寫入")
+
+    def load_srs(self, since=None):
+        return empty_srs_frame()
+
+    def load_srs_records(self, keys):
+        return {}
+
+    def save_srs(self, records):
+        raise StorageError(f"{self.path} 為唯讀題庫，無法寫入")
+
+
+def gsheets_secrets(name="gsheets"):
+    # .streamlit/secrets.toml 的 [connections.gsheets]；沒有 secrets 時回傳 None
+    try:
+        import streamlit as st
+        return dict(st.secrets["connections"][name])
+    except Exception:
+        return None
+
+
+def gspread_opener(secrets):
+    # 以 gspread 的公開 API 開啟 secrets 指定的試算表 (spreadsheet 為 URL 或名稱)；不是服務帳號時回傳 None
+    if not secrets or secrets.get("type") != "service_account": return None
+    def open_spreadsheet():
+        import gspread
+        creds = {k: v for k, v in secrets.items() if k not in ("spreadsheet", "worksheet")}
+        client = gspread.service_account_from_dict(creds)
+        spreadsheet = secrets["spreadsheet"]
+        return client.open_by_url(spreadsheet) if spreadsheet.startswith("https://") else client.open(spreadsheet)
+    return open_spreadsheet
+
+
+def create_storage(backend, conn_factory=None, sqlite_path="jp_deck.db", xlsx_path="Phrases.xlsx"):
+    if backend == "gsheets":
+        return GSheetsStorage(conn_factory(), gspread_opener(gsheets_secrets()))
+    if backend == "sqlite":
+        return SqliteStorage(sqlite_path)
+    if backend == "xlsx":
+        return XlsxStorage(xlsx_path)
+    raise StorageError(f"未知的儲存後端: {backend}")
+
+
+if __name__ == "__main__":
+    # 用法: python jp_storage.py Phrases.xlsx jp_deck.db  (以 xlsx 內容建立本機 SQLite 題庫)
+    import sys
+    src, dst = sys.argv[1], sys.argv[2]
+    start = time.perf_counter()
+    df = XlsxStorage(src).load_all()
+    SqliteStorage(dst).replace_all(df)
+    print(f"{len(df)} rows -> {dst} ({time.perf_counter() - start:.2f}s)")
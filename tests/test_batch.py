@@ -0,0 +1,79 @@
+import gc
+import random
+
+import pytest
+
+import jp_deck_cache
+from deckgen import make_deck_frame
+from jp_batch import BatchJournal
+from jp_deck_cache import DeckCache
+from jp_quiz import QuizEngine
+
+# --- 批次日誌：同一個 process 的多個 session ---
+
+
+@pytest.fixture
+def saved():
+    return [] # 寫回的作答紀錄
+
+
+@pytest.fixture
+def engine(monkeypatch, saved):
+    monkeypatch.setattr(jp_deck_cache, "annotate_readings_in_background", lambda *args: None)
+    df = make_deck_frame(60)
+    def save(records, log):
+        saved.extend(log)
+        return {r["key"]: r["version"] + 1 for r in records}, {}
+    return QuizEngine(DeckCache(lambda: df), save)
+
+
+def answer(session, n):
+    for _ in range(n):
+        q = session.next_question()
+        session.submit(sorted(b['id'] for b in q.parsing) if q.mode == 6 else q.correct)
+
+
+def test_second_session_cannot_take_over_batch(engine, saved, tmp_path):
+    journal = BatchJournal(str(tmp_path / "batch.jsonl"), "a")
+    a, b = engine.session(random.Random(1)), engine.session(random.Random(2))
+    a.start_batch(5, journal)
+    answer(a, 2)
+
+    # 第二個 session 拿到同一個日誌：不接續、也不重播 a 的作答
+    assert b.resume_batch(journal) is None
+    assert b.batch is None and not b.pending_writes
+    b.start_batch(3, journal)
+    assert b.batch.journal is None # 新批次不寫 a 的檔案
+    answer(b, 3)
+    b.next_question() # b 的批次結束 (寫回)，不能刪掉 a 的日誌
+    assert b.batch is None
+
+    answer(a, 3) # 原本會在 BatchJournal._write 因檔案被關閉而 AttributeError
+    a.next_question()
+    assert a.batch is None
+    assert len(saved) == 2 + 3 + 3 # 每個作答只寫回一次
+
+
+def test_resume_only_own_journal(engine, tmp_path):
+    path = str(tmp_path / "batch.jsonl")
+    a = engine.session(random.Random(1))
+    a.start_batch(5, BatchJournal(path, "a"))
+    answer(a, 2)
+    del a
+    gc.collect() # session 結束：日誌不再被佔用
+
+    assert engine.session().resume_batch(BatchJournal(path, "b")) is None # 別人的批次
+    c = engine.session()
+    assert c.resume_batch(BatchJournal(path, "a")) == 3
+    assert c.batch.answered == 2 and len(c.pending_writes) == 2
+
+
+def test_write_after_close(tmp_path):
+    journal = BatchJournal(str(tmp_path / "batch.jsonl"))
+    journal.start([("k", 1, "new")])
+    journal.close()
+    journal.skip(0) # 關閉後仍可附加
+    assert journal.load()["position"] == 1
+    journal.close(remove=True)
+    journal.committed(1) # 已刪除：不再記錄
+    assert journal.load() is None
@@ -0,0 +1,86 @@
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from jp_grade import DIFFLIB_MAX_LEN, SCORE_FLOOR, _band_opcodes, distance, grade, opcodes
+
+# --- 編輯距離判分：與逐格 DP / difflib 對照 ---
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをんーっゃゅょ"
+
+
+def levenshtein(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def pairs(n, seed, max_len):
+    # 隨機假名字串與其變形 (替換 / 刪除 / 插入)，另有完全不同的字串與空字串
+    rng = random.Random(seed)
+    alphabet = KANA[:rng.choice([3, 10, len(KANA)])] # 字母少時重複多，容易有多條最短路徑
+    out = []
+    for _ in range(n):
+        b = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+        if rng.random() < 0.2:
+            a = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+        else:
+            t = list(b)
+            for _ in range(rng.randint(0, 6)):
+                op, i = rng.random(), rng.randrange(len(t) + 1)
+                if op < 0.4 and i < len(t): t[i] = rng.choice(alphabet)
+                elif op < 0.7 and i < len(t): del t[i]
+                else: t.insert(i, rng.choice(alphabet))
+            a = "".join(t)
+        out.append((a, b))
+    return out
+
+
+def apply(ops, a, b):
+    # 依 opcodes 由 a 組回 b，並檢查各段首尾相接
+    out, i, j = [], 0, 0
+    for tag, i1, i2, j1, j2 in ops:
+        assert (i1, j1) == (i, j)
+        if tag == "equal": assert a[i1:i2] == b[j1:j2]
+        out.append(b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return "".join(out)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_distance_and_grade(seed):
+    for a, b in pairs(300, seed, 40):
+        d = levenshtein(a, b)
+        assert distance(a, b) == d
+        for limit in [0, 1, 3, 8]:
+            assert distance(a, b, limit) == (d if d <= limit else None)
+        longest = max(len(a), len(b))
+        for tolerance in [0.0, 0.15]:
+            if a == b or not longest: want = (True, 1.0)
+            elif d > int(longest * (1 - SCORE_FLOOR)): want = (False, 0.0)
+            else: want = (d <= int(longest * tolerance), 1 - d / longest)
+            assert grade(a, b, tolerance) == want
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_band_opcodes_shortest_edit(seed):
+    for a, b in pairs(200, seed, 120):
+        ops = _band_opcodes(a, b)
+        assert apply(ops, a, b) == b
+        assert sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in ops if tag != "equal") == levenshtein(a, b)
+
+
+def test_opcodes_round_trip():
+    for a, b in pairs(400, 9, 2 * DIFFLIB_MAX_LEN):
+        ops = opcodes(a, b)
+        assert apply(ops, a, b) == b
+        if max(len(a), len(b)) <= DIFFLIB_MAX_LEN:
+            assert ops == SequenceMatcher(None, a, b).get_opcodes()
+        else:
+            assert ops == _band_opcodes(a, b)
@@ -0,0 +1,208 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from jp_deck import _norm_date, parse_data
+from jp_storage import EXPECTED_COLUMNS, XlsxStorage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- parse_data 與舊版逐列 (iterrows) 解析的一致性 ---
+# legacy_parse_data 為改寫前 japanese_app.parse_data 的原樣，只多記下 issues / row_state
+# (舊版遇到錯誤時默默改用預設值的地方)，用來比對欄位式版本的全部輸出。
+
+
+def legacy_parse_data(df, issues, row_state):
+    sentence_data = []
+    vocab_data = []
+    group_map = {}
+
+    all_sentence_translations = []
+    all_vocab_meanings = []
+
+    srs_map = {}
+    mistakes_list = []
+
+    default_date = datetime.now().strftime("%Y-%m-%d")
+
+    for idx, row in df.iterrows():
+        time_str = str(row.get('Time', default_date)).strip()
+        if not time_str: time_str = default_date
+        try:
+            time_str = pd.to_datetime(time_str).strftime("%Y-%m-%d")
+        except Exception:
+            issues.setdefault("Time", []).append(idx)
+
+        next_review = str(row.get('Next_Review', '')).strip()
+        if not next_review: next_review = default_date
+        try:
+            next_review = pd.to_datetime(next_review).strftime("%Y-%m-%d")
+        except Exception:
+            next_review = default_date
+            issues.setdefault("Next_Review", []).append(idx)
+
+        try:
+            interval = int(float(row.get('Interval', 0) or 0))
+            reps = int(float(row.get('Reps', 0) or 0))
+        except Exception:
+            interval = 0
+            reps = 0
+            issues.setdefault("Interval/Reps", []).append(idx)
+
+        is_weak = str(row.get('Weak', '')).strip().lower() in ['yes', 'true', '1']
+        entry = {"next_review": next_review, "interval": interval, "reps": reps, "row_idx": idx}
+
+        s_ja = str(row.get('Sentence', '')).strip()
+        s_ch = str(row.get('Translation', '')).strip()
+        gid = str(row.get('Group', '')).strip()
+        parsing_raw = str(row.get('Parsing', '')).strip().replace('＋', '+')
+
+        if s_ja:
+            sentence_data.append({
+                "type": "sentence",
+                "sentence": s_ja,
+                "translation": s_ch,
+                "group": gid,
+                "parsing": [p.strip() for p in parsing_raw.split('+') if p.strip()],
+                "start_date": time_str,
+                "row_idx": idx
+            })
+            all_sentence_translations.append(s_ch)
+            if gid:
+                if gid not in group_map: group_map[gid] = []
+                if s_ja not in group_map[gid]: group_map[gid].append(s_ja)
+            srs_map[s_ja] = dict(entry)
+            row_state[idx] = (dict(entry), is_weak)
+            if is_weak: mistakes_list.append(s_ja)
+
+        v_list_raw = str(row.get('Vocab List', '')).strip()
+        m_list_raw = str(row.get('Meaning', '')).strip()
+
+        if v_list_raw and m_list_raw:
+            v_items = [x.strip() for x in v_list_raw.split('。') if x.strip()]
+            m_items = [x.strip() for x in m_list_raw.split('。') if x.strip()]
+
+            if len(v_items) == len(m_items):
+                for i, v_str in enumerate(v_items):
+                    if '｜' in v_str:
+                        kanji, reading = v_str.split('｜', 1)
+                    else:
+                        kanji, reading = v_str, v_str
+                    kanji = kanji.strip()
+                    vocab_data.append({
+                        "type": "vocab",
+                        "kanji": kanji,
+                        "reading": reading.strip(),
+                        "meaning": m_items[i],
+                        "start_date": time_str,
+                        "row_idx": idx
+                    })
+                    all_vocab_meanings.append(m_items[i])
+                    srs_map[kanji] = dict(entry)
+                    row_state[idx] = (dict(entry), is_weak)
+                    if is_weak: mistakes_list.append(kanji)
+            else:
+                issues.setdefault("Vocab List/Meaning", []).append(idx)
+
+    return sentence_data, vocab_data, group_map, (all_sentence_translations, all_vocab_meanings), srs_map, mistakes_list
+
+
+def fuzzed_frame(n, seed):
+    # 正常列混合各種格式錯誤：無法解析的 Time / Next_Review、非數字的 Interval / Reps、缺值、
+    # 單字與意思數量不符、重複的句子 / 單字 (Key)；index 為不連續、打亂的標籤 (同試算表列號)
+    rnd = random.Random(seed)
+    today = datetime.now()
+    words = [("賛成", "さんせい", "贊成"), ("名案", "めいあん", "好主意"), ("猫", "ねこ", "貓"), ("犬", "いぬ", "狗"),
+             ("食べる", "たべる", "吃"), ("水", "みず", "水"), ("本", "ほん", "書"), ("早い", "はやい", "早")]
+    sentences = [f"文{i}です。" for i in range(n // 3)] + ["賛成です。", "名案です。"] # 有重複
+    date = lambda: (today + timedelta(days=rnd.randint(-30, 30))).strftime(rnd.choice(["%Y-%m-%d", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S"]))
+    # 不放 None：iterrows 有時會把同一列的 None 轉成 NaN (依其他欄的型別)，舊版本身就不一致
+    bad_date = lambda: rnd.choice(["明天", "2026-13-45", "abc", "  ", "", np.nan, 20260101])
+    rows = []
+    for _ in range(n):
+        picked = rnd.sample(words, rnd.randint(0, 3))
+        vocab = "。".join(f"{k}｜{r}" if rnd.random() < 0.8 else k for k, r, _ in picked)
+        meaning = "。".join(m for _, _, m in picked)
+        if picked and rnd.random() < 0.1: meaning += "。多餘" # 數量不符
+        if rnd.random() < 0.05: vocab, meaning = vocab + "。", " " + meaning # 多餘的分隔 / 空白
+        rows.append({
+            "Sentence": rnd.choice(sentences) if rnd.random() < 0.85 else rnd.choice(["", "  ", np.nan]),
+            "Translation": rnd.choice(["翻譯", "另一個翻譯", " 有空白 ", "", np.nan]),
+            "Group": rnd.choice(["", "", "1", "2", "g3", 4, np.nan]),
+            "Parsing": rnd.choice(["", "賛成＋です", "私+も＋賛同 + します", "+ ＋", np.nan]),
+            "Vocab List": vocab if picked else rnd.choice(["", np.nan, "孤立"]),
+            "Meaning": meaning if picked else rnd.choice(["", np.nan]),
+            "Time": date() if rnd.random() < 0.8 else bad_date(),
+            "Weak": rnd.choice(["", "", "yes", "TRUE", "1", "no", " Yes ", np.nan, 1]),
+            "Next_Review": date() if rnd.random() < 0.75 else bad_date(),
+            "Interval": rnd.choice([0, 1, 3, "7", "2.5", "", "abc", np.nan, -1, 12.0]),
+            "Reps": rnd.choice([0, 1, "2", "", "x", np.nan, 3.7]),
+        })
+    labels = rnd.sample(range(2, 10 * n), n) # 不連續、不依順序
+    return pd.DataFrame(rows, index=labels, columns=EXPECTED_COLUMNS)
+
+
+def plain(items):
+    # 題目記錄 -> 舊版的 dict 格式 (不含預先算好的讀音)
+    fields = {"sentence": ["sentence", "translation", "group", "parsing", "start_date", "row_idx"],
+              "vocab": ["kanji", "reading", "meaning", "start_date", "row_idx"]}
+    out = []
+    for item in items:
+        d = {"type": item['type'], **{f: item[f] for f in fields[item['type']]}}
+        if "parsing" in d: d["parsing"] = list(d["parsing"])
+        out.append(d)
+    return out
+
+
+def assert_same(df):
+    issues, row_state = {}, {}
+    sentence_data, vocab_data, group_map, pools, srs_map, mistakes = parse_data(df, issues, row_state)
+    want_issues, want_row_state = {}, {}
+    w_sentence, w_vocab, w_group_map, w_pools, w_srs_map, w_mistakes = legacy_parse_data(df, want_issues, want_row_state)
+
+    assert plain(sentence_data) == w_sentence
+    assert plain(vocab_data) == w_vocab
+    assert group_map == w_group_map
+    assert list(pools[0]) == w_pools[0] and list(pools[1]) == w_pools[1]
+    assert list(srs_map.items()) == list(w_srs_map.items()) # 含順序與重複 Key 以後者為準
+    assert list(mistakes) == w_mistakes
+    assert row_state == want_row_state
+    assert {k: sorted(v) for k, v in issues.items()} == {k: sorted(v) for k, v in want_issues.items()}
+
+
+def test_phrases_xlsx():
+    assert_same(XlsxStorage(os.path.join(ROOT, "Phrases.xlsx")).load_all())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fuzzed_rows(seed):
+    assert_same(fuzzed_frame(300, seed))
+
+
+def test_missing_columns():
+    df = fuzzed_frame(50, 9)
+    assert_same(df.drop(columns=["Time", "Interval", "Weak", "Parsing"]))
+
+
+# strptime 快速路徑 (DATE_FORMATS) 與 pd.to_datetime 寬鬆程度不同的格式：結果必須與只用 pd.to_datetime 相同
+DATE_CASES = ["2024/1/2", "2024-1-2", "2024-01-02 00:00:00", "2024-01-02 7:05:09", "2024-1-2 7:5:9", "2024/01/02 00:00:00",
+              "2024-01-02T00:00:00", "2024-01-02 00:00", "2024-01-02 00:00:00.5", " 2024-01-02 ", "01/02/2024", "2/1/2024",
+              "20240102", "2024.01.02", "Jan 2 2024", "24-01-02", "0024-01-02", "２０２４-０１-０２",
+              "2024-02-30", "2024/02/30", "2024-13-01", "2024-01-02 24:00:00", "2024-01-02 23:59:60", "2024-001-02",
+              "12024-01-02", "45293", "nan", "NaT", ""]
+
+
+def test_date_formats():
+    for value in DATE_CASES:
+        try:
+            want = pd.to_datetime(value).strftime("%Y-%m-%d")
+        except Exception:
+            want = None
+        assert _norm_date(value) == want, value
+    df = fuzzed_frame(len(DATE_CASES), 0)
+    df["Time"], df["Next_Review"] = DATE_CASES, DATE_CASES[::-1]
+    assert_same(df)
@@ -0,0 +1,32 @@
+import asyncio
+
+from jp_audio import PackedAudioWriter
+from jp_presynth import presynthesize
+
+# --- 預先合成：重試退避不佔並行名額 ---
+
+
+def test_backoff_releases_semaphore(tmp_path):
+    # 第一句前兩次被限流；退避等待期間其他句子照常合成，且同時呼叫數不超過 concurrency
+    calls, finished, running = {}, [], [0, 0] # running: 目前 / 最大同時呼叫數
+
+    async def synth(text, voice, rate):
+        calls[text] = calls.get(text, 0) + 1
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if text == "限流" and calls[text] <= 2: raise RuntimeError("429")
+        finished.append(text)
+        return text.encode("utf-8")
+
+    texts = ["限流"] + [f"文{i}" for i in range(5)]
+    writer = PackedAudioWriter(str(tmp_path / "pack"))
+    try:
+        stats = asyncio.run(presynthesize(texts, writer, synth, concurrency=1, retries=3, backoff=0.2,
+                                          report=lambda msg: None))
+    finally:
+        writer.close()
+    assert (stats["done"], stats["failed"]) == (6, 0)
+    assert calls["限流"] == 3 and running[1] == 1
+    assert finished == texts[1:] + ["限流"]
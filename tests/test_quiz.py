@@ -0,0 +1,105 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import jp_deck_cache
+from deckgen import make_deck_frame
+from jp_deck import item_key
+from jp_deck_cache import DeckCache
+from jp_quiz import QuizEngine
+from jp_storage import SqliteStorage
+
+# --- 選題 / 題庫同步 ---
+
+
+class WeakFirst(random.Random):
+    # random() 固定為 0：沒有到期的卡片時一定走「錯題」分支
+    # (只覆寫 random() 時 randrange / sample 也會改用它而永遠抽到 0；保留 getrandbits 讓其餘照常亂數)
+    getrandbits = random.Random.getrandbits
+
+    def random(self):
+        return 0.0
+
+
+@pytest.fixture
+def frame():
+    # 所有卡片都排在未來：沒有到期、也沒有新題
+    df = make_deck_frame(30, weak_ratio=0)
+    df["Next_Review"] = (date.today() + timedelta(days=30)).strftime("%Y-%m-%d")
+    df["Interval"], df["Reps"] = "30", "3"
+    return df
+
+
+def test_deleted_weak_card_after_refresh(monkeypatch, frame):
+    monkeypatch.setattr(jp_deck_cache, "annotate_readings_in_background", lambda *args: None)
+    rows = {"df": frame}
+    cache = DeckCache(lambda: rows["df"])
+    s = QuizEngine(cache).session(rng=WeakFirst(0))
+
+    q = s.next_question()
+    while q.item['type'] != 'sentence': # 句子的 Key 只出現在一列
+        q = s.next_question()
+    key = item_key(q.item)
+    s.submit("×")
+    assert key in s.mistakes
+
+    # 刪掉該列 -> 重整 -> 同步
+    rows["df"] = frame.drop(index=q.item['row_idx'])
+    cache.refresh()
+    assert s.sync()
+    assert key not in s.mistakes
+    assert s.schedule.lookup(key) is None
+    assert s.next_question() is not None
+
+    # 錯題清單中殘留已刪除的 Key 時仍改選其他題目
+    s.mistakes = [key]
+    for _ in range(5):
+        assert s.next_question() is not None
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_two_sessions_answer_same_card(monkeypatch, tmp_path, seed):
+    # 同一份 SQLite 題庫、兩個 session 都答對同一張卡片：後寫回的一方遇到版本衝突，
+    # 以對方的狀態重算自己的作答後重寫，兩次作答都要算進去
+    monkeypatch.setattr(jp_deck_cache, "annotate_readings_in_background", lambda *args: None)
+    df = make_deck_frame(1, scheduled_ratio=0, weak_ratio=0)
+    df["Vocab List"] = df["Meaning"] = "" # 只有一張卡片 (句子)
+    storage = SqliteStorage(str(tmp_path / "deck.db"))
+    storage.replace_all(df)
+    engine = QuizEngine(DeckCache(storage.load_all, srs_loader=storage.load_srs),
+                        lambda records, log: storage.save_srs(records))
+
+    sessions = [engine.session(rng=random.Random(seed + i)) for i in range(2)]
+    keys = []
+    for s in sessions:
+        q = s.next_question()
+        keys.append(item_key(q.item))
+        assert s.submit(sorted(b['id'] for b in q.parsing) if q.mode == 6 else q.correct)["correct"]
+    assert keys[0] == keys[1]
+    assert all(s.flush() for s in sessions)
+
+    remote = storage.load_srs_records(keys[:1])[keys[0]]
+    assert remote["reps"] == 2
+    assert [s.srs.get(keys[0])["reps"] for s in sessions] == [1, 2] # 後寫回的 session 為合併後的狀態
+
+
+@pytest.mark.parametrize("strategy", ["random", "hard"])
+def test_seeded_session_reproduces(monkeypatch, strategy):
+    # 同一個種子：出題順序、模式、選項與字卡順序都相同，不受全域 random 影響
+    monkeypatch.setattr(jp_deck_cache, "annotate_readings_in_background", lambda *args: None)
+    df = make_deck_frame(200)
+
+    def run(global_seed):
+        random.seed(global_seed)
+        s = QuizEngine(DeckCache(lambda: df, strategy)).session(random.Random(7))
+        seen = []
+        for i in range(40):
+            q = s.next_question()
+            seen.append((item_key(q.item), q.mode, q.options, [b['id'] for b in q.parsing or ()]))
+            s.submit(q.correct if i % 3 else "×")
+        s.start_batch(10)
+        seen += [(item_key(q.item), q.mode, q.options) for q in s.batch.questions]
+        return seen
+
+    assert run(1) == run(2)
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from jp_reviewlog import ReviewLog
+from jp_srs import SrsStore
+from jp_storage import SqliteStorage
+
+# --- 本機作答紀錄：壓縮寫回不重複套用 ---
+
+T0 = datetime(2026, 1, 5, 9, 0)
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingStorage:
+    # 寫入 SRS 表之後 (after=True) 或之前丟出例外，模擬 process 在兩者之間中斷
+    def __init__(self, storage, after):
+        self.storage, self.after = storage, after
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def save_srs(self, records):
+        if self.after: self.storage.save_srs(records)
+        raise Crash()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SqliteStorage(str(tmp_path / "deck.db"))
+
+
+def answer(log, key, n, start=0):
+    for i in range(start, start + n):
+        log.append(key, 5, True, 800, T0 + timedelta(days=i))
+
+
+def reps(storage, key):
+    return storage.load_srs_records([key])[key]["reps"]
+
+
+def test_compact_twice_is_noop(tmp_path, storage):
+    log = ReviewLog(str(tmp_path / "log"))
+    answer(log, "猫", 3)
+    answer(log, "犬", 1)
+    first = log.compact(storage)
+    assert (first["reviews"], first["cards"], first["shipped"]) == (4, 2, 4)
+    before = storage.load_srs_records(["猫", "犬"])
+
+    second = log.compact(storage)
+    assert (second["reviews"], second["cards"], second["shipped"]) == (0, 0, 0)
+    assert storage.load_srs_records(["猫", "犬"]) == before
+    assert reps(storage, "猫") == 3
+    assert ReviewLog(log.path).tail() == {} # 重開後也沒有尚未壓縮的作答
+
+
+@pytest.mark.parametrize("after", [True, False])
+def test_crash_during_compact(tmp_path, storage, after):
+    path = str(tmp_path / "log")
+    log = ReviewLog(path)
+    answer(log, "猫", 2)
+    log.compact(storage)
+    answer(log, "猫", 3, start=2)
+    with pytest.raises(Crash):
+        log.compact(CrashingStorage(storage, after))
+    assert reps(storage, "猫") == (5 if after else 2)
+
+    # 重開：SRS 快照加上尚未壓縮的尾端 = 每筆作答只算一次
+    log = ReviewLog(path)
+    srs = SrsStore()
+    srs.apply_frame(storage.load_srs())
+    log.replay_into(srs)
+    assert srs.get("猫")["reps"] == 5
+
+    log.compact(storage)
+    assert reps(storage, "猫") == 5
+    assert log.state["inflight"] is None and log.tail() == {}
+    log.compact(storage)
+    assert reps(storage, "猫") == 5
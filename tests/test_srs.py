@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from jp_srs import MAX_INTERVAL, REPS_MAX, CardIndex, SrsStore
+
+# --- SRS 狀態陣列 ---
+
+
+def test_add_many_keeps_one_id_per_input_key():
+    index = CardIndex()
+    ids = index.add_many(["a", "b", "a", "c"]) # 空的 index：整批建立
+    assert ids.tolist() == [0, 1, 0, 2] and index.keys == ["a", "b", "c"]
+    assert index.add_many(["c", "d", "d"]).tolist() == [2, 3, 3]
+
+
+def test_duplicate_keys_in_srs_frame():
+    store = SrsStore()
+    df = pd.DataFrame({"key": ["a", "b", "a"], "next_review": ["2026-01-01", "2026-02-01", "2026-03-01"],
+                       "interval": [1, 2, 3], "reps": [1, 2, 3], "weak": [0, 1, 0], "version": [1, 2, 3]})
+    store.apply_frame(df)
+    assert store.get("a") == {"next_review": "2026-03-01", "interval": 3, "reps": 3, "weak": False} # 後者為準
+    assert store.get("b")["interval"] == 2 and store.row_version("b") == 2
+
+
+def test_out_of_range_values_are_clipped():
+    store = SrsStore()
+    store.set_many(["a", "b"], ["2026-01-01"] * 2, np.array([10**12, -5]), np.array([70000, 1]), [False, False])
+    store.set("c", "2026-01-01", 10**12, 10**6, False)
+    assert (store.get("a")["interval"], store.get("a")["reps"]) == (MAX_INTERVAL, REPS_MAX)
+    assert store.get("b")["interval"] == 0
+    assert (store.get("c")["interval"], store.get("c")["reps"]) == (MAX_INTERVAL, REPS_MAX)
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from deckgen import make_deck_frame
+from fakes import FakeSheetsConnection, FakeSpreadsheet
+from jp_storage import SRS_TABLE_COLUMNS, SRS_WORKSHEET, GSheetsStorage, StorageError, gspread_opener
+
+# --- Google Sheets 後端 (以記憶體中的替身執行) ---
+
+
+def record(key, reps, version=0):
+    return {"key": key, "next_review": "2026-01-02", "interval": reps, "reps": reps, "weak": 0, "version": version}
+
+
+@pytest.fixture
+def book():
+    book = FakeSpreadsheet.load(make_deck_frame(5))
+    book.add_worksheet(SRS_WORKSHEET).append_row(SRS_TABLE_COLUMNS)
+    yield book
+    FakeSpreadsheet.current = None
+
+
+def test_concurrent_append_of_new_card(book):
+    # 兩台裝置都讀完版本欄 (表中還沒有這張卡片) 後才附加
+    ws = book.worksheet(SRS_WORKSHEET)
+    barrier = threading.Barrier(2, timeout=5)
+    append_rows = ws.append_rows
+    def racing_append(rows):
+        barrier.wait()
+        return append_rows(rows)
+    ws.append_rows = racing_append
+
+    devices = [GSheetsStorage(FakeSheetsConnection("gsheets"), lambda: book) for _ in range(2)]
+    results = [None, None]
+    def save(i):
+        results[i] = devices[i].save_srs([record("猫", i + 1)])
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(2)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    ws.append_rows = append_rows
+
+    # 只有一台寫入成功，另一台收到衝突 (對方的紀錄)
+    winner = next(i for i in range(2) if results[i][0])
+    loser = 1 - winner
+    assert results[winner] == ({"猫": 1}, {})
+    written, conflicts = results[loser]
+    assert written == {} and conflicts["猫"]["reps"] == winner + 1 and conflicts["猫"]["version"] == 1
+
+    # 重複的列已移除，合併後以對方的版本重寫
+    srs = devices[loser].load_srs()
+    assert list(srs["key"]) == ["猫"] and srs["reps"][0] == str(winner + 1)
+    assert devices[loser].save_srs([record("猫", 3, 1)]) == ({"猫": 2}, {})
+    assert devices[winner].load_srs_records(["猫"])["猫"]["reps"] == 3
+
+
+def test_leftover_duplicate_is_ignored(book):
+    # 附加後來不及檢查 (當機) 留下的重複列：一律以第一列為準
+    storage = GSheetsStorage(FakeSheetsConnection("gsheets"), lambda: book)
+    assert storage.save_srs([record("犬", 1)]) == ({"犬": 1}, {})
+    book.worksheet(SRS_WORKSHEET).append_row(["犬", "2026-01-09", 9, 9, 0, 1])
+    assert list(storage.load_srs()["reps"]) == ["1"]
+    assert storage.save_srs([record("犬", 2, 1)]) == ({"犬": 2}, {})
+    assert storage.load_srs_records(["犬"])["犬"]["reps"] == 2
+
+
+def test_spreadsheet_handle(book):
+    # 寫入經由 open_spreadsheet 取得的 Spreadsheet (只開一次)；沒有時才退回連線物件
+    opened = []
+    storage = GSheetsStorage(None, lambda: opened.append(1) or book)
+    assert storage.upsert_rows([{"Sentence": "新しい文です。", "Translation": "新句子"}]) == (1, 0)
+    storage.append_log([{"ts": "2026-01-05T09:00:00", "key": "猫", "mode": 5, "correct": 1, "latency_ms": 800}])
+    assert opened == [1]
+    assert book.get_worksheet(0).values[-1][0] == "新しい文です。"
+    assert GSheetsStorage(FakeSheetsConnection("gsheets")).load_srs_records(["猫"]) == {}
+
+    with pytest.raises(StorageError):
+        GSheetsStorage(object()).save_srs([record("猫", 1)])
+    assert gspread_opener(None) is None and gspread_opener({"spreadsheet": "https://example.com"}) is None